@@ -0,0 +1,363 @@
+"""
+KYC Verification API - Upload Limits and Admission Control
+
+Keeps oversized or overly many uploads from exhausting the server's memory:
+
+- request bodies and single file parts are capped while they stream in;
+  file parts below KYC_UPLOAD_SPOOL_BYTES stay in memory, larger ones
+  spill to a temporary file that is removed when it is closed;
+- image dimensions are read from the header and checked against
+  KYC_UPLOAD_MAX_PIXELS before anything is decoded;
+- verifications reserve the memory their decoded pixels will take from a
+  shared budget (KYC_ADMISSION_MEMORY_MB) and wait, up to
+  KYC_ADMISSION_TIMEOUT seconds, when it is exhausted.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import zipfile
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import IO, Any, AsyncIterator, Deque, Iterator, Optional
+
+from PIL import Image
+from werkzeug.exceptions import BadRequest, HTTPException, RequestEntityTooLarge, ServiceUnavailable
+
+# Import absolute paths to avoid relative import issues
+kyc_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if kyc_dir not in sys.path:
+    sys.path.insert(0, kyc_dir)
+from kyc_engine.image_input import LoadedImage
+from kyc_engine.metrics import (
+    ADMISSION_RESERVED_BYTES,
+    UPLOAD_BYTES,
+    UPLOAD_PIXELS,
+    UPLOAD_REJECTIONS,
+    VERIFICATIONS_IN_FLIGHT,
+    VERIFICATIONS_WAITING
+)
+from kyc_engine.shared import (
+    ADMISSION_MEMORY_MB,
+    ADMISSION_TIMEOUT,
+    UPLOAD_MAX_IMAGE_BYTES,
+    UPLOAD_MAX_PIXELS,
+    UPLOAD_SPOOL_BYTES
+)
+
+# Decoded bytes held per image pixel during a verification: the BGR pixels,
+# the grayscale view and the forensic crop of the card
+DECODED_BYTES_PER_PIXEL = 7
+
+# Shared admission budget, created on first use
+_budget: Optional["MemoryBudget"] = None
+_budget_lock = threading.Lock()
+
+
+def _rejected(error: HTTPException, reason: str) -> HTTPException:
+    """Count a refused upload in the metrics and tag the error with the reason."""
+    UPLOAD_REJECTIONS.labels(reason).inc()
+    error.reason = reason
+    return error
+
+
+class LimitedSpool(tempfile.SpooledTemporaryFile):
+    """Spooled upload buffer that refuses to grow past a size limit."""
+
+    def __init__(self, limit: Optional[int], max_size: int):
+        """
+        Args:
+            limit: Maximum number of bytes accepted, or None for no limit
+            max_size: Bytes kept in memory before spilling to a temporary file
+        """
+        super().__init__(max_size=max_size, mode="w+b")
+        self.limit = limit
+        self.written = 0
+
+    def write(self, data: bytes) -> int:
+        self.written += len(data)
+        if self.limit is not None and self.written > self.limit:
+            raise _rejected(RequestEntityTooLarge(f"File exceeds the limit of {self.limit} bytes"),
+                            "image_bytes")
+        return super().write(data)
+
+
+def upload_stream(total_content_length: Optional[int], content_type: Optional[str],
+                  filename: Optional[str] = None, content_length: Optional[int] = None) -> IO[bytes]:
+    """
+    Stream factory for multipart file parts (werkzeug and Quart form parsers).
+
+    Image parts are capped at KYC_UPLOAD_MAX_IMAGE_BYTES as they are
+    written; zip archives are only bound by the request size limit.
+
+    Args:
+        total_content_length: Length of the whole request body, if known
+        content_type: MIME type of the part
+        filename: Filename of the part
+        content_length: Length of the part, if the client sent it
+
+    Returns:
+        Writable and readable buffer for the part
+    """
+    is_archive = bool(filename) and filename.rsplit(".", 1)[-1].lower() == "zip"
+    return LimitedSpool(None if is_archive else UPLOAD_MAX_IMAGE_BYTES, UPLOAD_SPOOL_BYTES)
+
+
+def read_file(file: Any, limit: int = UPLOAD_MAX_IMAGE_BYTES) -> bytes:
+    """
+    Read an uploaded file part and close it.
+
+    Args:
+        file: Uploaded file (werkzeug FileStorage or zip member)
+        limit: Maximum number of bytes accepted
+
+    Returns:
+        File content
+
+    Raises:
+        RequestEntityTooLarge: If the file is larger than limit
+    """
+    try:
+        data = file.read(limit + 1)
+    finally:
+        file.close()
+    if len(data) > limit:
+        raise _rejected(RequestEntityTooLarge(f"File exceeds the limit of {limit} bytes"), "image_bytes")
+    return data
+
+
+def read_zip_member(bundle: zipfile.ZipFile, info: zipfile.ZipInfo) -> bytes:
+    """
+    Decompress one zip member, stopping at the image size limit.
+
+    The size declared in the archive is not trusted; decompression itself
+    stops once the limit is passed, so zip bombs never inflate in full.
+
+    Args:
+        bundle: Open zip archive
+        info: Member to read
+
+    Returns:
+        Member content
+
+    Raises:
+        RequestEntityTooLarge: If the member is larger than the image limit
+    """
+    if info.file_size > UPLOAD_MAX_IMAGE_BYTES:
+        raise _rejected(RequestEntityTooLarge(f"File exceeds the limit of {UPLOAD_MAX_IMAGE_BYTES} bytes"),
+                        "image_bytes")
+    return read_file(bundle.open(info))
+
+
+def image_cost(image: LoadedImage) -> int:
+    """
+    Check an upload against the limits and estimate its decoded size.
+
+    Only the image header is parsed; no pixels are decoded here.
+
+    Args:
+        image: Loaded upload
+
+    Returns:
+        Estimated bytes held by the decoded image during a verification
+
+    Raises:
+        RequestEntityTooLarge: If the file or its pixel count is too large
+        BadRequest: If the data is not a readable image
+    """
+    if image.has_encoded:
+        UPLOAD_BYTES.observe(len(image.raw))
+        if len(image.raw) > UPLOAD_MAX_IMAGE_BYTES:
+            raise _rejected(RequestEntityTooLarge(f"File exceeds the limit of {UPLOAD_MAX_IMAGE_BYTES} bytes"),
+                            "image_bytes")
+    try:
+        width, height = image.open_pil().size
+    except Image.DecompressionBombError:
+        raise _rejected(RequestEntityTooLarge(f"Image exceeds the limit of {UPLOAD_MAX_PIXELS} pixels"),
+                        "pixels")
+    except Exception:
+        raise _rejected(BadRequest("Unreadable or unsupported image"), "unreadable")
+    UPLOAD_PIXELS.observe(width * height)
+    if width * height > UPLOAD_MAX_PIXELS:
+        raise _rejected(RequestEntityTooLarge(
+            f"Image is {width}x{height}, above the limit of {UPLOAD_MAX_PIXELS} pixels"
+        ), "pixels")
+    return width * height * DECODED_BYTES_PER_PIXEL
+
+
+class _AsyncWaiter:
+    """An asyncio request waiting for room in the budget."""
+
+    __slots__ = ("amount", "future", "granted")
+
+    def __init__(self, amount: int, future: "asyncio.Future[bool]"):
+        self.amount = amount
+        self.future = future
+        # Set under the budget lock once the bytes are reserved for the waiter
+        self.granted = False
+
+
+def _resolve(future: "asyncio.Future[bool]") -> None:
+    if not future.done():
+        future.set_result(True)
+
+
+class MemoryBudget:
+    """
+    Counting budget of decoded-image bytes shared by in-flight verifications.
+
+    Threads wait on a condition; asyncio requests wait on a future each,
+    which release() resolves after reserving the bytes for them.
+    """
+
+    def __init__(self, capacity: int):
+        """
+        Args:
+            capacity: Total bytes available
+        """
+        self.capacity = capacity
+        self.in_use = 0
+        self._condition = threading.Condition()
+        self._async_waiters: Deque[_AsyncWaiter] = deque()
+
+    def _check(self, amount: int) -> None:
+        if amount > self.capacity:
+            raise _rejected(RequestEntityTooLarge("Image is too large to be processed by this server"),
+                            "over_capacity")
+
+    def _reserve(self, amount: int) -> None:
+        # Callers hold the lock
+        self.in_use += amount
+        ADMISSION_RESERVED_BYTES.set(self.in_use)
+
+    def acquire(self, amount: int, timeout: float) -> bool:
+        """
+        Reserve amount bytes, waiting up to timeout seconds for room.
+
+        Returns:
+            True if reserved, False on timeout
+        """
+        self._check(amount)
+        with self._condition:
+            if not self._condition.wait_for(lambda: self.in_use + amount <= self.capacity, timeout):
+                return False
+            self._reserve(amount)
+            return True
+
+    async def acquire_async(self, amount: int, timeout: float) -> bool:
+        """
+        Asyncio counterpart of acquire(): waits on a future resolved by
+        release(), without blocking the event loop.
+
+        Returns:
+            True if reserved, False on timeout
+        """
+        self._check(amount)
+        with self._condition:
+            if self.in_use + amount <= self.capacity:
+                self._reserve(amount)
+                return True
+            waiter = _AsyncWaiter(amount, asyncio.get_running_loop().create_future())
+            self._async_waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter.future, timeout)
+            return True
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            with self._condition:
+                granted = waiter.granted
+                if not granted:
+                    self._async_waiters.remove(waiter)
+            if granted:
+                # The bytes were handed over just as the wait ended: give them back
+                self.release(amount)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            return False
+
+    def release(self, amount: int) -> None:
+        """Return amount bytes to the budget and wake up waiting requests."""
+        with self._condition:
+            self.in_use -= amount
+            # Hand the room to the asyncio waiters that fit, oldest first
+            for waiter in list(self._async_waiters):
+                if self.in_use + waiter.amount > self.capacity:
+                    continue
+                try:
+                    waiter.future.get_loop().call_soon_threadsafe(_resolve, waiter.future)
+                except RuntimeError:
+                    # Event loop closed; nobody is waiting any more
+                    self._async_waiters.remove(waiter)
+                    continue
+                self._async_waiters.remove(waiter)
+                waiter.granted = True
+                self.in_use += waiter.amount
+            ADMISSION_RESERVED_BYTES.set(self.in_use)
+            self._condition.notify_all()
+
+
+def get_memory_budget() -> MemoryBudget:
+    """
+    Get the process-wide admission budget.
+
+    Returns:
+        Shared MemoryBudget sized by KYC_ADMISSION_MEMORY_MB
+    """
+    global _budget
+    with _budget_lock:
+        if _budget is None:
+            _budget = MemoryBudget(ADMISSION_MEMORY_MB * 1024 * 1024)
+        return _budget
+
+
+def _busy() -> HTTPException:
+    error = ServiceUnavailable("Server is busy, retry later")
+    error.retry_after = max(1, int(ADMISSION_TIMEOUT))
+    return _rejected(error, "busy")
+
+
+@contextmanager
+def admit(image: LoadedImage) -> Iterator[None]:
+    """
+    Hold room in the admission budget while a verification runs.
+
+    Args:
+        image: Loaded upload
+
+    Raises:
+        RequestEntityTooLarge: If the image exceeds the upload limits
+        BadRequest: If the data is not a readable image
+        ServiceUnavailable: If no room frees up within KYC_ADMISSION_TIMEOUT
+    """
+    cost = image_cost(image)
+    budget = get_memory_budget()
+    with VERIFICATIONS_WAITING.track():
+        admitted = budget.acquire(cost, ADMISSION_TIMEOUT)
+    if not admitted:
+        raise _busy()
+    try:
+        with VERIFICATIONS_IN_FLIGHT.track():
+            yield
+    finally:
+        budget.release(cost)
+
+
+@asynccontextmanager
+async def admit_async(image: LoadedImage) -> AsyncIterator[None]:
+    """
+    Asyncio counterpart of admit(); waits without blocking the event loop.
+
+    Args:
+        image: Loaded upload
+    """
+    cost = image_cost(image)
+    budget = get_memory_budget()
+    with VERIFICATIONS_WAITING.track():
+        admitted = await budget.acquire_async(cost, ADMISSION_TIMEOUT)
+    if not admitted:
+        raise _busy()
+    try:
+        with VERIFICATIONS_IN_FLIGHT.track():
+            yield
+    finally:
+        budget.release(cost)
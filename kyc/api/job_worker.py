@@ -0,0 +1,172 @@
+"""
+KYC Verification API - Job Worker
+
+Drains the durable job queue filled by POST /api/v1/jobs. Workers run in
+their own process, so they scale independently of the web server; start as
+many as needed against the same KYC_JOB_QUEUE_PATH:
+
+    python -m api.job_worker --workers 4
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+from werkzeug.exceptions import HTTPException
+
+# Import absolute paths to avoid relative import issues
+kyc_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if kyc_dir not in sys.path:
+    sys.path.insert(0, kyc_dir)
+from kyc_engine.cpu_pool import warm_cpu_pool
+from kyc_engine.image_input import LoadedImage
+from kyc_engine.job_queue import JobQueue, get_job_queue
+from kyc_engine.log_config import bind_context, configure_logging, request_context
+from kyc_engine.shared import JOB_POLL_INTERVAL
+from api.kyc_service import verify_image
+
+logger = logging.getLogger(__name__)
+
+# Seconds between purges of expired finished jobs
+PURGE_INTERVAL = 3600
+
+
+@contextmanager
+def lease_heartbeat(queue: JobQueue, job: dict) -> Iterator[None]:
+    """
+    Renew the lease of a job every third of the lease period while it runs.
+
+    Without it, a job slower than KYC_JOB_LEASE_SECONDS would be claimed and
+    run again by another worker, paying for its model calls twice.
+
+    Args:
+        queue: Job queue the job was claimed from
+        job: Job returned by JobQueue.claim()
+    """
+    done = threading.Event()
+
+    def renew() -> None:
+        while not done.wait(queue.lease_seconds / 3):
+            try:
+                if not queue.renew(job["id"], job["attempts"]):
+                    logger.warning("Job lease lost")
+                    return
+            except Exception:
+                logger.warning("Could not renew the job lease", exc_info=True)
+
+    thread = threading.Thread(target=bind_context(renew), name=f"kyc-lease-{job['id'][:8]}",
+                              daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        done.set()
+        thread.join()
+
+
+def process_job(queue: JobQueue, job: dict) -> None:
+    """
+    Run the pipeline and decision for a claimed job and store the outcome.
+
+    The job id doubles as the request id of the job's logs. Rejected
+    uploads (4xx) fail at once, since no retry can change the answer; a
+    worker at its memory ceiling (503) hands the job back without using up
+    an attempt.
+
+    Args:
+        queue: Job queue the job was claimed from
+        job: Job returned by JobQueue.claim()
+    """
+    with request_context(job["id"]):
+        logger.info("Processing job", extra={"attempt": job["attempts"]})
+        try:
+            with lease_heartbeat(queue, job):
+                image = LoadedImage.from_bytes(job["image"], job["filename"])
+                result = verify_image(job["form_data"], image)
+        except HTTPException as e:
+            if e.code is not None and e.code >= 500:
+                logger.warning("Worker busy, job requeued")
+                stored = queue.release(job["id"], job["attempts"], e.description)
+            else:
+                logger.warning("Job rejected", extra={"status": e.code})
+                stored = queue.fail(job["id"], job["attempts"], e.description, retry=False)
+        except Exception as e:
+            logger.exception("Job failed")
+            stored = queue.fail(job["id"], job["attempts"], str(e))
+        else:
+            stored = queue.complete(job["id"], job["attempts"], result)
+            if stored:
+                logger.info("Job complete")
+        if not stored:
+            logger.warning("Job outcome discarded: another worker holds the lease")
+
+
+def worker_loop(queue: JobQueue, stop: threading.Event, poll_interval: float) -> None:
+    """
+    Claim and process jobs until stop is set.
+
+    Args:
+        queue: Job queue to drain
+        stop: Event signalling shutdown; the current job is finished first
+        poll_interval: Seconds to wait when the queue is empty
+    """
+    while not stop.is_set():
+        try:
+            job = queue.claim()
+        except Exception:
+            # Keep the thread alive; the queue file may be briefly locked
+            logger.exception("Could not claim a job")
+            job = None
+        if job is None:
+            stop.wait(poll_interval)
+            continue
+        process_job(queue, job)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Process queued KYC verification jobs.")
+    parser.add_argument("--workers", type=int, default=2, help="Number of worker threads")
+    parser.add_argument("--poll-interval", type=float, default=JOB_POLL_INTERVAL,
+                        help="Seconds to wait when the queue is empty")
+    args = parser.parse_args()
+    configure_logging()
+
+    queue = get_job_queue()
+    stop = threading.Event()
+    # Start the CPU stage processes before taking jobs
+    warm_cpu_pool()
+
+    def request_stop(signum, frame):
+        logger.info("Shutting down after the current jobs")
+        stop.set()
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    threads = [
+        threading.Thread(target=worker_loop, args=(queue, stop, args.poll_interval),
+                         name=f"kyc-job-{i}")
+        for i in range(args.workers)
+    ]
+    for thread in threads:
+        thread.start()
+    logger.info("Job workers started", extra={"workers": args.workers, "host": socket.gethostname(),
+                                              "queue": queue.path})
+
+    while not stop.is_set():
+        removed = queue.purge()
+        if removed:
+            logger.info("Purged finished jobs", extra={"removed": removed})
+        stop.wait(PURGE_INTERVAL)
+
+    for thread in threads:
+        thread.join()
+
+
+if __name__ == "__main__":
+    main()
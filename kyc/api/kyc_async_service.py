@@ -0,0 +1,335 @@
+"""
+KYC Verification API - Asyncio Service Module
+
+ASGI application serving the same endpoints as the Flask blueprint in
+kyc_service.py, backed by the asyncio verification pipeline. Gemini round
+trips are awaited on the event loop instead of blocking a worker thread, so a
+single process can hold hundreds of in-flight verifications.
+
+Run with an ASGI server, e.g.:
+    hypercorn api.kyc_async_service:app --bind 0.0.0.0:5001
+"""
+import asyncio
+import json
+import logging
+import os
+import sys
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from quart import Quart, Request, Response, request, jsonify
+from quart.formparser import FormDataParser
+from werkzeug.exceptions import HTTPException
+from werkzeug.utils import secure_filename
+
+# Import absolute paths to avoid relative import issues
+kyc_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if kyc_dir not in sys.path:
+    sys.path.insert(0, kyc_dir)
+from kyc_engine.decision_making import run_pipeline_async, kyc_decision_async
+from kyc_engine.image_input import LoadedImage
+from kyc_engine.job_queue import get_job_queue
+from kyc_engine.log_config import accept_request_id, configure_logging, request_id_var
+from kyc_engine.metrics import CONTENT_TYPE, render_metrics
+from kyc_engine.shared import BATCH_WORKERS, UPLOAD_MAX_REQUEST_BYTES, close_async_http_session
+from api.admission import admit_async, read_file, upload_stream
+from api.kyc_service import (
+    allowed_file,
+    extract_form_data,
+    find_missing_fields,
+    build_verification_response,
+    parse_batch_manifest,
+    collect_batch_images,
+    validate_batch_item,
+    batch_summary,
+    read_upload,
+    job_response,
+    http_error
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+class KycRequest(Request):
+    """Quart request whose file parts go through the upload limits."""
+
+    def make_form_data_parser(self) -> FormDataParser:
+        return self.form_data_parser_class(
+            max_content_length=self.max_content_length,
+            max_form_memory_size=self.max_form_memory_size,
+            max_form_parts=self.max_form_parts,
+            cls=self.parameter_storage_class,
+            stream_factory=upload_stream,
+        )
+
+
+# Initialize ASGI app; request bodies are capped while they are received
+app = Quart(__name__)
+app.request_class = KycRequest
+app.config['MAX_CONTENT_LENGTH'] = UPLOAD_MAX_REQUEST_BYTES
+
+configure_logging()
+
+
+@app.before_request
+async def bind_request_id() -> None:
+    """Tag the logs of this request with its id (X-Request-ID, or a new one).
+
+    Each request runs in its own task and context, so nothing is reset
+    afterwards; tasks started by the request (batch items) inherit the id.
+    """
+    request_id_var.set(accept_request_id(request.headers.get('X-Request-ID')))
+
+
+@app.after_request
+async def log_request(response: Response) -> Response:
+    """Echo the request id to the client and log the request outcome."""
+    response.headers['X-Request-ID'] = request_id_var.get()
+    logger.info('Request complete', extra={'method': request.method, 'path': request.path,
+                                           'status': response.status_code})
+    return response
+
+
+@app.after_serving
+async def shutdown() -> None:
+    """Release pooled upstream connections when the server stops."""
+    await close_async_http_session()
+
+
+async def verify_image_async(form_data: Dict[str, str], image: LoadedImage) -> Dict[str, Any]:
+    """
+    Asyncio counterpart of kyc_service.verify_image().
+    
+    Args:
+        form_data: Dictionary returned by extract_form_data
+        image: Loaded ID card image
+        
+    Returns:
+        Response dictionary for the external API
+        
+    Raises:
+        HTTPException: If the image exceeds the upload limits (413) or the
+            server stays at its memory ceiling (503)
+    """
+    async with admit_async(image):
+        # Run KYC pipeline with multilingual support
+        pipeline_results = await run_pipeline_async(form_data, image)
+
+        # Get final decision
+        decision_result = await kyc_decision_async(pipeline_results)
+
+    return build_verification_response(pipeline_results, decision_result)
+
+
+async def verify_batch_item_async(index: int, item: Dict[str, Any],
+                                  reader: Optional[Callable[[], bytes]]) -> Dict[str, Any]:
+    """
+    Asyncio counterpart of kyc_service.verify_batch_item().
+    
+    Args:
+        index: Position of the item in the manifest
+        item: Manifest item
+        reader: Function returning the item's image bytes, or None
+        
+    Returns:
+        Result line for the item, tagged with its index and id
+    """
+    result: Dict[str, Any] = {'index': index, 'id': item.get('id', index)}
+    try:
+        form_data, filename, message = validate_batch_item(item, reader)
+        if message is None:
+            image = LoadedImage.from_bytes(reader(), filename)
+            result.update(await verify_image_async(form_data, image))
+            return result
+    except HTTPException as e:
+        message = e.description
+    except Exception as e:
+        logger.exception('Batch item failed', extra={'index': index})
+        message = str(e)
+
+    result.update({'status': 'error', 'message': message})
+    return result
+
+
+async def stream_batch_async(items: List[Dict[str, Any]],
+                             readers: Dict[str, Callable[[], bytes]]) -> AsyncIterator[str]:
+    """
+    Verify batch items on the event loop, yielding NDJSON lines as they finish.
+    
+    Args:
+        items: Manifest items
+        readers: Image readers returned by collect_batch_images
+        
+    Yields:
+        One JSON document per line, then a summary line
+    """
+    semaphore = asyncio.Semaphore(BATCH_WORKERS)
+
+    async def run(index: int, item: Dict[str, Any]) -> Dict[str, Any]:
+        async with semaphore:
+            reader = readers.get(secure_filename(str(item.get('image', ''))))
+            return await verify_batch_item_async(index, item, reader)
+
+    tasks = [asyncio.ensure_future(run(index, item)) for index, item in enumerate(items)]
+    failed = 0
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            result = await next_done
+            if result.get('status') != 'success':
+                failed += 1
+            yield json.dumps(result) + '\n'
+
+        yield json.dumps(batch_summary(len(items), failed)) + '\n'
+    finally:
+        # Client disconnected: stop the remaining items
+        for task in tasks:
+            task.cancel()
+
+
+@app.route('/api/v1/verify', methods=['POST'])
+async def verify_kyc():
+    """
+    Process KYC verification API request on the asyncio pipeline.
+
+    Returns:
+        JSON response with verification results or error message, identical
+        in schema to the Flask /api/v1/verify endpoint
+    """
+    try:
+        files = await request.files
+        form = await request.form
+
+        # Check if image file is present
+        if 'id_image' not in files:
+            return jsonify({'status': 'error', 'message': 'No image file provided'}), 400
+
+        file = files['id_image']
+        if file.filename == '':
+            return jsonify({'status': 'error', 'message': 'No selected file'}), 400
+
+        if file and allowed_file(file.filename):
+            # Prepare form data
+            form_data = extract_form_data(form)
+
+            # Validate required fields
+            missing_fields = find_missing_fields(form_data)
+
+            if missing_fields:
+                return jsonify({
+                    'status': 'error',
+                    'message': f'Missing required fields: {", ".join(missing_fields)}'
+                }), 400
+
+            # Keep the upload in memory; every stage shares this single decode
+            image = LoadedImage.from_bytes(read_file(file), secure_filename(file.filename))
+
+            return jsonify(await verify_image_async(form_data, image))
+
+        return jsonify({'status': 'error', 'message': 'Invalid file type'}), 400
+
+    except HTTPException as e:
+        body, status, headers = http_error(e)
+        return jsonify(body), status, headers
+    except Exception as e:
+        logger.exception('Request failed')
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+
+@app.route('/api/v1/verify/batch', methods=['POST'])
+async def verify_kyc_batch():
+    """
+    Verify many submissions in one request, streaming one result per line.
+    
+    Returns:
+        application/x-ndjson stream with the same lines as the Flask
+        /api/v1/verify/batch endpoint, or a JSON error
+    """
+    try:
+        files = await request.files
+        form = await request.form
+        manifest = form.get('manifest')
+        if manifest is None and 'manifest' in files:
+            manifest = read_file(files['manifest'])
+        items = parse_batch_manifest(manifest)
+        readers = collect_batch_images(files)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except HTTPException as e:
+        body, status, headers = http_error(e)
+        return jsonify(body), status, headers
+
+    return stream_batch_async(items, readers), 200, {'Content-Type': 'application/x-ndjson'}
+
+
+@app.route('/api/v1/jobs', methods=['POST'])
+async def submit_job():
+    """
+    Queue a KYC verification and return immediately.
+    
+    Returns:
+        202 JSON response with the job id, or an error message
+    """
+    try:
+        try:
+            form_data, image = read_upload(await request.files, await request.form)
+        except ValueError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+
+        # SQLite writes block, so keep them off the event loop
+        loop = asyncio.get_running_loop()
+        job_id = await loop.run_in_executor(
+            None, get_job_queue().enqueue, form_data, image.raw, image.filename
+        )
+        logger.info('Job queued', extra={'job_id': job_id})
+        return jsonify({
+            'status': 'queued',
+            'job_id': job_id,
+            'status_url': f'/api/v1/jobs/{job_id}'
+        }), 202
+
+    except HTTPException as e:
+        body, status, headers = http_error(e)
+        return jsonify(body), status, headers
+    except Exception as e:
+        logger.exception('Request failed')
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+
+@app.route('/api/v1/jobs/<job_id>', methods=['GET'])
+async def get_job(job_id: str):
+    """
+    Report the state of a queued verification job.
+    
+    Returns:
+        JSON response with the job status and, once done, its result
+    """
+    loop = asyncio.get_running_loop()
+    job = await loop.run_in_executor(None, get_job_queue().get, job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Job not found'}), 404
+    return jsonify(job_response(job))
+
+
+@app.route('/metrics', methods=['GET'])
+async def metrics():
+    """
+    Prometheus scrape endpoint.
+
+    Returns:
+        Process metrics in the Prometheus text exposition format
+    """
+    return render_metrics(), 200, {'Content-Type': CONTENT_TYPE}
+
+
+@app.route('/api/v1/health', methods=['GET'])
+async def health_check():
+    """
+    Health check endpoint to verify API service status.
+
+    Returns:
+        JSON response with service status
+    """
+    return jsonify({
+        'status': 'operational',
+        'version': '1.0'
+    })
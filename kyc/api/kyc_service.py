@@ -3,13 +3,18 @@ KYC Verification API - Service Module with Multilingual Support
 
 Provides REST API endpoints for KYC identity verification services with enhanced multilingual capabilities.
 """
+import io
+import logging
 import os
 import sys
 import json
-from datetime import datetime
-from typing import Dict, Any, List, Optional, Union
+import threading
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, Any, Callable, Iterator, List, Mapping, Optional, Tuple, Union
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Request, Response, g, request, jsonify
+from werkzeug.exceptions import HTTPException
 from werkzeug.utils import secure_filename
 
 # Import absolute paths to avoid relative import issues
@@ -17,15 +22,22 @@ kyc_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if kyc_dir not in sys.path:
     sys.path.insert(0, kyc_dir)
 from kyc_engine.decision_making import run_pipeline, kyc_decision
-from kyc_engine.shared import ensure_output_dir
+from kyc_engine.image_input import LoadedImage
+from kyc_engine.job_queue import get_job_queue
+from kyc_engine.log_config import accept_request_id, bind_context, iterate_in_context, request_id_var
+from kyc_engine.metrics import CONTENT_TYPE, UPLOAD_REJECTIONS, render_metrics
+from kyc_engine.shared import BATCH_MAX_ITEMS, BATCH_WORKERS, UPLOAD_MAX_REQUEST_BYTES, ensure_output_dir
+from api.admission import admit, image_cost, read_file, read_zip_member, upload_stream
+
+logger = logging.getLogger(__name__)
 
 # Configuration
-UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
+ARCHIVE_EXTENSIONS = {'zip'}
 
-# Create uploads folder if it doesn't exist
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
+# Shared executor for batch items, created on first use
+_batch_executor: Optional[ThreadPoolExecutor] = None
+_batch_executor_lock = threading.Lock()
 
 # Initialize output directories
 ensure_output_dir()
@@ -36,6 +48,63 @@ ensure_output_dir('analysis')
 kyc_api = Blueprint('kyc_api', __name__)
 
 
+class KycRequest(Request):
+    """Flask request whose file parts go through the upload limits while streaming."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return upload_stream(total_content_length, content_type, filename, content_length)
+
+
+@kyc_api.record_once
+def configure_uploads(state) -> None:
+    """Apply the upload limits to the app the blueprint is registered on."""
+    state.app.request_class = KycRequest
+    if state.app.config.get('MAX_CONTENT_LENGTH') is None:
+        state.app.config['MAX_CONTENT_LENGTH'] = UPLOAD_MAX_REQUEST_BYTES
+
+
+@kyc_api.before_app_request
+def bind_request_id() -> None:
+    """Tag the logs of this request with its id (X-Request-ID, or a new one)."""
+    g.request_id = accept_request_id(request.headers.get('X-Request-ID'))
+    g.request_id_token = request_id_var.set(g.request_id)
+
+
+@kyc_api.after_app_request
+def log_request(response: Response) -> Response:
+    """Echo the request id to the client and log the request outcome."""
+    response.headers['X-Request-ID'] = g.get('request_id', '-')
+    logger.info('Request complete', extra={'method': request.method, 'path': request.path,
+                                           'status': response.status_code})
+    return response
+
+
+@kyc_api.teardown_app_request
+def reset_request_id(error: Optional[BaseException] = None) -> None:
+    token = g.pop('request_id_token', None)
+    if token is not None:
+        request_id_var.reset(token)
+
+
+def http_error(error: HTTPException) -> Tuple[Dict[str, Any], int, Dict[str, str]]:
+    """
+    Build the JSON error response for an upload limit or admission error.
+    
+    Args:
+        error: werkzeug HTTP exception (413, 400 or 503)
+        
+    Returns:
+        Tuple of (response body, status code, headers)
+    """
+    if getattr(error, 'reason', None) is None:
+        # Raised by the framework itself: the request body limit
+        UPLOAD_REJECTIONS.labels('request_body' if error.code == 413 else 'bad_request').inc()
+    headers = {}
+    if getattr(error, 'retry_after', None):
+        headers['Retry-After'] = str(error.retry_after)
+    return {'status': 'error', 'message': error.description}, error.code, headers
+
+
 def allowed_file(filename: str) -> bool:
     """
     Check if the uploaded file has an allowed extension.
@@ -49,6 +118,348 @@ def allowed_file(filename: str) -> bool:
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def extract_form_data(form: Mapping[str, str]) -> Dict[str, str]:
+    """
+    Collect the identity fields from the submitted form.
+    
+    Args:
+        form: Submitted form fields
+        
+    Returns:
+        Dictionary with full_name, dob, nationality and id_number, plus
+        account_id when the caller sent one
+    """
+    form_data = {
+        'full_name': form.get('full_name', ''),
+        'dob': form.get('dob', ''),
+        'nationality': form.get('nationality', ''),
+        'id_number': form.get('id_number', '')
+    }
+    # Optional: lets the duplicate check tell the voter's own account apart
+    account_id = (form.get('account_id') or '').strip()
+    if account_id:
+        form_data['account_id'] = account_id
+    return form_data
+
+
+def find_missing_fields(form_data: Dict[str, str]) -> List[str]:
+    """
+    List the required identity fields that were left empty.
+    
+    Args:
+        form_data: Dictionary returned by extract_form_data
+        
+    Returns:
+        Names of the missing fields
+    """
+    missing_fields: List[str] = []
+    for field, value in form_data.items():
+        if not value:
+            missing_fields.append(field)
+    return missing_fields
+
+
+def build_verification_response(pipeline_results: Dict[str, Any], decision_result: str) -> Dict[str, Any]:
+    """
+    Build the /api/v1/verify response body from the pipeline results and decision.
+    
+    Args:
+        pipeline_results: Dictionary returned by run_pipeline
+        decision_result: Decision JSON string returned by kyc_decision
+        
+    Returns:
+        Response dictionary for the external API
+    """
+    # Format response for external API
+    try:
+        decision_obj = json.loads(decision_result)
+    except json.JSONDecodeError:
+        decision_obj = {
+            "decision": "unknown",
+            "reason": decision_result
+        }
+        
+    # Extract detailed OCR results
+    ocr_details = pipeline_results.get('OCR', {}).get('detailed_result', {})
+    
+    # Construct enhanced response with language information
+    response = {
+        'status': 'success',
+        'verification_result': {
+            'decision': decision_obj.get('decision', 'unknown'),
+            'reason': decision_obj.get('reason', ''),
+            'detected_language': pipeline_results.get('detected_language', 'unknown'),
+            'checks': {
+                'card': pipeline_results.get('Card', {}).get('status', 'unknown'),
+                'ocr': {
+                    'status': pipeline_results.get('OCR', {}).get('status', 'unknown'),
+                    'similarity_score': pipeline_results.get('OCR', {}).get('Similarity Score', 0),
+                    'details': {
+                        'full_name': {
+                            'match': ocr_details.get('full_name', {}).get('match', False),
+                            'confidence': ocr_details.get('full_name', {}).get('confidence', 0),
+                            'transliteration': ocr_details.get('full_name', {}).get('transliteration', None)
+                        },
+                        'dob': {
+                            'match': ocr_details.get('dob', {}).get('match', False),
+                            'confidence': ocr_details.get('dob', {}).get('confidence', 0),
+                            'standardized_value': ocr_details.get('dob', {}).get('standardized_value', None)
+                        },
+                        'nationality': {
+                            'match': ocr_details.get('nationality', {}).get('match', False),
+                            'confidence': ocr_details.get('nationality', {}).get('confidence', 0),
+                            'normalized_value': ocr_details.get('nationality', {}).get('normalized_value', None)
+                        },
+                        'id_number': {
+                            'match': ocr_details.get('id_number', {}).get('match', False),
+                            'confidence': ocr_details.get('id_number', {}).get('confidence', 0),
+                            'normalized_value': ocr_details.get('id_number', {}).get('normalized_value', None)
+                        }
+                    }
+                },
+                'metadata': pipeline_results.get('Metadata', {}).get('status', 'unknown'),
+                'image_integrity': pipeline_results.get('ELA', {}).get('status', 'unknown')
+            }
+        }
+    }
+
+    return response
+
+
+def verify_image(form_data: Dict[str, str], image: LoadedImage) -> Dict[str, Any]:
+    """
+    Run the pipeline and decision for one submission.
+    
+    The verification holds its share of the admission budget until it
+    returns or raises.
+    
+    Args:
+        form_data: Dictionary returned by extract_form_data
+        image: Loaded ID card image
+        
+    Returns:
+        Response dictionary for the external API
+        
+    Raises:
+        HTTPException: If the image exceeds the upload limits (413) or the
+            server stays at its memory ceiling (503)
+    """
+    with admit(image):
+        # Run KYC pipeline with multilingual support
+        pipeline_results = run_pipeline(form_data, image)
+
+        # Get final decision
+        decision_result = kyc_decision(pipeline_results)
+
+    return build_verification_response(pipeline_results, decision_result)
+
+
+def parse_batch_manifest(raw: Union[str, bytes, None]) -> List[Dict[str, Any]]:
+    """
+    Parse and validate the JSON manifest of a batch request.
+    
+    The manifest is a list of objects, each with the identity fields, the
+    filename of its ID image under "image" and an optional caller "id".
+    
+    Args:
+        raw: Manifest JSON text
+        
+    Returns:
+        List of manifest items
+        
+    Raises:
+        ValueError: If the manifest is missing, malformed or too large
+    """
+    if not raw:
+        raise ValueError('No manifest provided')
+    try:
+        items = json.loads(raw)
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        raise ValueError(f'Invalid manifest JSON: {e}')
+    if not isinstance(items, list) or not items:
+        raise ValueError('Manifest must be a non-empty JSON list')
+    if len(items) > BATCH_MAX_ITEMS:
+        raise ValueError(f'Batch exceeds the limit of {BATCH_MAX_ITEMS} items')
+    if not all(isinstance(item, dict) for item in items):
+        raise ValueError('Every manifest item must be a JSON object')
+    return items
+
+
+def collect_batch_images(files: Mapping[str, Any]) -> Dict[str, Callable[[], bytes]]:
+    """
+    Index the uploaded batch images by secured filename.
+    
+    Images come either as repeated "images" file parts or as one zip
+    "archive". The uploads are copied into memory here, because the request
+    closes its files as soon as the view returns while results are still
+    streaming; zip members are only decompressed when an item is processed,
+    and never past the image size limit.
+    
+    Args:
+        files: Uploaded files of the request
+        
+    Returns:
+        Mapping of filename to a function returning the image bytes
+        
+    Raises:
+        ValueError: If the archive is not a valid zip file
+        RequestEntityTooLarge: If an image is larger than the upload limit
+    """
+    readers: Dict[str, Callable[[], bytes]] = {}
+
+    for file in files.getlist('images'):
+        if file.filename:
+            data = read_file(file)
+            readers[secure_filename(file.filename)] = lambda data=data: data
+
+    archive = files.get('archive')
+    if archive and archive.filename:
+        if archive.filename.rsplit('.', 1)[-1].lower() not in ARCHIVE_EXTENSIONS:
+            raise ValueError('Archive must be a zip file')
+        try:
+            bundle = zipfile.ZipFile(io.BytesIO(read_file(archive, UPLOAD_MAX_REQUEST_BYTES)))
+        except zipfile.BadZipFile:
+            raise ValueError('Invalid zip archive')
+        for info in bundle.infolist():
+            if not info.is_dir():
+                name = secure_filename(os.path.basename(info.filename))
+                readers[name] = lambda info=info: read_zip_member(bundle, info)
+
+    return readers
+
+
+def validate_batch_item(item: Dict[str, Any],
+                        reader: Optional[Callable[[], bytes]]) -> Tuple[Dict[str, str], str, Optional[str]]:
+    """
+    Check a batch item before running the pipeline on it.
+    
+    Args:
+        item: Manifest item
+        reader: Function returning the item's image bytes, or None if the
+            image was not uploaded
+        
+    Returns:
+        Tuple of (form data, secured image filename, error message or None)
+    """
+    filename = secure_filename(str(item.get('image', '')))
+    form_data = extract_form_data({
+        field: str(value) for field, value in item.items() if value is not None
+    })
+    missing_fields = find_missing_fields(form_data)
+    if missing_fields:
+        return form_data, filename, f'Missing required fields: {", ".join(missing_fields)}'
+    if not allowed_file(filename):
+        return form_data, filename, 'Invalid file type'
+    if reader is None:
+        return form_data, filename, f'Image not found in upload: {filename}'
+    return form_data, filename, None
+
+
+def verify_batch_item(index: int, item: Dict[str, Any],
+                      reader: Optional[Callable[[], bytes]]) -> Dict[str, Any]:
+    """
+    Verify one batch item, reporting any failure in its own result.
+    
+    Args:
+        index: Position of the item in the manifest
+        item: Manifest item
+        reader: Function returning the item's image bytes, or None if the
+            image was not uploaded
+        
+    Returns:
+        Result line for the item, tagged with its index and id
+    """
+    result: Dict[str, Any] = {'index': index, 'id': item.get('id', index)}
+    try:
+        form_data, filename, message = validate_batch_item(item, reader)
+        if message is None:
+            image = LoadedImage.from_bytes(reader(), filename)
+            result.update(verify_image(form_data, image))
+            return result
+    except HTTPException as e:
+        message = e.description
+    except Exception as e:
+        logger.exception('Batch item failed', extra={'index': index})
+        message = str(e)
+
+    result.update({'status': 'error', 'message': message})
+    return result
+
+
+def batch_summary(total: int, failed: int) -> Dict[str, Any]:
+    """
+    Build the final line of a batch stream.
+    
+    Args:
+        total: Number of manifest items
+        failed: Number of items whose result is an error
+        
+    Returns:
+        Summary with the succeeded and failed item counts
+    """
+    return {'status': 'complete', 'total': total, 'succeeded': total - failed, 'failed': failed}
+
+
+def _get_batch_executor() -> ThreadPoolExecutor:
+    """
+    Get the process-wide executor that runs batch items.
+    
+    Returns:
+        Shared ThreadPoolExecutor instance
+    """
+    global _batch_executor
+    with _batch_executor_lock:
+        if _batch_executor is None:
+            _batch_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS,
+                                                 thread_name_prefix="kyc-batch")
+        return _batch_executor
+
+
+def stream_batch(items: List[Dict[str, Any]],
+                 readers: Dict[str, Callable[[], bytes]]) -> Iterator[str]:
+    """
+    Verify batch items with bounded parallelism, yielding NDJSON lines.
+    
+    At most BATCH_WORKERS items are in flight, and an item's image is read
+    only when a worker picks it up. Results are yielded in completion order,
+    followed by a summary line with the item counts.
+    
+    Args:
+        items: Manifest items
+        readers: Image readers returned by collect_batch_images
+        
+    Yields:
+        One JSON document per line
+    """
+    executor = _get_batch_executor()
+    pending: Dict[Future, int] = {}
+    next_index = 0
+    failed = 0
+
+    try:
+        while next_index < len(items) or pending:
+            while next_index < len(items) and len(pending) < BATCH_WORKERS:
+                item = items[next_index]
+                reader = readers.get(secure_filename(str(item.get('image', ''))))
+                future = executor.submit(bind_context(verify_batch_item), next_index, item, reader)
+                pending[future] = next_index
+                next_index += 1
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                del pending[future]
+                result = future.result()
+                if result.get('status') != 'success':
+                    failed += 1
+                yield json.dumps(result) + '\n'
+
+        yield json.dumps(batch_summary(len(items), failed)) + '\n'
+    finally:
+        # Client disconnected: drop items that have not started yet
+        for future in pending:
+            future.cancel()
+
+
 @kyc_api.route('/api/v1/verify', methods=['POST'])
 def verify_kyc():
     """
@@ -67,102 +478,179 @@ def verify_kyc():
             return jsonify({'status': 'error', 'message': 'No selected file'}), 400
 
         if file and allowed_file(file.filename):
-            # Create unique filename with timestamp
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"{timestamp}_{secure_filename(file.filename)}"
-            filepath = os.path.join(UPLOAD_FOLDER, filename)
-            file.save(filepath)
-
             # Prepare form data
-            form_data = {
-                'full_name': request.form.get('full_name', ''),
-                'dob': request.form.get('dob', ''),
-                'nationality': request.form.get('nationality', ''),
-                'id_number': request.form.get('id_number', '')
-            }
+            form_data = extract_form_data(request.form)
 
             # Validate required fields
-            missing_fields: List[str] = []
-            for field, value in form_data.items():
-                if not value:
-                    missing_fields.append(field)
+            missing_fields = find_missing_fields(form_data)
             
             if missing_fields:
-                os.remove(filepath)  # Clean up file
                 return jsonify({
                     'status': 'error',
                     'message': f'Missing required fields: {", ".join(missing_fields)}'
                 }), 400
 
-            # Run KYC pipeline with multilingual support
-            pipeline_results = run_pipeline(form_data, filepath)
-
-            # Get final decision
-            decision_result = kyc_decision(pipeline_results)
-
-            # Clean up uploaded file
-            os.remove(filepath)
-
-            # Format response for external API
-            try:
-                decision_obj = json.loads(decision_result)
-            except json.JSONDecodeError:
-                decision_obj = {
-                    "decision": "unknown",
-                    "reason": decision_result
-                }
-                
-            # Extract detailed OCR results
-            ocr_details = pipeline_results.get('OCR', {}).get('detailed_result', {})
-            
-            # Construct enhanced response with language information
-            response = {
-                'status': 'success',
-                'verification_result': {
-                    'decision': decision_obj.get('decision', 'unknown'),
-                    'reason': decision_obj.get('reason', ''),
-                    'detected_language': pipeline_results.get('detected_language', 'unknown'),
-                    'checks': {
-                        'ocr': {
-                            'status': pipeline_results.get('OCR', {}).get('status', 'unknown'),
-                            'similarity_score': pipeline_results.get('OCR', {}).get('Similarity Score', 0),
-                            'details': {
-                                'full_name': {
-                                    'match': ocr_details.get('full_name', {}).get('match', False),
-                                    'confidence': ocr_details.get('full_name', {}).get('confidence', 0),
-                                    'transliteration': ocr_details.get('full_name', {}).get('transliteration', None)
-                                },
-                                'dob': {
-                                    'match': ocr_details.get('dob', {}).get('match', False),
-                                    'confidence': ocr_details.get('dob', {}).get('confidence', 0),
-                                    'standardized_value': ocr_details.get('dob', {}).get('standardized_value', None)
-                                },
-                                'nationality': {
-                                    'match': ocr_details.get('nationality', {}).get('match', False),
-                                    'confidence': ocr_details.get('nationality', {}).get('confidence', 0),
-                                    'normalized_value': ocr_details.get('nationality', {}).get('normalized_value', None)
-                                },
-                                'id_number': {
-                                    'match': ocr_details.get('id_number', {}).get('match', False),
-                                    'confidence': ocr_details.get('id_number', {}).get('confidence', 0),
-                                    'normalized_value': ocr_details.get('id_number', {}).get('normalized_value', None)
-                                }
-                            }
-                        },
-                        'metadata': pipeline_results.get('Metadata', {}).get('status', 'unknown'),
-                        'image_integrity': pipeline_results.get('ELA', {}).get('status', 'unknown')
-                    }
-                }
-            }
+            # Keep the upload in memory; every stage shares this single decode
+            image = LoadedImage.from_bytes(read_file(file), secure_filename(file.filename))
 
-            return jsonify(response)
+            return jsonify(verify_image(form_data, image))
 
         return jsonify({'status': 'error', 'message': 'Invalid file type'}), 400
 
+    except HTTPException as e:
+        body, status, headers = http_error(e)
+        return jsonify(body), status, headers
+    except Exception as e:
+        logger.exception('Request failed')
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+
+@kyc_api.route('/api/v1/verify/batch', methods=['POST'])
+def verify_kyc_batch():
+    """
+    Verify many submissions in one request, streaming one result per line.
+    
+    Expects a JSON "manifest" (form field or file part) and the ID images as
+    repeated "images" file parts or a single zip "archive".
+    
+    Returns:
+        application/x-ndjson stream of per-item results and a final summary,
+        or a JSON error if the request itself is invalid
+    """
+    try:
+        manifest = request.form.get('manifest')
+        if manifest is None and 'manifest' in request.files:
+            manifest = read_file(request.files['manifest'])
+        items = parse_batch_manifest(manifest)
+        readers = collect_batch_images(request.files)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except HTTPException as e:
+        body, status, headers = http_error(e)
+        return jsonify(body), status, headers
+
+    # The body is consumed after this handler returns; keep the request id
+    return Response(iterate_in_context(stream_batch(items, readers)), mimetype='application/x-ndjson')
+
+
+def read_upload(files: Mapping[str, Any], form: Mapping[str, str]) -> Tuple[Dict[str, str], LoadedImage]:
+    """
+    Validate a single-image verification upload.
+    
+    Args:
+        files: Uploaded files of the request
+        form: Submitted form fields
+        
+    Returns:
+        Tuple of (form data, image kept in memory)
+        
+    Raises:
+        ValueError: If the image or a required field is missing or invalid
+        HTTPException: If the image exceeds the upload limits (checked on
+            its header, without decoding it)
+    """
+    if 'id_image' not in files:
+        raise ValueError('No image file provided')
+
+    file = files['id_image']
+    if file.filename == '':
+        raise ValueError('No selected file')
+    if not allowed_file(file.filename):
+        raise ValueError('Invalid file type')
+
+    form_data = extract_form_data(form)
+    missing_fields = find_missing_fields(form_data)
+    if missing_fields:
+        raise ValueError(f'Missing required fields: {", ".join(missing_fields)}')
+
+    image = LoadedImage.from_bytes(read_file(file), secure_filename(file.filename))
+    image_cost(image)
+    return form_data, image
+
+
+def job_response(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build the /api/v1/jobs/<id> response body.
+    
+    Args:
+        job: Job returned by JobQueue.get()
+        
+    Returns:
+        Response dictionary with the job state and, once done, the
+        verification response under "result"
+    """
+    response = {
+        'job_id': job['id'],
+        'status': job['status'],
+        'attempts': job['attempts'],
+        'created_at': job['created_at'],
+        'updated_at': job['updated_at']
+    }
+    if 'result' in job:
+        response['result'] = job['result']
+    if 'error' in job:
+        response['message'] = job['error']
+    return response
+
+
+@kyc_api.route('/api/v1/jobs', methods=['POST'])
+def submit_job():
+    """
+    Queue a KYC verification and return immediately.
+    
+    Accepts the same form as /api/v1/verify. The job is processed by
+    api/job_worker.py; poll /api/v1/jobs/<job_id> for the result.
+    
+    Returns:
+        202 JSON response with the job id, or an error message
+    """
+    try:
+        try:
+            form_data, image = read_upload(request.files, request.form)
+        except ValueError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+
+        job_id = get_job_queue().enqueue(form_data, image.raw, image.filename)
+        logger.info('Job queued', extra={'job_id': job_id})
+        return jsonify({
+            'status': 'queued',
+            'job_id': job_id,
+            'status_url': f'/api/v1/jobs/{job_id}'
+        }), 202
+
+    except HTTPException as e:
+        body, status, headers = http_error(e)
+        return jsonify(body), status, headers
     except Exception as e:
+        logger.exception('Request failed')
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
 
+@kyc_api.route('/api/v1/jobs/<job_id>', methods=['GET'])
+def get_job(job_id: str):
+    """
+    Report the state of a queued verification job.
+    
+    Returns:
+        JSON response with the job status and, once done, its result
+    """
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Job not found'}), 404
+    return jsonify(job_response(job))
+
+
+@kyc_api.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Prometheus scrape endpoint.
+    
+    Returns:
+        Process metrics in the Prometheus text exposition format
+    """
+    return Response(render_metrics(), content_type=CONTENT_TYPE)
+
+
 @kyc_api.route('/api/v1/health', methods=['GET'])
 def health_check():
     """
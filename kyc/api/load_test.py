@@ -0,0 +1,243 @@
+"""
+KYC Verification API - Load Generator
+
+Drives /api/v1/verify at a fixed concurrency (closed loop: each client sends
+its next request when the previous one returns) or at a target request rate
+(open loop: Poisson arrivals, whatever the latency), and reports throughput,
+latency percentiles and error rates. Used by `api/test_api.py --test load`.
+
+Each request carries a distinct copy of the image (a JPEG comment with the
+run and request number), so the stage cache does not answer repeats, even
+across runs. Without
+--image, a synthetic card from benchmarks/synthetic.py is used, so no test
+data is needed.
+"""
+import asyncio
+import json
+import math
+import os
+import random
+import struct
+import sys
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+
+# Import absolute paths to avoid relative import issues
+kyc_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if kyc_dir not in sys.path:
+    sys.path.insert(0, kyc_dir)
+
+# Width of the synthetic card sent when no image is given
+SYNTHETIC_WIDTH = 1280
+
+
+def load_image_bytes(image_path: Optional[str]) -> bytes:
+    """
+    Read the image to send, or generate a synthetic card.
+
+    Args:
+        image_path: Path to an ID card image, or None
+
+    Returns:
+        Image file content
+    """
+    if image_path:
+        with open(image_path, "rb") as f:
+            return f.read()
+    from benchmarks.synthetic import make_card
+    return make_card(SYNTHETIC_WIDTH)
+
+
+def distinct_copy(data: bytes, tag: str) -> bytes:
+    """
+    Make an image unique without changing its pixels.
+
+    Args:
+        data: Image file content
+        tag: Text written into the copy, unique per request
+
+    Returns:
+        JPEG with a comment segment after the start marker; other formats
+        are returned unchanged
+    """
+    if data[:2] != b"\xff\xd8":
+        return data
+    comment = f"load-test {tag}".encode("ascii")
+    return data[:2] + b"\xff\xfe" + struct.pack(">H", len(comment) + 2) + comment + data[2:]
+
+
+def percentile(values: List[float], share: float) -> Optional[float]:
+    """Nearest-rank percentile of values (share in 0-100), None if empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = math.ceil(share / 100 * len(ordered))
+    return ordered[min(max(rank, 1), len(ordered)) - 1]
+
+
+class LoadResult:
+    """Outcomes of the requests of a load run."""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.success_latencies: List[float] = []
+        self.outcomes: Counter = Counter()
+        self.decisions: Counter = Counter()
+        self.started = time.perf_counter()
+        self.finished = self.started
+
+    def record(self, latency: float, outcome: str, decision: Optional[str] = None) -> None:
+        self.latencies.append(latency)
+        self.outcomes[outcome] += 1
+        if outcome == "200":
+            self.success_latencies.append(latency)
+            self.decisions[decision or "unknown"] += 1
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Summarize the run.
+
+        Returns:
+            Dictionary with counts, throughput in requests per second, error
+            rate and latency percentiles in milliseconds
+        """
+        elapsed = max(self.finished - self.started, 1e-9)
+        total = len(self.latencies)
+        successes = len(self.success_latencies)
+
+        def latency_summary(values: List[float]) -> Dict[str, Optional[float]]:
+            return {
+                name: None if value is None else round(value * 1000, 1)
+                for name, value in (("p50", percentile(values, 50)), ("p95", percentile(values, 95)),
+                                    ("p99", percentile(values, 99)), ("max", max(values, default=None)))
+            }
+
+        return {
+            "requests": total,
+            "duration_s": round(elapsed, 2),
+            "throughput_rps": round(total / elapsed, 2),
+            "success_rps": round(successes / elapsed, 2),
+            "error_rate": round(1 - successes / total, 4) if total else 0.0,
+            "outcomes": dict(self.outcomes),
+            "decisions": dict(self.decisions),
+            "latency_ms": latency_summary(self.latencies),
+            "success_latency_ms": latency_summary(self.success_latencies)
+        }
+
+
+async def _send(session: aiohttp.ClientSession, url: str, form_data: Dict[str, str],
+                image: bytes, result: LoadResult) -> None:
+    form = aiohttp.FormData()
+    for key, value in form_data.items():
+        form.add_field(key, value)
+    form.add_field("id_image", image, filename="card.jpg", content_type="image/jpeg")
+
+    start = time.perf_counter()
+    decision = None
+    try:
+        async with session.post(url, data=form) as response:
+            body = await response.read()
+            outcome = str(response.status)
+            if response.status == 200:
+                decision = json.loads(body).get("verification_result", {}).get("decision")
+    except asyncio.TimeoutError:
+        outcome = "timeout"
+    except aiohttp.ClientError as e:
+        outcome = type(e).__name__
+    except ValueError:
+        outcome = "invalid_json"
+    result.record(time.perf_counter() - start, outcome, decision)
+
+
+async def run_load(base_url: str, image: bytes, form_data: Dict[str, str], concurrency: int = 10,
+                   rate: Optional[float] = None, duration: Optional[float] = 30.0,
+                   requests: Optional[int] = None, timeout: float = 120.0,
+                   seed: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Drive /api/v1/verify and measure it.
+
+    Args:
+        base_url: Base URL of the KYC API
+        image: Image file content sent with every request (as distinct copies)
+        form_data: Form fields sent with every request
+        concurrency: Closed loop: number of clients. Open loop: cap on the
+            requests in flight
+        rate: Target requests per second; switches to the open loop
+        duration: Seconds to keep sending requests
+        requests: Total number of requests to send (stops before duration)
+        timeout: Per-request timeout in seconds
+        seed: Random seed of the open loop arrivals
+
+    Returns:
+        Report of LoadResult.report(), with the target rate when given
+    """
+    url = f"{base_url.rstrip('/')}/api/v1/verify"
+    run_id = uuid.uuid4().hex[:8]
+    result = LoadResult()
+    deadline = time.perf_counter() + duration if duration else None
+    sent = 0
+
+    def next_number() -> Optional[int]:
+        nonlocal sent
+        if (requests is not None and sent >= requests) or (deadline and time.perf_counter() >= deadline):
+            return None
+        sent += 1
+        return sent
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    async with aiohttp.ClientSession(connector=connector, timeout=client_timeout) as session:
+        if rate:
+            arrivals = random.Random(seed)
+            slots = asyncio.Semaphore(concurrency)
+            tasks = set()
+
+            async def one(number: int) -> None:
+                try:
+                    await _send(session, url, form_data, distinct_copy(image, f"{run_id}-{number}"), result)
+                finally:
+                    slots.release()
+
+            next_at = time.perf_counter()
+            while (number := next_number()) is not None:
+                await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+                # A full set of slots delays the arrivals: the achieved rate
+                # then falls short of the target
+                await slots.acquire()
+                task = asyncio.ensure_future(one(number))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                next_at += arrivals.expovariate(rate)
+            await asyncio.gather(*tasks)
+        else:
+            async def client() -> None:
+                while (number := next_number()) is not None:
+                    await _send(session, url, form_data, distinct_copy(image, f"{run_id}-{number}"), result)
+
+            await asyncio.gather(*(client() for _ in range(concurrency)))
+
+    result.finished = time.perf_counter()
+    report = result.report()
+    report["mode"] = "open" if rate else "closed"
+    report["concurrency"] = concurrency
+    if rate:
+        report["target_rps"] = rate
+    return report
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    """Print a load report in a readable form."""
+    target = f", target {report['target_rps']} req/s" if "target_rps" in report else ""
+    print(f"Mode: {report['mode']} loop, concurrency {report['concurrency']}{target}")
+    print(f"Requests: {report['requests']} in {report['duration_s']} s")
+    print(f"Throughput: {report['throughput_rps']} req/s ({report['success_rps']} successful)")
+    print(f"Error rate: {report['error_rate']:.2%}  outcomes: {report['outcomes']}")
+    print(f"Decisions: {report['decisions']}")
+    for label, key in (("Latency (all)", "latency_ms"), ("Latency (200)", "success_latency_ms")):
+        latency = report[key]
+        print(f"{label}: p50 {latency['p50']} ms, p95 {latency['p95']} ms, "
+              f"p99 {latency['p99']} ms, max {latency['max']} ms")
@@ -0,0 +1,224 @@
+"""
+KYC Verification API - Local Gemini Stand-in
+
+A local generateContent endpoint for load tests and offline development. It
+answers the OCR, metadata and decision prompts with well-formed results
+(the OCR answer echoes the submitted form values, so verifications pass),
+after a configurable latency, and injects server errors and 429 rate
+limiting the way the real API does:
+
+    python -m api.mock_gemini --port 8089 --latency 1.5 --jitter 0.5 --quota 10
+
+and point the KYC service at it:
+
+    GEMINI_ENDPOINT=http://127.0.0.1:8089/v1beta/models/mock:generateContent python app.py
+
+It also serves the Ollama /api/chat endpoint with the same behaviour, as a
+stand-in for the local backend (KYC_OCR_BACKENDS=gemini,ollama with
+KYC_OLLAMA_URL=http://127.0.0.1:8089).
+
+GET /stats reports the requests served and the errors injected.
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+OCR_FIELDS = ["full_name", "dob", "nationality", "id_number"]
+
+# Prompt fragments identifying each kind of call (see kyc_engine/shared.py)
+_OCR_MARKER = "ID card information extraction"
+_METADATA_MARKER = "EXIF metadata analysis"
+_DECISION_MARKER = "determine if an ID is authentic"
+
+_FORM_VALUE = re.compile(r'"form_value": "([^"]*)"')
+
+
+class MockConfig:
+    """Latency and failure behaviour of the stand-in."""
+
+    def __init__(self, latency: float = 1.0, jitter: float = 0.2, error_rate: float = 0.0,
+                 throttle_rate: float = 0.0, quota: float = 0.0, burst: Optional[float] = None,
+                 retry_after: float = 1.0, seed: Optional[int] = None):
+        """
+        Args:
+            latency: Mean response time in seconds
+            jitter: Standard deviation of the response time in seconds
+            error_rate: Share of requests answered with a 500 error
+            throttle_rate: Share of requests answered with a 429, regardless of the quota
+            quota: Requests per second served before answering 429 (0 = unlimited)
+            burst: Requests accepted at once before the quota applies (default: one second's worth)
+            retry_after: Retry-After header of the 429 answers, in seconds
+            seed: Random seed, for reproducible runs
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.quota = quota
+        self.burst = burst if burst is not None else max(quota, 1.0)
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+
+
+class Quota:
+    """Token bucket that refills at `rate` tokens per second up to `burst`."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self) -> bool:
+        """Take a token if one is available."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+def _prompt_text(body: Dict[str, Any]) -> str:
+    parts = body.get("contents", [{}])[0].get("parts", [])
+    return "".join(part.get("text", "") for part in parts)
+
+
+def _ocr_answer(prompt: str) -> Dict[str, Any]:
+    values: List[str] = _FORM_VALUE.findall(prompt)
+    values += [""] * (len(OCR_FIELDS) - len(values))
+    detailed = {
+        field: {"form_value": value, "founded_value": value, "match": True, "confidence": 95}
+        for field, value in zip(OCR_FIELDS, values)
+    }
+    return {
+        "status": "success",
+        "Similarity Score": 95,
+        "detected_language": "English",
+        "detailed_result": detailed,
+        "message": "Mock OCR: all fields match the form."
+    }
+
+
+def answer_for(prompt: str) -> Dict[str, Any]:
+    """
+    Build a well-formed answer for a KYC prompt.
+
+    Args:
+        prompt: Text of the request
+
+    Returns:
+        JSON answer in the format the prompt asks for
+    """
+    if _DECISION_MARKER in prompt:
+        return {"decision": "accept", "reason": "Mock decision: all checks passed."}
+    if _METADATA_MARKER in prompt:
+        return {"status": "success", "message": "Mock metadata analysis: no tampering found."}
+    if _OCR_MARKER in prompt:
+        return _ocr_answer(prompt)
+    return {"status": "success", "message": "Mock answer."}
+
+
+def _chat_prompt_text(body: Dict[str, Any]) -> str:
+    return "".join(message.get("content", "") for message in body.get("messages", []))
+
+
+def chat_response(answer: Dict[str, Any], model: str = "mock") -> Dict[str, Any]:
+    """Wrap an answer in the Ollama /api/chat response envelope."""
+    return {"model": model, "message": {"role": "assistant", "content": json.dumps(answer, ensure_ascii=False)},
+            "done": True}
+
+
+def generate_content_response(answer: Dict[str, Any]) -> Dict[str, Any]:
+    """Wrap an answer in the generateContent response envelope."""
+    text = "```json\n" + json.dumps(answer, ensure_ascii=False) + "\n```"
+    return {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "finishReason": "STOP"}]}
+
+
+def create_app(config: MockConfig) -> web.Application:
+    """
+    Build the stand-in application.
+
+    Args:
+        config: Latency and failure behaviour
+
+    Returns:
+        aiohttp application serving /v1beta/models/<model>:generateContent,
+        /api/chat and /stats
+    """
+    quota = Quota(config.quota, config.burst) if config.quota > 0 else None
+    stats = {"requests": 0, "ok": 0, "throttled": 0, "errors": 0, "in_flight": 0, "max_in_flight": 0}
+
+    async def serve(prompt: str, respond) -> web.Response:
+        stats["requests"] += 1
+        if (quota is not None and not quota.take()) or config.random.random() < config.throttle_rate:
+            stats["throttled"] += 1
+            return web.json_response(
+                {"error": {"code": 429, "message": "Resource has been exhausted", "status": "RESOURCE_EXHAUSTED"}},
+                status=429, headers={"Retry-After": f"{config.retry_after:g}"}
+            )
+
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        try:
+            await asyncio.sleep(max(0.0, config.random.gauss(config.latency, config.jitter)))
+        finally:
+            stats["in_flight"] -= 1
+
+        if config.random.random() < config.error_rate:
+            stats["errors"] += 1
+            return web.json_response(
+                {"error": {"code": 500, "message": "Internal error", "status": "INTERNAL"}}, status=500
+            )
+        stats["ok"] += 1
+        return web.json_response(respond(answer_for(prompt)))
+
+    async def generate_content(request: web.Request) -> web.Response:
+        if not request.match_info["model_action"].endswith(":generateContent"):
+            raise web.HTTPNotFound()
+        return await serve(_prompt_text(await request.json()), generate_content_response)
+
+    async def chat(request: web.Request) -> web.Response:
+        body = await request.json()
+        return await serve(_chat_prompt_text(body), lambda answer: chat_response(answer, body.get("model", "mock")))
+
+    async def get_stats(request: web.Request) -> web.Response:
+        return web.json_response(stats)
+
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app.router.add_post("/v1beta/models/{model_action}", generate_content)
+    app.router.add_post("/api/chat", chat)
+    app.router.add_get("/stats", get_stats)
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the Gemini generateContent API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=1.0, help="Mean response time in seconds")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Standard deviation of the response time")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument("--quota", type=float, default=0.0,
+                        help="Requests per second served before answering 429 (0 = unlimited)")
+    parser.add_argument("--burst", type=float, help="Requests accepted at once before the quota applies")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After of the 429 answers")
+    parser.add_argument("--seed", type=int, help="Random seed")
+    args = parser.parse_args()
+
+    config = MockConfig(args.latency, args.jitter, args.error_rate, args.throttle_rate,
+                        args.quota, args.burst, args.retry_after, args.seed)
+    print(f"Gemini stand-in on http://{args.host}:{args.port}/v1beta/models/mock:generateContent")
+    web.run_app(create_app(config), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,27 @@
 """
 KYC API Testing Tool
 
-Command-line utility for testing the KYC verification API endpoints.
+Command-line utility for testing the KYC verification API endpoints, and
+for load testing /api/v1/verify (see api/load_test.py):
+
+    python api/test_api.py --test load --concurrency 50 --duration 60
+    python api/test_api.py --test load --rate 20 --requests 1000 --report load.json
 """
 import os
 import sys
 import argparse
+import asyncio
+import json
 from typing import Dict, Any, Optional, Union, Tuple
 
 import requests
 
+# Import absolute paths to avoid relative import issues
+kyc_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if kyc_dir not in sys.path:
+    sys.path.insert(0, kyc_dir)
+from api.load_test import load_image_bytes, print_report, run_load
+
 
 def test_health_check(base_url: str) -> bool:
     """
@@ -64,6 +76,39 @@ def test_verify_kyc(base_url: str, image_path: str, form_data: Dict[str, str]) -
             files['id_image'].close()
 
 
+def test_load(base_url: str, image_path: Optional[str], form_data: Dict[str, str],
+              args: argparse.Namespace) -> bool:
+    """
+    Load test the KYC verification endpoint.
+    
+    Args:
+        base_url: Base URL of the KYC API
+        image_path: Path to ID card image, or None for a synthetic card
+        form_data: Dictionary containing form fields
+        args: Parsed load options (concurrency, rate, duration, requests,
+            timeout, report, max_error_rate)
+        
+    Returns:
+        True if the error rate stayed within --max-error-rate
+    """
+    if image_path and not os.path.exists(image_path):
+        print(f"Error: Image file not found at {image_path}")
+        return False
+
+    report = asyncio.run(run_load(
+        base_url, load_image_bytes(image_path), form_data,
+        concurrency=args.concurrency, rate=args.rate,
+        duration=None if args.requests else args.duration, requests=args.requests,
+        timeout=args.timeout
+    ))
+    print_report(report)
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report saved to {args.report}")
+    return report['requests'] > 0 and report['error_rate'] <= args.max_error_rate
+
+
 def main() -> int:
     """
     Main entry point for the API testing tool.
@@ -73,19 +118,28 @@ def main() -> int:
     """
     parser = argparse.ArgumentParser(description="Test the KYC API")
     parser.add_argument("--url", help="Base URL for the API", default="http://localhost:5000")
-    parser.add_argument("--test", help="Test to run (health, verify)", default="health")
+    parser.add_argument("--test", help="Test to run (health, verify, load)", default="health")
     parser.add_argument("--image", help="Path to ID image for verification")
     parser.add_argument("--name", help="Full name for verification")
     parser.add_argument("--dob", help="Date of birth for verification")
     parser.add_argument("--nationality", help="Nationality for verification")
     parser.add_argument("--id-number", help="ID number for verification")
+    parser.add_argument("--concurrency", type=int, default=10,
+                        help="Load: concurrent clients, or cap on requests in flight with --rate")
+    parser.add_argument("--rate", type=float, help="Load: target requests per second (open loop)")
+    parser.add_argument("--duration", type=float, default=30, help="Load: seconds to send requests for")
+    parser.add_argument("--requests", type=int, help="Load: total requests to send instead of --duration")
+    parser.add_argument("--timeout", type=float, default=120, help="Load: per-request timeout in seconds")
+    parser.add_argument("--report", help="Load: save the report as JSON to this file")
+    parser.add_argument("--max-error-rate", type=float, default=0.0,
+                        help="Load: error rate above which the test fails")
     
     args = parser.parse_args()
     
     if args.test == "health":
         success = test_health_check(args.url)
-    elif args.test == "verify":
-        if not args.image:
+    elif args.test in ("verify", "load"):
+        if args.test == "verify" and not args.image:
             print("Error: --image is required for verify test")
             return 1
         
@@ -96,7 +150,10 @@ def main() -> int:
             'id_number': args.id_number or "1234567890"
         }
         
-        success = test_verify_kyc(args.url, args.image, form_data)
+        if args.test == "verify":
+            success = test_verify_kyc(args.url, args.image, form_data)
+        else:
+            success = test_load(args.url, args.image, form_data, args)
     else:
         print(f"Unknown test: {args.test}")
         return 1
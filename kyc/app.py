@@ -3,41 +3,41 @@ KYC Verification System - Main Application
 
 A Flask-based web application for verifying user identities through document analysis.
 """
+import logging
 import os
 import sys
 import json
-from datetime import datetime
 
 from flask import Flask, request, jsonify, render_template
+from werkzeug.exceptions import HTTPException
 from werkzeug.utils import secure_filename
 
 # Import absolute paths to avoid relative import issues
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from kyc_engine.decision_making import run_pipeline, kyc_decision
-from api.kyc_service import kyc_api
+from kyc_engine.image_input import LoadedImage
+from kyc_engine.log_config import configure_logging
+from api.admission import admit, read_file
+from api.kyc_service import http_error, kyc_api
 from kyc_engine.shared import ensure_output_dir
 
+configure_logging()
+logger = logging.getLogger(__name__)
+
 # Initialize Flask app
 app = Flask(__name__)
 
-# Register API blueprint
+# Register API blueprint (also applies the upload limits to this app)
 app.register_blueprint(kyc_api)
 
 # Configuration
-UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
 
-# Create required directories
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
-
 # Initialize the output directories
 ensure_output_dir()
 ensure_output_dir('temp')
 ensure_output_dir('analysis')
 
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-
 
 def allowed_file(filename: str) -> bool:
     """
@@ -76,11 +76,8 @@ def verify_kyc():
             return jsonify({'error': 'No selected file'}), 400
 
         if file and allowed_file(file.filename):
-            # Create unique filename with timestamp
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"{timestamp}_{secure_filename(file.filename)}"
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
+            # Keep the upload in memory; every stage shares this single decode
+            image = LoadedImage.from_bytes(read_file(file), secure_filename(file.filename))
 
             # Prepare form data
             form_data = {
@@ -90,14 +87,12 @@ def verify_kyc():
                 'id_number': request.form.get('id_number')
             }
 
-            # Run KYC pipeline
-            pipeline_results = run_pipeline(form_data, filepath)
-
-            # Get final decision
-            decision = kyc_decision(pipeline_results)
+            with admit(image):
+                # Run KYC pipeline
+                pipeline_results = run_pipeline(form_data, image)
 
-            # Clean up uploaded file
-            os.remove(filepath)
+                # Get final decision
+                decision = kyc_decision(pipeline_results)
 
             # Parse the decision as JSON
             try:
@@ -117,7 +112,11 @@ def verify_kyc():
 
         return jsonify({'error': 'Invalid file type'}), 400
 
+    except HTTPException as e:
+        body, status, headers = http_error(e)
+        return jsonify({'error': body['message']}), status, headers
     except Exception as e:
+        logger.exception('Request failed')
         return jsonify({'error': str(e)}), 500
 
 
@@ -0,0 +1,355 @@
+"""
+Microbenchmarks for the kyc_engine hot paths.
+
+Times the forensic and encoding stages on the synthetic cards of
+benchmarks/synthetic.py, offline and without any model call, and records the
+detection scores next to the timings. Each run is saved as JSON under
+output/benchmarks/ and compared with a baseline run: the run fails if a
+benchmark got slower than --max-regression percent, or if a verdict or score
+changed, so a speedup cannot quietly change what the checks report. Every run
+also checks the copy-move search on its own: it must find the clone on the
+cloned cards and nothing on the clean and spliced ones.
+
+    python -m benchmarks.run_benchmarks --save-baseline   # on the base commit
+    python -m benchmarks.run_benchmarks                   # after the change
+
+Timings are only comparable on the same machine and settings; the baseline
+records both and a mismatch is reported.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# Import absolute paths to avoid relative import issues
+kyc_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if kyc_dir not in sys.path:
+    sys.path.insert(0, kyc_dir)
+from kyc_engine.analysis_scale import analysis_image, at_reference_scale, detail_tiles
+from kyc_engine.ela_check import ela_analysis
+from kyc_engine.image_forensics import (
+    analyze_edges,
+    analyze_noise,
+    copy_move_search,
+    jpeg_artifact_analysis,
+    pixel_level_check
+)
+from kyc_engine.image_input import LoadedImage
+from kyc_engine.metadata_check import extract_metadata
+from kyc_engine.shared import (
+    ANALYSIS_DETAIL_TILES,
+    ANALYSIS_MAX_SIDE,
+    ANALYSIS_TILE_SIZE,
+    MODEL_IMAGE_MAX_SIDE,
+    MODEL_IMAGE_QUALITY,
+    OUTPUT_DIR,
+    encode_image
+)
+from benchmarks.synthetic import DEFAULT_WIDTHS, QUICK_WIDTHS, card_set
+
+RESULTS_DIR = os.path.join(OUTPUT_DIR, "benchmarks")
+DEFAULT_BASELINE = os.path.join(RESULTS_DIR, "baseline.json")
+
+# Slowdowns below this many milliseconds are timer noise, whatever the percentage
+MIN_REGRESSION_MS = 1.0
+
+# Numeric scores may drift by this share of their baseline value (or by
+# SCORE_ABS_TOLERANCE, whichever is larger); the noise metric is randomized
+SCORE_REL_TOLERANCE = 0.05
+SCORE_ABS_TOLERANCE = 0.02
+
+# A pasted photo patch must raise the ELA error level at least this many times
+# above the clean card of the same width (it scores about twice as high)
+PASTE_MIN_ELA_RATIO = 1.5
+
+
+def _fresh(data: bytes) -> Callable[[], LoadedImage]:
+    """Input factory: a new upload per run, so decoding is part of the timing."""
+    return lambda: LoadedImage.from_bytes(data, "card.jpg")
+
+
+def _fixed(value: Any) -> Callable[[], Any]:
+    """Input factory for the sub-metrics, which take already decoded pixels."""
+    return lambda: value
+
+
+def benchmarks_for(data: bytes) -> Dict[str, Tuple[Callable[[Any], Any], Callable[[], Any]]]:
+    """
+    Build the benchmarks of one card.
+
+    Args:
+        data: JPEG content of the card
+
+    Returns:
+        Mapping of benchmark name to (function, input factory); the input is
+        created outside of the timed section
+    """
+    image = LoadedImage.from_bytes(data, "card.jpg")
+    coarse, _ = analysis_image(image)
+    tiles = detail_tiles(image)
+    return {
+        "ela_analysis": (ela_analysis, _fresh(data)),
+        "pixel_level_check": (pixel_level_check, _fresh(data)),
+        "forensics.edges": (lambda bgr: analyze_edges(at_reference_scale(bgr)), _fixed(coarse)),
+        "forensics.noise": (analyze_noise, _fixed(coarse)),
+        "forensics.cloning": (copy_move_search, _fixed(coarse)),
+        "forensics.artifacts": (lambda parts: [jpeg_artifact_analysis(tile) for tile in parts], _fixed(tiles)),
+        "extract_metadata": (extract_metadata, _fresh(data)),
+        "encode_image": (encode_image, _fresh(data))
+    }
+
+
+def measure(func: Callable[[Any], Any], make_input: Callable[[], Any],
+            repeats: int, warmup: int) -> Tuple[Dict[str, float], Any]:
+    """
+    Time a function over several runs.
+
+    Args:
+        func: Function to time
+        make_input: Creates the argument of each run (not timed)
+        repeats: Number of timed runs
+        warmup: Number of untimed runs first
+
+    Returns:
+        Tuple of (median, min and max milliseconds, output of the last run)
+    """
+    for _ in range(warmup):
+        func(make_input())
+    runs = []
+    output = None
+    for _ in range(repeats):
+        argument = make_input()
+        start = time.perf_counter()
+        output = func(argument)
+        runs.append((time.perf_counter() - start) * 1000)
+    return {
+        "median_ms": round(statistics.median(runs), 3),
+        "min_ms": round(min(runs), 3),
+        "max_ms": round(max(runs), 3)
+    }, output
+
+
+def detection_scores(outputs: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Extract the verdicts and scores to keep from the benchmark outputs.
+
+    Args:
+        outputs: Output of the last run of each benchmark
+
+    Returns:
+        Scores by check; statuses must match the baseline exactly, numbers
+        within tolerance
+    """
+    scores: Dict[str, Any] = {}
+    if "ela_analysis" in outputs:
+        ela = outputs["ela_analysis"]
+        scores["ela"] = {"status": ela["status"], "error_level": ela["error_level"]}
+    if "pixel_level_check" in outputs:
+        forensics = outputs["pixel_level_check"]
+        regions = forensics["cloned_regions"]
+        scores["forensics"] = {
+            "status": forensics["status"],
+            "score": forensics["score"],
+            **forensics["details"],
+            "largest_clone_blocks": max((region["blocks"] for region in regions), default=0)
+        }
+    if "extract_metadata" in outputs:
+        metadata = outputs["extract_metadata"]
+        scores["metadata"] = {"format": metadata.get("format"), "exif_tags": len(metadata.get("exif", {}))}
+    if "encode_image" in outputs:
+        scores["encode_image"] = {"base64_length": len(outputs["encode_image"] or "")}
+    return scores
+
+
+def detection_problems(scores: Dict[str, Any]) -> List[str]:
+    """
+    Check the verdicts against what each synthetic card contains.
+
+    Independent of the baseline: cloned cards must report a cloned region,
+    the other cards none (their guilloche and lettering repeat, but are not
+    copy-moves). A pasted patch must raise the ELA error level well above
+    that of the clean card of the same width.
+
+    Args:
+        scores: Scores by case, as returned by detection_scores
+
+    Returns:
+        One message per wrong verdict; empty if every card is judged right
+    """
+    problems = []
+    for case, checks in scores.items():
+        forensics = checks.get("forensics")
+        if forensics is None:
+            continue
+        cloned = forensics["largest_clone_blocks"] > 0
+        if cloned != case.endswith("/clone"):
+            problems.append(f"{case} forensics: cloned regions {'found' if cloned else 'missed'}")
+
+    for case, checks in scores.items():
+        width, _, variant = case.partition("/")
+        clean = scores.get(f"{width}/clean", {}).get("ela")
+        if variant != "paste" or "ela" not in checks or clean is None:
+            continue
+        level, clean_level = checks["ela"]["error_level"], clean["error_level"]
+        if level < clean_level * PASTE_MIN_ELA_RATIO:
+            problems.append(f"{case} ela: error level {level} against {clean_level} on the clean card")
+    return problems
+
+
+def environment() -> Dict[str, Any]:
+    """Machine, library versions and settings the timings depend on."""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "settings": {
+            "KYC_ANALYSIS_MAX_SIDE": ANALYSIS_MAX_SIDE,
+            "KYC_ANALYSIS_DETAIL_TILES": ANALYSIS_DETAIL_TILES,
+            "KYC_ANALYSIS_TILE_SIZE": ANALYSIS_TILE_SIZE,
+            "KYC_MODEL_IMAGE_MAX_SIDE": MODEL_IMAGE_MAX_SIDE,
+            "KYC_MODEL_IMAGE_QUALITY": MODEL_IMAGE_QUALITY
+        }
+    }
+
+
+def run(widths: Tuple[int, ...], repeats: int, warmup: int,
+        only: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Run the benchmarks on every synthetic card.
+
+    Args:
+        widths: Card widths to generate
+        repeats: Timed runs per benchmark
+        warmup: Untimed runs per benchmark
+        only: Benchmark names to run; all if None
+
+    Returns:
+        Results document with the environment, timings and scores per case
+    """
+    results: Dict[str, Any] = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "environment": environment(),
+        "repeats": repeats,
+        "timings": {},
+        "scores": {}
+    }
+    for case, data in card_set(widths).items():
+        timings = {}
+        outputs = {}
+        for name, (func, make_input) in benchmarks_for(data).items():
+            if only and name not in only:
+                continue
+            timings[name], outputs[name] = measure(func, make_input, repeats, warmup)
+            print(f"{case:<14} {name:<22} {timings[name]['median_ms']:>10.2f} ms")
+        results["timings"][case] = timings
+        results["scores"][case] = detection_scores(outputs)
+    return results
+
+
+def _score_changed(current: Any, baseline: Any) -> bool:
+    if isinstance(baseline, (int, float)) and isinstance(current, (int, float)):
+        tolerance = max(SCORE_ABS_TOLERANCE, SCORE_REL_TOLERANCE * abs(baseline))
+        return abs(current - baseline) > tolerance
+    return current != baseline
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """
+    Compare a run with the baseline.
+
+    Args:
+        current: Results of this run
+        baseline: Results of the baseline run
+        max_regression: Allowed slowdown of a median, in percent
+
+    Returns:
+        One message per regression or changed score; empty if the run passes
+    """
+    problems = []
+    for case, timings in current["timings"].items():
+        for name, timing in timings.items():
+            base = baseline["timings"].get(case, {}).get(name)
+            if base is None:
+                continue
+            slower = timing["median_ms"] - base["median_ms"]
+            if slower > MIN_REGRESSION_MS and slower > base["median_ms"] * max_regression / 100:
+                problems.append(f"{case} {name}: {base['median_ms']:.2f} ms -> {timing['median_ms']:.2f} ms "
+                                f"(+{100 * slower / base['median_ms']:.0f}%)")
+
+    for case, checks in current["scores"].items():
+        for check, values in checks.items():
+            base_values = baseline["scores"].get(case, {}).get(check)
+            if base_values is None:
+                continue
+            for key, value in values.items():
+                if key in base_values and _score_changed(value, base_values[key]):
+                    problems.append(f"{case} {check}.{key}: {base_values[key]!r} -> {value!r}")
+    return problems
+
+
+def _save(results: Dict[str, Any], path: str) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the kyc_engine hot paths on synthetic cards.")
+    parser.add_argument("--quick", action="store_true",
+                        help=f"Only the {', '.join(map(str, QUICK_WIDTHS))} px cards")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs per benchmark")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed runs per benchmark")
+    parser.add_argument("--only", help="Comma-separated benchmark names, e.g. ela_analysis,forensics.cloning")
+    parser.add_argument("--output", help="Results file (default: output/benchmarks/results-<time>.json)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline results to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the baseline")
+    parser.add_argument("--max-regression", type=float, default=20.0,
+                        help="Allowed slowdown of a median, in percent")
+    args = parser.parse_args()
+
+    only = args.only.split(",") if args.only else None
+    results = run(QUICK_WIDTHS if args.quick else DEFAULT_WIDTHS, args.repeats, args.warmup, only)
+
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime("results-%Y%m%d-%H%M%S.json"))
+    _save(results, output)
+    print(f"Results saved to {output}")
+
+    wrong = detection_problems(results["scores"])
+    for problem in wrong:
+        print(f"WRONG VERDICT {problem}")
+    if wrong:
+        sys.exit(1)
+
+    if args.save_baseline:
+        _save(results, args.baseline)
+        print(f"Baseline saved to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare with; store one with --save-baseline")
+        return
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("environment") != results["environment"]:
+        print("Warning: the baseline was recorded on another machine or with other settings; "
+              "timings may not be comparable")
+    problems = compare(results, baseline, args.max_regression)
+    for problem in problems:
+        print(f"REGRESSION {problem}")
+    if problems:
+        sys.exit(1)
+    print(f"No regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Synthetic ID-card images for the benchmarks.
+
+Images are generated from a fixed seed, so every run and every machine
+benchmarks the same pixels. Each card has the usual ingredients of an ID
+photo: a guilloche background, a portrait, text fields and camera noise,
+and is saved as a camera JPEG with EXIF data.
+
+Tampered variants reproduce the edits the forensic stages look for:
+
+- clone: a block of the card (a text field) is copied elsewhere on the card;
+- splice: a text field is painted over with new, noise-free text after the
+  camera compression and the result saved again, as an editor would;
+- paste: a patch of another photo, never compressed by the camera, is pasted
+  into the plain background and the result saved again. The background has
+  little detail, so the edit is only found by looking at every pixel.
+
+Sample files for the kyc_engine __main__ demos can be written with:
+
+    python -m benchmarks.synthetic output/benchmarks/samples
+"""
+import io
+import os
+import sys
+from typing import Dict, List, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# ID-1 card aspect ratio (85.60 x 53.98 mm)
+CARD_ASPECT = 85.60 / 53.98
+
+# Card widths benchmarked by default: a small upload, the analysis size, a
+# scanned card and a 12-megapixel phone photo. The quick run keeps one width
+# above KYC_ANALYSIS_MAX_SIDE, so the native-resolution paths are exercised
+DEFAULT_WIDTHS = (640, 1280, 2560, 4032)
+QUICK_WIDTHS = (640, 1280, 2560)
+
+VARIANTS = ("clean", "clone", "splice", "paste")
+
+# JPEG quality of the camera, and of the editor saving a spliced card
+CAMERA_QUALITY = 85
+EDITOR_QUALITY = 95
+
+SEED = 1234
+
+_FONT = cv2.FONT_HERSHEY_SIMPLEX
+_LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+
+
+def _guilloche(height: int, width: int) -> np.ndarray:
+    """Pale two-tone background with the wavy line pattern of security print."""
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    x /= width
+    y /= height
+    waves = np.sin(40 * x + 6 * np.sin(9 * y)) * np.cos(30 * y + 4 * np.sin(7 * x))
+    base = np.empty((height, width, 3), np.float32)
+    base[..., 0] = 225 + 15 * x
+    base[..., 1] = 232 - 10 * y
+    base[..., 2] = 238 - 12 * x
+    return np.clip(base + 10 * waves[..., None], 0, 255).astype(np.uint8)
+
+
+def _field_boxes(height: int, width: int) -> List[Tuple[int, int, int, int]]:
+    """Boxes (x, y, w, h) of the text fields, right of the portrait."""
+    left = int(width * 0.36)
+    line = height // 9
+    return [(left, int(height * 0.22) + i * line, int(width * 0.56), int(line * 0.8)) for i in range(5)]
+
+
+def _text(rng: np.random.Generator, length: int) -> str:
+    return "".join(rng.choice(list(_LETTERS), length))
+
+
+def _draw_field(card: np.ndarray, box: Tuple[int, int, int, int], text: str,
+                rng: np.random.Generator) -> None:
+    """Print text in a field, jittering the size and baseline of each glyph
+    so repeated letters are not pixel-exact copies of each other."""
+    x, y, w, h = box
+    base = h / 40
+    for char in text:
+        scale = base * rng.uniform(0.9, 1.1)
+        baseline = y + int(h * 0.8 + rng.uniform(-0.05, 0.05) * h)
+        cv2.putText(card, char, (x, baseline), _FONT, scale, (40, 35, 30),
+                    max(1, int(round(scale * 2))), cv2.LINE_AA)
+        x += int(cv2.getTextSize(char, _FONT, scale, 1)[0][0] * 1.15) + 1
+
+
+def _render_card(width: int, rng: np.random.Generator) -> np.ndarray:
+    """Draw an untouched card as BGR pixels, before camera noise."""
+    height = int(round(width / CARD_ASPECT))
+    card = _guilloche(height, width)
+
+    # Header band and portrait
+    cv2.rectangle(card, (0, 0), (width, int(height * 0.14)), (120, 70, 30), -1)
+    cv2.putText(card, "IDENTITY CARD", (int(width * 0.04), int(height * 0.1)), _FONT,
+                height / 320, (245, 245, 245), max(1, height // 160), cv2.LINE_AA)
+    px, py, pw, ph = int(width * 0.05), int(height * 0.22), int(width * 0.26), int(height * 0.62)
+    cv2.rectangle(card, (px, py), (px + pw, py + ph), (190, 195, 200), -1)
+    cv2.ellipse(card, (px + pw // 2, py + ph * 2 // 5), (pw // 4, ph // 4), 0, 0, 360, (120, 150, 190), -1)
+    cv2.ellipse(card, (px + pw // 2, py + ph), (pw * 2 // 5, ph // 3), 0, 180, 360, (70, 60, 60), -1)
+
+    for box in _field_boxes(height, width):
+        _draw_field(card, box, _text(rng, 12), rng)
+    return card
+
+
+def _camera(card: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """Add sensor noise and a slight blur, as a phone camera would."""
+    noisy = card.astype(np.float32) + rng.normal(0, 3.0, card.shape)
+    return cv2.GaussianBlur(np.clip(noisy, 0, 255).astype(np.uint8), (3, 3), 0.6)
+
+
+def _jpeg(bgr: np.ndarray, quality: int, software: str = "") -> bytes:
+    """Encode BGR pixels as a JPEG with camera EXIF (and the editor, if any)."""
+    exif = Image.Exif()
+    exif[0x010F] = "SynthCam"                # Make
+    exif[0x0110] = "SC-1"                    # Model
+    exif[0x0132] = "2024:05:01 10:30:00"     # DateTime
+    if software:
+        exif[0x0131] = software              # Software
+    buffer = io.BytesIO()
+    Image.fromarray(bgr[..., ::-1]).save(buffer, "JPEG", quality=quality, exif=exif)
+    return buffer.getvalue()
+
+
+def _decode(data: bytes) -> np.ndarray:
+    return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+
+def make_card(width: int, variant: str = "clean", seed: int = SEED) -> bytes:
+    """
+    Generate one synthetic ID card photo.
+
+    Args:
+        width: Card width in pixels; the height follows the ID-1 aspect ratio
+        variant: clean, clone, splice or paste (see module docstring)
+        seed: Random seed; the same arguments always give the same bytes
+
+    Returns:
+        JPEG file content
+    """
+    if variant not in VARIANTS:
+        raise ValueError(f"Unknown variant: {variant}")
+    rng = np.random.default_rng(seed)
+    card = _render_card(width, rng)
+    height = card.shape[0]
+    boxes = _field_boxes(height, width)
+
+    if variant == "clone":
+        # Copy-move: the first field is copied over the last, camera noise and all
+        photo = _camera(card, rng)
+        (sx, sy, w, h), (tx, ty, _, _) = boxes[0], boxes[-1]
+        photo[ty:ty + h, tx:tx + w] = photo[sy:sy + h, sx:sx + w]
+        return _jpeg(photo, CAMERA_QUALITY)
+
+    photo = _camera(card, rng)
+    if variant == "clean":
+        return _jpeg(photo, CAMERA_QUALITY)
+
+    # Splice and paste: edit the decoded camera JPEG and save it again
+    edited = _decode(_jpeg(photo, CAMERA_QUALITY))
+    if variant == "paste":
+        # Fine photo texture, in the background below the text fields
+        side = int(width * 0.075)
+        x, y = int(width * 0.72), int(height * 0.8)
+        texture = rng.integers(0, 256, (side, side, 3)).astype(np.uint8)
+        edited[y:y + side, x:x + side] = cv2.GaussianBlur(texture, (0, 0), 1.0)
+        return _jpeg(edited, EDITOR_QUALITY, software="Adobe Photoshop 25.0")
+
+    x, y, w, h = boxes[1]
+    patch = np.full((h, w, 3), 236, np.uint8)
+    _draw_field(patch, (0, 0, w, h), _text(rng, 12), rng)
+    edited[y:y + h, x:x + w] = patch
+    return _jpeg(edited, EDITOR_QUALITY, software="Adobe Photoshop 25.0")
+
+
+def card_set(widths: Tuple[int, ...] = DEFAULT_WIDTHS) -> Dict[str, bytes]:
+    """
+    Generate every variant at every width.
+
+    Args:
+        widths: Card widths in pixels
+
+    Returns:
+        Mapping of case name ("<width>/<variant>") to JPEG content
+    """
+    return {f"{width}/{variant}": make_card(width, variant) for width in widths for variant in VARIANTS}
+
+
+if __name__ == "__main__":
+    target = sys.argv[1] if len(sys.argv) > 1 else os.path.join("output", "benchmarks", "samples")
+    os.makedirs(target, exist_ok=True)
+    for case, data in card_set().items():
+        path = os.path.join(target, case.replace("/", "_") + ".jpg")
+        with open(path, "wb") as f:
+            f.write(data)
+        print(path)
@@ -0,0 +1,17 @@
+"""
+Shared setup of the unit tests in tests/.
+
+Run from the kyc directory:
+
+    python -m pytest
+"""
+import os
+import sys
+
+# Import absolute paths to avoid relative import issues
+kyc_dir = os.path.dirname(os.path.abspath(__file__))
+if kyc_dir not in sys.path:
+    sys.path.insert(0, kyc_dir)
+
+# Command-line client for a running server, not a test module
+collect_ignore = [os.path.join("api", "test_api.py")]
@@ -0,0 +1,140 @@
+"""
+Resolution policy for the forensic stages.
+
+Forensic checks do not get more reliable on a 12-megapixel phone photo than on
+a card-sized image, but they get an order of magnitude slower. The stages
+therefore work on a two-level pyramid:
+
+- a coarse analysis image, capped at ANALYSIS_MAX_SIDE on its longest side
+  (decoded at reduced JPEG scale when possible), for global metrics such as
+  edges, noise, copy-move and perceptual hashing;
+- native-resolution pixels for metrics that depend on the original JPEG
+  block grid. Averaged metrics (compression artifacts) use a few detail
+  tiles aligned to the 8x8 grid, whose number and size are capped, so their
+  cost does not grow with the camera either. ELA looks for the worst region,
+  which may be anywhere, so it streams the whole image in grid-aligned
+  strips instead.
+
+Images already within the cap are analysed exactly as before: the analysis
+image is the full image and the only detail tile is the whole image.
+"""
+from typing import Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from .image_input import ImageSource, load_image
+from .shared import ANALYSIS_DETAIL_TILES, ANALYSIS_MAX_SIDE, ANALYSIS_TILE_SIZE
+
+# Longest side at which scale-dependent metrics (edge strength) are measured;
+# their thresholds are calibrated at this size
+ANALYSIS_REFERENCE_SIDE = 1280
+
+
+def analysis_image(image: ImageSource) -> Tuple[Optional[np.ndarray], float]:
+    """
+    Get the capped analysis image of a stage input.
+
+    Reduced-scale JPEG decoding is used when no full-resolution pixels will
+    be needed, i.e. when detail tiles are disabled.
+
+    Args:
+        image: Path to the image or a LoadedImage
+
+    Returns:
+        Tuple of (BGR analysis image or None if undecodable, scale of the
+        analysis image relative to the original upload)
+    """
+    image = load_image(image)
+    reduced = image.reduced_bgr(ANALYSIS_MAX_SIDE, draft=ANALYSIS_DETAIL_TILES <= 0)
+    if reduced is None:
+        return None, 1.0
+    scale = max(reduced.shape[:2]) / max(max(image.size), 1)
+    return reduced, min(scale, 1.0)
+
+
+def at_reference_scale(bgr: np.ndarray) -> np.ndarray:
+    """
+    Resize an image so its longest side is ANALYSIS_REFERENCE_SIDE.
+
+    Args:
+        bgr: OpenCV image array
+
+    Returns:
+        Resized image, so metrics measured on it are comparable across uploads
+    """
+    scale = ANALYSIS_REFERENCE_SIDE / max(bgr.shape[:2])
+    if abs(scale - 1.0) < 1e-3:
+        return bgr
+    interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
+    return cv2.resize(bgr, None, fx=scale, fy=scale, interpolation=interpolation)
+
+
+def _native_pixels(image: ImageSource) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+    """Get the analysis image and, for uploads above the cap, the full-resolution pixels."""
+    image = load_image(image)
+    coarse, scale = analysis_image(image)
+    if coarse is None or scale >= 1.0 or ANALYSIS_DETAIL_TILES <= 0:
+        return coarse, None
+    full = image.bgr
+    if full is None or max(full.shape[:2]) <= max(coarse.shape[:2]):
+        # Only reduced pixels exist (e.g. a capped copy sent to a worker)
+        return coarse, None
+    return coarse, full
+
+
+def native_strips(image: ImageSource) -> Iterator[np.ndarray]:
+    """
+    Stream the whole image at native resolution, one strip at a time.
+
+    Strips span the full width and are ANALYSIS_TILE_SIZE rows high, rounded
+    to the 16-row JPEG MCU, so each strip keeps the block grid of the upload
+    and only one strip is recompressed at a time.
+
+    Args:
+        image: Path to the image or a LoadedImage
+
+    Yields:
+        BGR strips covering the image; the capped analysis image alone if it
+        is within the cap or the full-resolution pixels are not available
+    """
+    coarse, full = _native_pixels(image)
+    if full is None:
+        if coarse is not None:
+            yield coarse
+        return
+    rows = max(16, ANALYSIS_TILE_SIZE // 16 * 16)
+    for top in range(0, full.shape[0], rows):
+        yield full[top:top + rows]
+
+
+def detail_tiles(image: ImageSource) -> List[np.ndarray]:
+    """
+    Pick native-resolution tiles, spread evenly over the image, for
+    fine-detail metrics averaged over the whole image.
+
+    Args:
+        image: Path to the image or a LoadedImage
+
+    Returns:
+        List of BGR tiles; the whole image if it is within the cap or the
+        full-resolution pixels are not available
+    """
+    coarse, full = _native_pixels(image)
+    if coarse is None:
+        return []
+    if full is None:
+        return [coarse]
+
+    height, width = full.shape[:2]
+    tile = min(ANALYSIS_TILE_SIZE, height, width) // 8 * 8
+    rows, cols = height // tile, width // tile
+    count = min(ANALYSIS_DETAIL_TILES, rows * cols)
+    chosen = np.linspace(0, rows * cols - 1, count).round().astype(int)
+
+    # Tile origins are multiples of the tile size, so they stay on the 8x8 JPEG grid
+    return [
+        full[(index // cols) * tile:(index // cols + 1) * tile,
+             (index % cols) * tile:(index % cols + 1) * tile]
+        for index in chosen
+    ]
@@ -0,0 +1,340 @@
+"""
+Content-addressed result cache for pipeline stages.
+
+Stage results are keyed by the SHA-256 of the uploaded image bytes (plus the
+normalized form data for OCR), so resubmitting the same ID photo reuses the
+earlier ELA, forensics, metadata and OCR results instead of re-running them.
+Identical requests that arrive while a computation is in flight wait for that
+computation instead of starting their own, in threads and on the event loop.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+import weakref
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import Executor, Future
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from .shared import (
+    CACHE_BACKEND,
+    CACHE_MAX_ENTRIES,
+    CACHE_PATH,
+    CACHE_TTL,
+    is_api_failure
+)
+
+# Bump to invalidate cached results when a stage's output changes
+CACHE_VERSION = 2
+
+
+class CacheBackend(ABC):
+    """Storage interface for cached stage results (JSON-serializable values)."""
+
+    # Whether get and set block on I/O; the event loop then runs them in an executor
+    blocking = True
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value, or None on a miss or expired entry."""
+
+    @abstractmethod
+    def set(self, key: str, value: Any) -> None:
+        """Store a value, evicting the least recently used entries if full."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove all entries."""
+
+
+class MemoryCache(CacheBackend):
+    """In-process LRU cache bounded by entry count and TTL."""
+
+    blocking = False
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl: float = CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, payload = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        # Values are stored serialized so callers never share mutable results
+        return json.loads(payload)
+
+    def set(self, key: str, value: Any) -> None:
+        payload = json.dumps(value)
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCache(CacheBackend):
+    """On-disk LRU cache in a SQLite file, shared by all processes using the same path."""
+
+    def __init__(self, path: str = CACHE_PATH, max_entries: int = CACHE_MAX_ENTRIES,
+                 ttl: float = CACHE_TTL):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS stage_cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS stage_cache_accessed ON stage_cache (accessed_at)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM stage_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._conn.execute("DELETE FROM stage_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute(
+                "UPDATE stage_cache SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any) -> None:
+        now = time.time()
+        payload = json.dumps(value)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO stage_cache (key, value, expires_at, accessed_at)"
+                " VALUES (?, ?, ?, ?)",
+                (key, payload, now + self.ttl, now)
+            )
+            self._conn.execute("DELETE FROM stage_cache WHERE expires_at < ?", (now,))
+            self._conn.execute(
+                "DELETE FROM stage_cache WHERE key IN ("
+                " SELECT key FROM stage_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM stage_cache")
+            self._conn.commit()
+
+
+class StageCache:
+    """
+    Read-through cache that coalesces identical in-flight computations.
+    """
+
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        # In-flight tasks of the asyncio path, per event loop
+        self._async_inflight: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Task]]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any],
+                       cacheable: Callable[[Any], bool] = lambda value: True) -> Any:
+        """
+        Return the cached value for key, computing and storing it on a miss.
+
+        If another thread is already computing the same key, wait for its
+        result instead of computing it again.
+
+        Args:
+            key: Cache key
+            compute: Function producing the value on a miss
+            cacheable: Predicate deciding whether a computed value is stored
+
+        Returns:
+            Cached or freshly computed value
+        """
+        value = self.backend.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = compute()
+            if value is not None and cacheable(value):
+                self.backend.set(key, value)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    async def _backend_call(self, executor: Optional[Executor], method: Callable[..., Any],
+                            *args: Any) -> Any:
+        """Run a backend method, off the event loop if it blocks."""
+        if not self.backend.blocking:
+            return method(*args)
+        return await asyncio.get_running_loop().run_in_executor(executor, method, *args)
+
+    async def _compute_async(self, key: str, factory: Callable[[], Awaitable[Any]],
+                             cacheable: Callable[[Any], bool], executor: Optional[Executor]) -> Any:
+        value = await factory()
+        if value is not None and cacheable(value):
+            await self._backend_call(executor, self.backend.set, key, value)
+        return value
+
+    async def aget_or_compute(self, key: str, factory: Callable[[], Awaitable[Any]],
+                              cacheable: Callable[[Any], bool] = lambda value: True,
+                              executor: Optional[Executor] = None) -> Any:
+        """
+        Asyncio counterpart of get_or_compute.
+
+        Backend reads and writes run in an executor, so a SQLite cache does not
+        block the event loop. Coroutines asking for a key that is already being
+        computed on the same loop await that computation. The computation runs
+        as its own task: a cancelled waiter does not cancel it for the others.
+
+        Args:
+            key: Cache key
+            factory: Function creating the awaitable that computes the value on a miss
+            cacheable: Predicate deciding whether a computed value is stored
+            executor: Executor for blocking backend calls; the loop's default if None
+
+        Returns:
+            Cached or freshly computed value
+        """
+        loop = asyncio.get_running_loop()
+        inflight = self._async_inflight.setdefault(loop, {})
+        task = inflight.get(key)
+        if task is None:
+            value = await self._backend_call(executor, self.backend.get, key)
+            if value is not None:
+                return value
+            # Another coroutine may have started the computation during the read
+            task = inflight.get(key)
+        if task is None:
+            task = loop.create_task(self._compute_async(key, factory, cacheable, executor))
+            inflight[key] = task
+
+            def done(finished: "asyncio.Task") -> None:
+                if inflight.get(key) is finished:
+                    del inflight[key]
+                # Mark the exception retrieved if every waiter was cancelled
+                if not finished.cancelled():
+                    finished.exception()
+
+            task.add_done_callback(done)
+        return await asyncio.shield(task)
+
+
+def is_cacheable(result: Any) -> bool:
+    """
+    Decide whether a stage result may be cached.
+
+    Errors and API failures are transient and must be retried on resubmission.
+
+    Args:
+        result: Stage output
+
+    Returns:
+        True if the result is a successful, JSON-serializable stage output
+    """
+    if not isinstance(result, dict):
+        return False
+    if "error" in result or result.get("status") == "error":
+        return False
+    return not is_api_failure(result)
+
+
+def _normalize_text(value: Optional[str]) -> str:
+    """Normalize a form value so trivially different spellings share a key."""
+    value = unicodedata.normalize("NFKC", value or "")
+    return " ".join(value.split()).casefold()
+
+
+def stage_key(stage: str, image_hash: str, form_data: Optional[Dict[str, str]] = None) -> str:
+    """
+    Build the cache key of a stage result.
+
+    Args:
+        stage: Stage name (OCR, Metadata, ELA, Forensics)
+        image_hash: SHA-256 hex digest of the image bytes
+        form_data: Submitted form data, for stages whose result depends on it
+
+    Returns:
+        Cache key string
+    """
+    key = f"v{CACHE_VERSION}:{stage}:{image_hash}"
+    if form_data is not None:
+        normalized = json.dumps(
+            {field: _normalize_text(value) for field, value in sorted(form_data.items())},
+            ensure_ascii=False
+        )
+        key += ":" + hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+    return key
+
+
+_stage_cache: Optional[StageCache] = None
+_stage_cache_lock = threading.Lock()
+
+
+def get_stage_cache() -> Optional[StageCache]:
+    """
+    Get the process-wide stage cache configured by KYC_CACHE_BACKEND.
+
+    Returns:
+        StageCache instance, or None if caching is disabled
+    """
+    global _stage_cache
+    if CACHE_BACKEND == "none":
+        return None
+    with _stage_cache_lock:
+        if _stage_cache is None:
+            if CACHE_BACKEND == "sqlite":
+                backend = SQLiteCache()
+            else:
+                backend = MemoryCache()
+            _stage_cache = StageCache(backend)
+        return _stage_cache
@@ -0,0 +1,209 @@
+"""
+ID card detection and normalization.
+
+Phone photos of an ID card usually include a lot of table and background.
+This stage finds the card quadrilateral on a small copy of the upload and
+derives two images from it for the later stages:
+
+- a perspective-corrected crop at a canonical size, for OCR and the
+  duplicate hash, where only the document content matters;
+- an axis-aligned crop of the original pixels around the card, for ELA and
+  pixel forensics. It is not resampled and starts on the 8x8 JPEG grid, so
+  compression artifacts stay comparable with the full upload.
+
+Uploads that are already a tight crop of the card are used as they are. An
+upload without anything card-shaped is reported so the pipeline can reject
+it before any model call.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from .image_input import ImageSource, LoadedImage, load_image
+from .shared import ANALYSIS_DETAIL_TILES, CARD_WIDTH
+
+# ID-1 format (85.60 x 53.98 mm) aspect ratio and the range accepted for a
+# card seen in perspective
+CARD_ASPECT = 85.60 / 53.98
+MIN_ASPECT = 1.25
+MAX_ASPECT = 1.9
+
+# Aspect range for accepting the whole frame as an already cropped card;
+# narrow enough to exclude 4:3 and 16:9 camera frames
+FRAME_MIN_ASPECT = 1.45
+FRAME_MAX_ASPECT = 1.72
+
+# Longest side of the copy the card is searched on
+DETECTION_SIDE = 640
+
+# Share of the frame a card must cover, and the contour/quad area ratio
+# below which a shape is not considered rectangular
+MIN_COVERAGE = 0.05
+MIN_RECTANGULARITY = 0.85
+
+# Distance from the frame border, relative to the frame size, within which
+# a corner counts as cut off
+BORDER_TOLERANCE = 0.01
+
+# Margin around the card kept in the forensic crop, relative to its size
+FORENSIC_MARGIN = 0.02
+
+
+def _order_corners(points: np.ndarray) -> np.ndarray:
+    """Order four points as top-left, top-right, bottom-right, bottom-left."""
+    points = points.reshape(4, 2).astype(np.float32)
+    sums = points.sum(axis=1)
+    diffs = np.diff(points, axis=1).ravel()
+    return np.array([
+        points[np.argmin(sums)],
+        points[np.argmin(diffs)],
+        points[np.argmax(sums)],
+        points[np.argmax(diffs)]
+    ], dtype=np.float32)
+
+
+def _side_lengths(corners: np.ndarray) -> Tuple[float, float]:
+    """Mean width and height of an ordered quadrilateral."""
+    top, right, bottom, left = (np.linalg.norm(corners[(i + 1) % 4] - corners[i]) for i in range(4))
+    return (top + bottom) / 2, (left + right) / 2
+
+
+def _quad_candidates(gray: np.ndarray) -> List[np.ndarray]:
+    """Find quadrilateral outlines from edges and from brightness segmentation."""
+    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+    median = float(np.median(blurred))
+    edges = cv2.Canny(blurred, 0.66 * median, 1.33 * median)
+    edges = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, np.ones((5, 5), np.uint8), iterations=2)
+
+    # Cards are usually brighter or darker than what they lie on
+    _, bright = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    masks = [edges, bright, cv2.bitwise_not(bright)]
+
+    candidates = []
+    for mask in masks:
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        for contour in sorted(contours, key=cv2.contourArea, reverse=True)[:3]:
+            hull = cv2.convexHull(contour)
+            approx = cv2.approxPolyDP(hull, 0.02 * cv2.arcLength(hull, True), True)
+            if len(approx) == 4:
+                candidates.append(approx)
+            else:
+                # Rounded corners or a slightly broken outline: fall back to
+                # the minimum area rectangle if the shape fills it
+                box = cv2.boxPoints(cv2.minAreaRect(hull))
+                if cv2.contourArea(hull) >= MIN_RECTANGULARITY * cv2.contourArea(box):
+                    candidates.append(box)
+    return candidates
+
+
+def find_card(bgr: np.ndarray) -> Optional[Dict[str, Any]]:
+    """
+    Find the ID card quadrilateral in an image.
+
+    Args:
+        bgr: OpenCV image array (a small copy is enough)
+
+    Returns:
+        Dictionary with the ordered corners (in bgr coordinates), the share
+        of the frame covered and the aspect ratio, or None if no card-shaped
+        quadrilateral was found
+    """
+    height, width = bgr.shape[:2]
+    frame_area = float(width * height)
+    gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+
+    best = None
+    for candidate in _quad_candidates(gray):
+        corners = _order_corners(candidate)
+        area = cv2.contourArea(corners)
+        coverage = area / frame_area
+        # A quad covering the whole frame is the frame border, not a card
+        if not MIN_COVERAGE <= coverage <= 0.97 or not cv2.isContourConvex(corners.astype(np.int32)):
+            continue
+        # Shapes cut off by the frame border are background, not a whole card
+        on_border = ((corners[:, 0] <= width * BORDER_TOLERANCE) |
+                     (corners[:, 0] >= width * (1 - BORDER_TOLERANCE)) |
+                     (corners[:, 1] <= height * BORDER_TOLERANCE) |
+                     (corners[:, 1] >= height * (1 - BORDER_TOLERANCE)))
+        if on_border.sum() > 1:
+            continue
+        card_width, card_height = _side_lengths(corners)
+        aspect = max(card_width, card_height) / max(min(card_width, card_height), 1.0)
+        if not MIN_ASPECT <= aspect <= MAX_ASPECT:
+            continue
+        if best is None or area > best["area"]:
+            best = {"corners": corners, "area": area, "coverage": coverage, "aspect": aspect}
+    return best
+
+
+def _warp(bgr: np.ndarray, corners: np.ndarray) -> np.ndarray:
+    """Warp the card to the canonical size, keeping its orientation."""
+    card_width, card_height = _side_lengths(corners)
+    if card_width >= card_height:
+        size = (CARD_WIDTH, int(round(CARD_WIDTH / CARD_ASPECT)))
+    else:
+        size = (int(round(CARD_WIDTH / CARD_ASPECT)), CARD_WIDTH)
+    target = np.array([[0, 0], [size[0] - 1, 0], [size[0] - 1, size[1] - 1], [0, size[1] - 1]],
+                      dtype=np.float32)
+    matrix = cv2.getPerspectiveTransform(corners, target)
+    return cv2.warpPerspective(bgr, matrix, size, flags=cv2.INTER_AREA, borderMode=cv2.BORDER_REPLICATE)
+
+
+def _forensic_crop(bgr: np.ndarray, corners: np.ndarray) -> np.ndarray:
+    """Crop the original pixels around the card, starting on the 8x8 grid."""
+    height, width = bgr.shape[:2]
+    x0, y0 = corners.min(axis=0)
+    x1, y1 = corners.max(axis=0)
+    margin_x, margin_y = (x1 - x0) * FORENSIC_MARGIN, (y1 - y0) * FORENSIC_MARGIN
+    left = max(0, int(x0 - margin_x)) // 8 * 8
+    top = max(0, int(y0 - margin_y)) // 8 * 8
+    right = min(width, int(np.ceil(x1 + margin_x)))
+    bottom = min(height, int(np.ceil(y1 + margin_y)))
+    return np.ascontiguousarray(bgr[top:bottom, left:right])
+
+
+def locate_card(image: ImageSource) -> Tuple[Dict[str, Any], Optional[LoadedImage], Optional[LoadedImage]]:
+    """
+    Detect the ID card and build the crops used by the later stages.
+
+    Args:
+        image: Path to the uploaded image or a LoadedImage
+
+    Returns:
+        Tuple of (stage result with status, message, method, corners and
+        coverage; perspective-corrected card image; forensic crop). The
+        images are the upload itself when it is already a tight crop, and
+        None when no card was found.
+    """
+    image = load_image(image)
+    small = image.reduced_bgr(DETECTION_SIDE, draft=ANALYSIS_DETAIL_TILES <= 0)
+    if small is None:
+        return {"status": "fail", "message": "the image could not be decoded"}, None, None
+
+    card = find_card(small)
+    if card is None:
+        height, width = small.shape[:2]
+        aspect = max(width, height) / min(width, height)
+        if FRAME_MIN_ASPECT <= aspect <= FRAME_MAX_ASPECT:
+            # Nothing around the card: the upload is already cropped to it
+            return {
+                "status": "success",
+                "message": "The image is already cropped to the card.",
+                "method": "full_frame",
+                "coverage": 1.0
+            }, image, image
+        return {"status": "fail", "message": "nothing card-shaped in the frame", "method": "none"}, None, None
+
+    full = image.bgr
+    corners = card["corners"] * (full.shape[1] / small.shape[1])
+    document = LoadedImage.from_array(_warp(full, corners))
+    forensic = LoadedImage.from_array(_forensic_crop(full, corners))
+    return {
+        "status": "success",
+        "message": "ID card detected and normalized.",
+        "method": "contour",
+        "coverage": round(float(card["coverage"]), 3),
+        "aspect": round(float(card["aspect"]), 3),
+        "corners": [[int(round(x)), int(round(y))] for x, y in corners]
+    }, document, forensic
@@ -0,0 +1,158 @@
+"""
+Process pool for the CPU-bound pipeline stages.
+
+ELA and pixel forensics spend much of their time holding the GIL, so running
+them on threads does not use more than one core. This module keeps a
+persistent pool of worker processes that import OpenCV and scikit-image once
+at startup. Decoded pixels reach the workers through shared memory instead of
+being pickled, and each worker caps OpenCV's own thread pool so that N
+workers do not start N x cores threads.
+"""
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context, shared_memory
+from typing import Any, Callable, Optional, Tuple
+
+import numpy as np
+
+from .analysis_scale import analysis_image
+from .image_input import LoadedImage, ImageSource, load_image
+from .shared import ANALYSIS_DETAIL_TILES, CPU_POOL_THREADS, CPU_POOL_WORKERS
+
+# Persistent worker pool, created on first use
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _init_worker(threads: int) -> None:
+    """
+    Warm up a worker process: import the heavy modules and set its thread budget.
+
+    Args:
+        threads: Number of threads OpenCV may use inside this worker
+    """
+    import cv2
+    cv2.setNumThreads(threads)
+    # Import the stage modules (and skimage/matplotlib with them) once per worker
+    from . import ela_check, image_forensics  # noqa: F401
+
+
+def _run_in_worker(func: Callable[..., Any], shm_name: str, shape: Tuple[int, ...],
+                   dtype: str, original_size: Tuple[int, int], args: Tuple[Any, ...]) -> Any:
+    """
+    Run a stage on pixels attached from shared memory.
+
+    Args:
+        func: Stage function taking an ImageSource as first argument
+        shm_name: Name of the shared memory block holding the BGR pixels
+        shape: Array shape
+        dtype: Array dtype name
+        original_size: (width, height) of the upload the pixels come from
+        args: Remaining stage arguments
+
+    Returns:
+        Stage output
+    """
+    # Spawned workers share the parent's resource tracker, so attaching here
+    # does not transfer ownership; the parent unlinks the block
+    block = shared_memory.SharedMemory(name=shm_name)
+    try:
+        pixels = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+        pixels.flags.writeable = False
+        image = LoadedImage.from_array(pixels, original_size)
+        try:
+            return func(image, *args)
+        finally:
+            # Drop every view of the buffer before closing the block
+            del image, pixels
+    finally:
+        block.close()
+
+
+def _noop() -> None:
+    return None
+
+
+def get_cpu_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    Get the process-wide CPU stage pool configured by KYC_CPU_POOL_WORKERS.
+
+    Workers are started with the spawn method, which is safe to use from a
+    process that already runs threads.
+
+    Returns:
+        Shared ProcessPoolExecutor, or None if the pool is disabled
+    """
+    global _pool
+    if CPU_POOL_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=CPU_POOL_WORKERS,
+                mp_context=get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(CPU_POOL_THREADS,)
+            )
+        return _pool
+
+
+def warm_cpu_pool() -> None:
+    """
+    Start all pool workers now instead of on the first requests.
+    """
+    pool = get_cpu_pool()
+    if pool is not None:
+        for future in [pool.submit(_noop) for _ in range(CPU_POOL_WORKERS)]:
+            future.result()
+
+
+def _reset_pool(broken: ProcessPoolExecutor) -> None:
+    """Forget a broken pool so the next stage starts a fresh one."""
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def run_cpu_stage(func: Callable[..., Any], image: ImageSource, *args: Any) -> Any:
+    """
+    Run a CPU-bound stage in the process pool, or inline if it is disabled.
+
+    The decoded BGR pixels are copied once into a shared memory block that
+    the worker maps; only the block name and the array shape are pickled.
+    Full-resolution pixels are only sent when the stages need native detail
+    tiles; otherwise the capped analysis image is enough.
+
+    Args:
+        func: Module-level stage function taking an ImageSource first
+        image: Path to the image or a LoadedImage
+        *args: Remaining stage arguments
+
+    Returns:
+        Stage output
+    """
+    pool = get_cpu_pool()
+    image = load_image(image)
+    pixels = None
+    if pool is not None:
+        pixels = image.bgr if ANALYSIS_DETAIL_TILES > 0 else analysis_image(image)[0]
+    if pixels is None:
+        # Pool disabled or undecodable image: let the stage report it itself
+        return func(image, *args)
+
+    block = shared_memory.SharedMemory(create=True, size=pixels.nbytes)
+    try:
+        np.ndarray(pixels.shape, dtype=pixels.dtype, buffer=block.buf)[...] = pixels
+        future = pool.submit(_run_in_worker, func, block.name, pixels.shape,
+                             pixels.dtype.str, image.size, args)
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            _reset_pool(pool)
+            raise
+    finally:
+        block.close()
+        block.unlink()
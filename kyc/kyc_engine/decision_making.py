@@ -1,93 +1,403 @@
 """
 KYC verification pipeline and decision making module with multilingual support.
 """
+import asyncio
 import json
-from typing import Dict, Any
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Awaitable, Callable, List, Optional, Tuple
 
-from .ocr_check import gemini
-from .metadata_check import detect_tampering
+from .ocr_check import gemini, gemini_async
+from .metadata_check import detect_tampering, detect_tampering_async
 from .ela_check import ela_analysis
 from .image_forensics import pixel_level_check
-from .shared import GLOBAL_DECISION_PROMPT, api_call, GEMINI_ENDPOINT
+from .duplicate_check import duplicate_check, register_if_accepted
+from .cpu_pool import run_cpu_stage
+from .image_input import ImageSource, LoadedImage, load_image
+from .cache import StageCache, get_stage_cache, is_cacheable, stage_key
+from .card_detection import locate_card
+from .decision_rules import DENY, FAIL, REVIEW, SUCCESS, evaluate_rules, stage_status
+from .metrics import DECISIONS, PIPELINE_DURATION, STAGE_ERRORS, stage_context
+from .log_config import bind_context, configure_logging, log_payload
+from .shared import (
+    CARD_DETECTION,
+    GLOBAL_DECISION_PROMPT,
+    DECISION_COMPARE_LOG,
+    DECISION_LLM_FALLBACK,
+    DECISION_MODE,
+    DUPLICATE_CHECK,
+    api_call,
+    async_api_call,
+    is_api_failure,
+    parse_json,
+    GEMINI_ENDPOINT,
+    PIPELINE_CONCURRENT,
+    PIPELINE_WORKERS
+)
 
+logger = logging.getLogger(__name__)
 
-def run_pipeline(form_data: Dict[str, str], image_path: str) -> Dict[str, Any]:
+# Shared executor for the concurrent pipeline mode, created on first use
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+# Stages whose result depends on state outside the image and must never be cached
+UNCACHED_STAGES = {"Duplicate"}
+
+# Serializes appends to the decision comparison log
+_compare_log_lock = threading.Lock()
+
+
+def _run_stage(stage: str, func: Callable[..., Any], *args: Any) -> Tuple[Any, float]:
+    """
+    Run a single pipeline stage, capturing its own errors and wall time.
+    
+    Args:
+        stage: Name of the stage, used in the logs and metrics
+        func: Stage function to call
+        *args: Positional arguments passed to the stage function
+        
+    Returns:
+        Tuple of (stage output or {"error": ...}, elapsed milliseconds)
+    """
+    start = time.perf_counter()
+    with stage_context(stage):
+        try:
+            logger.debug("Stage started", extra={"stage": stage})
+            output = func(*args)
+        except Exception as e:
+            logger.warning("Stage failed", exc_info=True, extra={"stage": stage})
+            STAGE_ERRORS.labels(stage).inc()
+            output = {"error": str(e)}
+    elapsed_ms = round((time.perf_counter() - start) * 1000, 2)
+    logger.debug("Stage complete", extra={"stage": stage, "elapsed_ms": elapsed_ms})
+    return output, elapsed_ms
+
+
+async def _run_stage_async(stage: str, awaitable: Awaitable[Any]) -> Tuple[Any, float]:
+    """
+    Asyncio counterpart of _run_stage for a coroutine or executor future.
+    
+    Args:
+        stage: Name of the stage, used in the logs and metrics
+        awaitable: Coroutine or future producing the stage output
+        
+    Returns:
+        Tuple of (stage output or {"error": ...}, elapsed milliseconds)
+    """
+    start = time.perf_counter()
+    with stage_context(stage):
+        try:
+            logger.debug("Stage started", extra={"stage": stage})
+            output = await awaitable
+        except Exception as e:
+            logger.warning("Stage failed", exc_info=True, extra={"stage": stage})
+            STAGE_ERRORS.labels(stage).inc()
+            output = {"error": str(e)}
+    elapsed_ms = round((time.perf_counter() - start) * 1000, 2)
+    logger.debug("Stage complete", extra={"stage": stage, "elapsed_ms": elapsed_ms})
+    return output, elapsed_ms
+
+
+def _record_stage(results: Dict[str, Any], stage: str, output: Any) -> None:
+    """
+    Store a stage output in the pipeline results.
+    
+    Args:
+        results: Pipeline results being assembled
+        stage: Name of the stage (Card, OCR, Metadata, ELA, Forensics, Duplicate)
+        output: Output returned by _run_stage
+    """
+    results[stage] = output
+
+    if stage == "OCR":
+        if isinstance(output, dict) and "error" in output:
+            results["detected_language"] = "unknown"
+        # Add detected language to the top-level results for easy access
+        elif output and "detected_language" in output:
+            results["detected_language"] = output["detected_language"]
+
+
+def _cache_key(stage: str, form_data: Dict[str, str], image: LoadedImage) -> str:
+    """
+    Content-address a stage result: image hash, plus the identity fields for OCR.
+    
+    Args:
+        stage: Name of the stage
+        form_data: Dictionary containing user submitted identity information
+        image: Loaded upload
+        
+    Returns:
+        Cache key for the stage result
+    """
+    if stage != "OCR":
+        return stage_key(stage, image.sha256)
+    # The account does not change what the card says
+    identity = {field: value for field, value in form_data.items() if field != "account_id"}
+    return stage_key(stage, image.sha256, identity)
+
+
+def _with_cache(cache: StageCache, key: str, func: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Wrap a stage function so it reads through the stage cache.
+    
+    Args:
+        cache: Stage cache
+        key: Cache key of the stage result
+        func: Stage function
+        
+    Returns:
+        Function with the same arguments returning the cached or computed output
+    """
+    def run(*args: Any) -> Any:
+        return cache.get_or_compute(key, lambda: func(*args), is_cacheable)
+    return run
+
+
+async def _with_cache_async(cache: Optional[StageCache], key: str,
+                            factory: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Asyncio counterpart of _with_cache.
+    
+    Identical stages of concurrent requests share one computation, and the
+    cache backend is read and written in an executor, off the event loop.
+    
+    Args:
+        cache: Stage cache, or None if caching is disabled
+        key: Cache key of the stage result
+        factory: Function creating the awaitable that computes the output
+        
+    Returns:
+        Cached or computed stage output
+    """
+    if cache is None:
+        return await factory()
+    return await cache.aget_or_compute(key, factory, is_cacheable)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """
+    Get the process-wide executor used by the concurrent pipeline mode.
+    
+    Returns:
+        Shared ThreadPoolExecutor instance
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=PIPELINE_WORKERS,
+                                           thread_name_prefix="kyc-stage")
+        return _executor
+
+
+def _card_images(image: LoadedImage, output: Any) -> Tuple[Any, Optional[LoadedImage], Optional[LoadedImage]]:
+    """
+    Split the card detection output into the stage result and the images
+    handed to the other stages.
+    
+    Args:
+        image: Loaded upload
+        output: Output of the Card stage (locate_card() or {"error": ...})
+        
+    Returns:
+        Tuple of (Card stage result, image for OCR and the duplicate check,
+        image for ELA and forensics); the images are None when the upload
+        is rejected because no card was found
+    """
+    if isinstance(output, dict):
+        # Detection itself failed: do not reject the upload for it
+        return output, image, image
+    result, document, forensic = output
+    if document is not None:
+        return result, document, forensic
+    if CARD_DETECTION == "require":
+        return result, None, None
+    # crop mode: analyze the whole upload instead, but the checks may have
+    # looked at something other than an ID card
+    result = dict(result, status="flag for review",
+                  message="No card outline found; the full image is analyzed.")
+    return result, image, image
+
+
+def run_pipeline(form_data: Dict[str, str], image: ImageSource,
+                 concurrent: Optional[bool] = None) -> Dict[str, Any]:
     """
     Run the complete KYC verification pipeline on the given form data and image.
     
+    In concurrent mode the I/O-bound stages (OCR and metadata, both Gemini round
+    trips) overlap with the CPU-bound ELA and pixel forensics stages, so the wall
+    time is roughly that of the slowest stage instead of the sum of all four.
+    
+    The Card stage runs first (KYC_CARD_DETECTION). OCR and the duplicate
+    check get the perspective-corrected card, ELA and forensics an unresampled
+    crop around it, and the metadata check the upload as sent. Without a card
+    the pipeline stops there and only the Card result is returned.
+    
     Args:
         form_data: Dictionary containing user submitted identity information
-        image_path: Path to the uploaded ID card image
+        image: Path to the uploaded ID card image or a LoadedImage; it is
+            decoded once and shared by all stages
+        concurrent: Run the stages concurrently; defaults to PIPELINE_CONCURRENT
         
     Returns:
-        Dictionary containing results from all verification steps
+        Dictionary containing results from all verification steps, plus the
+        per-stage wall time in milliseconds under "Timings"
     """
-    results = {}
+    if concurrent is None:
+        concurrent = PIPELINE_CONCURRENT
 
-    # Step 1: OCR Extraction using Gemini with multilingual support
-    try:
-        print("DEBUG: Step 1 - Starting OCR Extraction using Gemini with multilingual support...")
-        ocr_output = gemini(form_data, image_path)
-        results["OCR"] = ocr_output
+    image = load_image(image)
+    pipeline_start = time.perf_counter()
+
+    # Step 0: find the ID card; without one, no paid stage runs
+    document = forensic = image
+    card_outputs = []
+    if CARD_DETECTION != "off":
+        output, elapsed_ms = _run_stage("Card", locate_card, image)
+        card, document, forensic = _card_images(image, output)
+        card_outputs.append(("Card", (card, elapsed_ms)))
+        if document is None:
+            return _assemble_results(card_outputs, pipeline_start)
+
+    stages = [
+        # Step 1: OCR Extraction using Gemini with multilingual support
+        ("OCR", gemini, (form_data, document)),
+        # Step 2: Metadata Extraction & Tampering Detection, on the upload as sent
+        ("Metadata", detect_tampering, (image,)),
+        # Step 3: Error Level Analysis (ELA), in the CPU process pool
+        ("ELA", run_cpu_stage, (ela_analysis, forensic)),
+        # Step 4: Pixel-level Forensic Analysis, in the CPU process pool
+        ("Forensics", run_cpu_stage, (pixel_level_check, forensic)),
+    ]
+    # Step 5: Duplicate document lookup across previous submissions
+    if DUPLICATE_CHECK:
+        stages.append(("Duplicate", duplicate_check, (form_data, document)))
+
+    # Resubmissions of the same image reuse earlier stage results
+    cache = get_stage_cache()
+    if cache is not None:
+        stages = [
+            (stage, func if stage in UNCACHED_STAGES
+             else _with_cache(cache, _cache_key(stage, form_data, image), func), args)
+            for stage, func, args in stages
+        ]
+
+    if concurrent:
+        executor = _get_executor()
+        futures = [
+            (stage, executor.submit(bind_context(_run_stage), stage, func, *args))
+            for stage, func, args in stages
+        ]
+        outputs = [(stage, future.result()) for stage, future in futures]
+    else:
+        outputs = [(stage, _run_stage(stage, func, *args)) for stage, func, args in stages]
+
+    return _assemble_results(card_outputs + outputs, pipeline_start)
+
+
+async def run_pipeline_async(form_data: Dict[str, str], image: ImageSource) -> Dict[str, Any]:
+    """
+    Asyncio-native variant of run_pipeline.
+    
+    The Gemini stages run as coroutines on the event loop, so waiting on the
+    network does not hold a thread; the CPU-bound ELA and forensics stages are
+    handed to the CPU process pool via the shared executor.
+    
+    Args:
+        form_data: Dictionary containing user submitted identity information
+        image: Path to the uploaded ID card image or a LoadedImage
         
-        # Add detected language to the top-level results for easy access
-        if ocr_output and "detected_language" in ocr_output:
-            results["detected_language"] = ocr_output["detected_language"]
-            print(f"DEBUG: Detected language: {results['detected_language']}")
-            
-        print("DEBUG: Step 1 complete. OCR result obtained.")
-    except Exception as e:
-        print(f"DEBUG: Step 1 failed: {e}")
-        results["OCR"] = {"error": str(e)}
-        results["detected_language"] = "unknown"
-
-    # Step 2: Metadata Extraction & Tampering Detection
-    try:
-        print("DEBUG: Step 2 - Starting Metadata Extraction and Tampering Detection...")
-        metadata_output = detect_tampering(image_path)
-        results["Metadata"] = metadata_output
-        print("DEBUG: Step 2 complete. Metadata result obtained.")
-    except Exception as e:
-        print(f"DEBUG: Step 2 failed: {e}")
-        results["Metadata"] = {"error": str(e)}
-
-    # Step 3: Error Level Analysis (ELA)
-    try:
-        print("DEBUG: Step 3 - Starting Error Level Analysis (ELA)...")
-        ela_output = ela_analysis(image_path)
-        results["ELA"] = ela_output
-        print("DEBUG: Step 3 complete. ELA result obtained.")
-    except Exception as e:
-        print(f"DEBUG: Step 3 failed: {e}")
-        results["ELA"] = {"error": str(e)}
-
-    # Step 4: Pixel-level Forensic Analysis
-    try:
-        print("DEBUG: Step 4 - Starting Pixel-level Forensic Analysis...")
-        forensics_output = pixel_level_check(image_path)
-        results["Forensics"] = forensics_output
-        print("DEBUG: Step 4 complete. Forensics result obtained.")
-    except Exception as e:
-        print(f"DEBUG: Step 4 failed: {e}")
-        results["Forensics"] = {"error": str(e)}
-
-    aggregated_results = json.dumps(results, indent=4)
-    print("DEBUG: Pipeline execution complete. Aggregated results:")
-    print(aggregated_results)
+    Returns:
+        Dictionary with the same layout as run_pipeline()
+    """
+    image = load_image(image)
+    loop = asyncio.get_running_loop()
+    executor = _get_executor()
+    cache = get_stage_cache()
+    pipeline_start = time.perf_counter()
+
+    document = forensic = image
+    card_outputs = []
+    if CARD_DETECTION != "off":
+        output, elapsed_ms = await _run_stage_async(
+            "Card", loop.run_in_executor(executor, bind_context(locate_card), image))
+        card, document, forensic = _card_images(image, output)
+        card_outputs.append(("Card", (card, elapsed_ms)))
+        if document is None:
+            return _assemble_results(card_outputs, pipeline_start)
+
+    stages = [
+        ("OCR", lambda: gemini_async(form_data, document)),
+        ("Metadata", lambda: detect_tampering_async(image)),
+        ("ELA", lambda: loop.run_in_executor(executor, bind_context(run_cpu_stage), ela_analysis, forensic)),
+        ("Forensics", lambda: loop.run_in_executor(executor, bind_context(run_cpu_stage),
+                                                   pixel_level_check, forensic)),
+    ]
+    if DUPLICATE_CHECK:
+        stages.append(
+            ("Duplicate", lambda: loop.run_in_executor(executor, bind_context(duplicate_check),
+                                                       form_data, document))
+        )
+    stage_outputs = await asyncio.gather(*(
+        _run_stage_async(stage, _with_cache_async(
+            None if stage in UNCACHED_STAGES else cache,
+            _cache_key(stage, form_data, image), factory))
+        for stage, factory in stages
+    ))
+    outputs = [(stage, output) for (stage, _), output in zip(stages, stage_outputs)]
+
+    return _assemble_results(card_outputs + outputs, pipeline_start)
+
+
+def _assemble_results(outputs: List[Tuple[str, Tuple[Any, float]]],
+                      pipeline_start: float) -> Dict[str, Any]:
+    """
+    Build the pipeline results dict from the stage outputs.
+    
+    Args:
+        outputs: (stage, (output, elapsed_ms)) pairs in stage order
+        pipeline_start: perf_counter() value taken when the pipeline started
+        
+    Returns:
+        Dictionary containing results from all verification steps and timings
+    """
+    results = {}
+    timings = {}
+
+    # Results are recorded in stage order so the dict layout does not depend on
+    # which stage finished first
+    for stage, (output, elapsed_ms) in outputs:
+        _record_stage(results, stage, output)
+        timings[stage] = elapsed_ms
+
+    total_seconds = time.perf_counter() - pipeline_start
+    PIPELINE_DURATION.observe(total_seconds)
+    timings["total"] = round(total_seconds * 1000, 2)
+    results["Timings"] = timings
+
+    logger.info("Pipeline complete", extra={
+        "statuses": {stage: output.get("status", "error") if isinstance(output, dict) else None
+                     for stage, (output, _) in outputs},
+        "timings_ms": timings
+    })
+    log_payload(logger, "Pipeline results", results)
 
     return results
 
 
-def kyc_decision(pipeline_result: Dict[str, Any]) -> str:
+def build_decision_prompt(pipeline_result: Dict[str, Any]) -> str:
     """
-    Make a final KYC verification decision based on results from all verification steps.
-    Now with improved handling of multilingual ID verification results.
+    Build the final decision prompt from the pipeline results.
     
     Args:
         pipeline_result: Dictionary containing results from all verification steps
         
     Returns:
-        Decision as a JSON string with decision and reason fields
+        Prompt text for the decision model call
     """
     # Add language information to the prompt for better context
     language_context = ""
@@ -95,10 +405,227 @@ def kyc_decision(pipeline_result: Dict[str, Any]) -> str:
         language_context = f"\nThe ID document was detected to be in {pipeline_result['detected_language']} language. "
         language_context += "Please account for potential transliteration and cross-script matching issues in your decision.\n"
     
+    # Timings are operational data, not evidence for the decision
+    evidence = {key: value for key, value in pipeline_result.items() if key != "Timings"}
+
     # Prepare the prompt with enhanced language context
-    prompt = GLOBAL_DECISION_PROMPT + language_context + json.dumps(pipeline_result)
-    decision_result = api_call(GEMINI_ENDPOINT, prompt)
-    return decision_result
+    return GLOBAL_DECISION_PROMPT + language_context + json.dumps(evidence)
+
+
+def _parse_llm_decision(decision_result: str) -> Optional[Dict[str, Any]]:
+    """
+    Parse a model decision, rejecting API failures.
+    
+    Args:
+        decision_result: Decision text returned by the model call
+        
+    Returns:
+        Parsed decision with decision and reason fields, or None if the model
+        call failed or did not produce a decision
+    """
+    parsed = parse_json(decision_result)
+    if not parsed or "decision" not in parsed or is_api_failure(parsed):
+        return None
+    return parsed
+
+
+def _record_comparison(local: Dict[str, str], case: Optional[str], llm: Dict[str, Any]) -> None:
+    """
+    Append a local vs model decision pair to the comparison log.
+    
+    Args:
+        local: Decision of the local rules
+        case: Ambiguous case reported by the local rules, if any
+        llm: Parsed model decision
+    """
+    record = {
+        "time": time.time(),
+        "agree": local["decision"] == str(llm.get("decision", "")).strip().lower(),
+        "ambiguous_case": case,
+        "local": local,
+        "llm": llm
+    }
+    if not record["agree"]:
+        logger.info("Decision mismatch", extra={"local": local["decision"], "llm": llm.get("decision"),
+                                                "ambiguous_case": case})
+    try:
+        with _compare_log_lock:
+            os.makedirs(os.path.dirname(DECISION_COMPARE_LOG) or ".", exist_ok=True)
+            with open(DECISION_COMPARE_LOG, "a", encoding="utf-8") as log:
+                log.write(json.dumps(record) + "\n")
+    except OSError:
+        logger.warning("Could not write the decision comparison log", exc_info=True)
+
+
+def _count_decision(decision: Optional[Dict[str, Any]], source: str) -> str:
+    """
+    Count a final decision in the metrics and serialize it.
+    
+    Args:
+        decision: Decision with decision and reason fields, or None if the
+            model answer could not be parsed
+        source: Who decided (rules or model)
+        
+    Returns:
+        Decision as a JSON string
+    """
+    outcome = str((decision or {}).get("decision", "unknown")).strip().lower()
+    DECISIONS.labels(outcome, source).inc()
+    return json.dumps(decision)
+
+
+def _resolve_decision(local: Dict[str, str], case: Optional[str], mode: str,
+                      decision_result: Optional[str]) -> str:
+    """
+    Pick the decision to return once the local rules (and the model, if it
+    was consulted) have answered.
+    
+    Args:
+        local: Decision of the local rules
+        case: Ambiguous case reported by the local rules, if any
+        mode: Decision mode (local or compare)
+        decision_result: Decision text returned by the model, or None if it
+            was not consulted
+        
+    Returns:
+        Decision as a JSON string with decision and reason fields
+    """
+    if decision_result is None:
+        return _count_decision(local, "rules")
+    llm = _parse_llm_decision(decision_result)
+    if llm is None:
+        logger.warning("Model decision unavailable, using the local rules")
+        return _count_decision(local, "rules")
+    if mode == "compare":
+        _record_comparison(local, case, llm)
+    return _count_decision(llm, "model")
+
+
+def _consult_llm(mode: str, case: Optional[str]) -> bool:
+    """
+    Decide whether the model is asked for the decision.
+    
+    Args:
+        mode: Decision mode (local or compare)
+        case: Ambiguous case reported by the local rules, if any
+        
+    Returns:
+        True in compare mode or for ambiguous cases listed in KYC_DECISION_LLM_FALLBACK
+    """
+    if mode == "compare":
+        return True
+    if case is not None and case in DECISION_LLM_FALLBACK:
+        logger.info("Ambiguous case, asking the model for the decision", extra={"ambiguous_case": case})
+        return True
+    return False
+
+
+def _register_document(pipeline_result: Dict[str, Any],
+                       decision: Optional[Dict[str, Any]]) -> Optional[Dict[str, str]]:
+    """
+    Add the document of an accepted verification to the duplicate index.
+    
+    A document accepted by a concurrent verification since the Duplicate
+    stage ran is found again at registration; the acceptance is then
+    overturned as the Duplicate stage would have decided it.
+    
+    Args:
+        pipeline_result: Dictionary containing results from all verification steps
+        decision: Final decision with decision and reason fields, or None
+        
+    Returns:
+        Decision replacing an accept, or None if the decision stands
+    """
+    try:
+        outcome = register_if_accepted(pipeline_result, decision)
+    except Exception:
+        # The decision stands; the document is only missing from the index
+        logger.warning("Could not register the document", exc_info=True)
+        return None
+    if outcome is None or outcome["status"] == SUCCESS:
+        return None
+    pipeline_result["Duplicate"].update(status=outcome["status"], message=outcome["message"])
+    override = {
+        "decision": DENY if outcome["status"] == FAIL else REVIEW,
+        "reason": f"Duplicate check at registration: {outcome['message']}"
+    }
+    logger.warning("Accepted verification overturned at registration: %s", outcome["message"])
+    return override
+
+
+def kyc_decision(pipeline_result: Dict[str, Any], mode: Optional[str] = None) -> str:
+    """
+    Make a final KYC verification decision based on results from all verification steps.
+    
+    Modes (KYC_DECISION_MODE):
+    - local: the rule engine in decision_rules decides; only ambiguous cases
+      listed in KYC_DECISION_LLM_FALLBACK are sent to the model
+    - llm: the model decides from GLOBAL_DECISION_PROMPT, as before
+    - compare: both decide, the model's decision is returned and every pair
+      is appended to KYC_DECISION_COMPARE_LOG
+    
+    Accepted documents are registered in the duplicate index.
+    
+    Args:
+        pipeline_result: Dictionary containing results from all verification steps
+        mode: Decision mode; defaults to DECISION_MODE
+        
+    Returns:
+        Decision as a JSON string with decision and reason fields
+    """
+    mode = mode or DECISION_MODE
+    if stage_status(pipeline_result, "Card") == FAIL:
+        # Nothing else ran, so there is nothing for the model to weigh
+        mode = "local"
+    with stage_context("Decision"):
+        if mode == "llm":
+            decision_result = api_call(GEMINI_ENDPOINT, build_decision_prompt(pipeline_result))
+            decision = _parse_llm_decision(decision_result)
+            _count_decision(decision, "model")
+            override = _register_document(pipeline_result, decision)
+            return json.dumps(override) if override else decision_result
+
+        local, case = evaluate_rules(pipeline_result)
+        decision_result = None
+        if _consult_llm(mode, case):
+            decision_result = api_call(GEMINI_ENDPOINT, build_decision_prompt(pipeline_result))
+        result = _resolve_decision(local, case, mode, decision_result)
+        override = _register_document(pipeline_result, json.loads(result))
+        return json.dumps(override) if override else result
+
+
+async def kyc_decision_async(pipeline_result: Dict[str, Any], mode: Optional[str] = None) -> str:
+    """
+    Asyncio counterpart of kyc_decision().
+    
+    Args:
+        pipeline_result: Dictionary containing results from all verification steps
+        mode: Decision mode; defaults to DECISION_MODE
+        
+    Returns:
+        Decision as a JSON string with decision and reason fields
+    """
+    mode = mode or DECISION_MODE
+    if stage_status(pipeline_result, "Card") == FAIL:
+        # Nothing else ran, so there is nothing for the model to weigh
+        mode = "local"
+    loop = asyncio.get_running_loop()
+    with stage_context("Decision"):
+        if mode == "llm":
+            decision_result = await async_api_call(GEMINI_ENDPOINT, build_decision_prompt(pipeline_result))
+            decision = _parse_llm_decision(decision_result)
+            _count_decision(decision, "model")
+        else:
+            local, case = evaluate_rules(pipeline_result)
+            llm_result = None
+            if _consult_llm(mode, case):
+                llm_result = await async_api_call(GEMINI_ENDPOINT, build_decision_prompt(pipeline_result))
+            decision_result = _resolve_decision(local, case, mode, llm_result)
+            decision = json.loads(decision_result)
+        # The index write is blocking SQLite I/O
+        override = await loop.run_in_executor(_get_executor(), bind_context(_register_document),
+                                              pipeline_result, decision)
+        return json.dumps(override) if override else decision_result
 
 
 if __name__ == "__main__":
@@ -126,7 +653,12 @@ if __name__ == "__main__":
     
     # Use the first test case
     form_data = test_cases[0]["form_data"]
-    image_path = r"C:\Users\nazguul\Desktop\PFE_Workplace\Resources\ID Cards\new_york_fake_id-scaled-e1601065688702-1600x1029.jpg"
+    # Image from the command line; synthetic sample cards are written by
+    # python -m benchmarks.synthetic
+    if len(sys.argv) < 2:
+        sys.exit("Usage: python -m kyc_engine.decision_making <image>")
+    image_path = sys.argv[1]
 
+    configure_logging("DEBUG", "text")
     final_results = run_pipeline(form_data, image_path)
     print(kyc_decision(final_results))
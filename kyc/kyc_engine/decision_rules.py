@@ -0,0 +1,136 @@
+"""
+Local rule engine for the final KYC decision.
+
+Implements the priority rules of GLOBAL_DECISION_PROMPT directly on the
+pipeline results, so the common cases are decided without a model round trip
+and always the same way. Cases the rules cannot settle on their own are
+reported as ambiguous; kyc_decision() hands those to the model when they are
+listed in KYC_DECISION_LLM_FALLBACK.
+"""
+from typing import Any, Dict, Optional, Tuple
+
+from .shared import is_api_failure
+
+# Decisions
+ACCEPT = "accept"
+DENY = "deny"
+REVIEW = "flag for review"
+
+# Stage statuses, plus "unavailable" for stages that errored or did not run
+SUCCESS = "success"
+FAIL = "fail"
+FLAG = "flag for review"
+UNAVAILABLE = "unavailable"
+
+# Ambiguous cases that can be routed to the model (KYC_DECISION_LLM_FALLBACK)
+AMBIGUOUS_CASES = (
+    "ocr_unavailable",      # OCR errored or the model call failed
+    "ocr_flagged",          # OCR could not decide on the match itself
+    "single_tamper_fail",   # Only one of ELA and Forensics failed
+    "tamper_unavailable",   # ELA or Forensics errored
+    "metadata_fail",        # Metadata failed while every other check passed
+)
+
+
+def stage_status(pipeline_result: Dict[str, Any], stage: str) -> str:
+    """
+    Normalize the status reported by a pipeline stage.
+
+    Args:
+        pipeline_result: Dictionary containing results from all verification steps
+        stage: Name of the stage (Card, OCR, Metadata, ELA, Forensics, Duplicate)
+
+    Returns:
+        success, fail, flag for review or unavailable
+    """
+    output = pipeline_result.get(stage)
+    if not isinstance(output, dict) or "error" in output or is_api_failure(output):
+        return UNAVAILABLE
+    status = str(output.get("status", "")).strip().lower()
+    if status in (SUCCESS, FAIL, FLAG):
+        return status
+    return UNAVAILABLE
+
+
+def _message(pipeline_result: Dict[str, Any], stage: str) -> str:
+    """Get the message of a stage result, for use in the decision reason."""
+    output = pipeline_result.get(stage)
+    if isinstance(output, dict) and output.get("message"):
+        return f" ({output['message']})"
+    return ""
+
+
+def evaluate_rules(pipeline_result: Dict[str, Any]) -> Tuple[Dict[str, str], Optional[str]]:
+    """
+    Apply the decision rules to the pipeline results.
+
+    Rules, in priority order:
+    0. Card fail (no ID card in the image) -> review, so the photo can be retaken
+    1. OCR fail -> deny
+    2. ELA and Forensics both fail -> deny
+    3. Duplicate fail -> deny
+    4. OCR unavailable, a single ELA/Forensics fail or a stage error -> review
+    5. Any flag from Card, OCR, ELA, Forensics or Duplicate -> review
+    6. Otherwise accept; metadata issues alone are not decisive
+
+    Args:
+        pipeline_result: Dictionary containing results from all verification steps
+
+    Returns:
+        Tuple of (decision dict with decision and reason fields, name of the
+        ambiguous case from AMBIGUOUS_CASES or None if the rules are decisive)
+    """
+    # When no card is found the other stages do not run at all. Detection
+    # misses real cards too (glare, a hand over the edge), so this is never
+    # a final denial: the photo is reviewed or retaken.
+    if "Card" in pipeline_result and stage_status(pipeline_result, "Card") == FAIL:
+        reason = (f"No ID card was found in the image{_message(pipeline_result, 'Card')}; "
+                  "please check the photo or submit a new one.")
+        return {"decision": REVIEW, "reason": reason}, None
+
+    ocr = stage_status(pipeline_result, "OCR")
+    ela = stage_status(pipeline_result, "ELA")
+    forensics = stage_status(pipeline_result, "Forensics")
+    metadata = stage_status(pipeline_result, "Metadata")
+    # The duplicate check is optional; a missing result does not count against the ID
+    duplicate = (stage_status(pipeline_result, "Duplicate")
+                 if "Duplicate" in pipeline_result else SUCCESS)
+    # Likewise card detection, which may be off; a flag means no card was found
+    card = stage_status(pipeline_result, "Card") if "Card" in pipeline_result else SUCCESS
+
+    if ocr == FAIL:
+        reason = ("OCR verification failed: the ID does not match the submitted identity"
+                  f"{_message(pipeline_result, 'OCR')}.")
+        return {"decision": DENY, "reason": reason}, None
+    if ela == FAIL and forensics == FAIL:
+        return {"decision": DENY, "reason": "Both ELA and pixel forensics indicate that the "
+                                            "ID image was tampered with."}, None
+    if duplicate == FAIL:
+        return {"decision": DENY, "reason": "This ID document was already used to register "
+                                            "a different identity."}, None
+
+    if ocr == UNAVAILABLE:
+        return {"decision": REVIEW, "reason": "OCR verification could not be completed, so the "
+                                              "identity match is unconfirmed."}, "ocr_unavailable"
+    if FAIL in (ela, forensics):
+        failed = "ELA" if ela == FAIL else "Forensics"
+        reason = (f"{failed} indicates tampering but the other tampering check does not"
+                  f"{_message(pipeline_result, failed)}.")
+        return {"decision": REVIEW, "reason": reason}, "single_tamper_fail"
+    if UNAVAILABLE in (ela, forensics):
+        return {"decision": REVIEW, "reason": "A tampering check could not be completed."}, "tamper_unavailable"
+
+    flagged = [stage for stage, status in
+               (("Card", card), ("OCR", ocr), ("ELA", ela), ("Forensics", forensics),
+                ("Duplicate", duplicate))
+               if status == FLAG]
+    if flagged:
+        reason = f"Flagged for review by: {', '.join(flagged)}."
+        return {"decision": REVIEW, "reason": reason}, "ocr_flagged" if flagged == ["OCR"] else None
+
+    if metadata == FAIL:
+        reason = ("Identity matches and no tampering was detected; metadata issues alone are "
+                  f"not decisive{_message(pipeline_result, 'Metadata')}.")
+        return {"decision": ACCEPT, "reason": reason}, "metadata_fail"
+    return {"decision": ACCEPT, "reason": "Identity matches the ID and no tampering or reuse "
+                                          "of the document was detected."}, None
@@ -0,0 +1,602 @@
+"""
+Duplicate document detection with a persistent index of accepted documents.
+
+Every ID document of an accepted verification is registered with keyed
+digests of the identity and the voter account it was submitted for. A new
+submission that matches a document registered for another account means the
+same card is being reused across accounts: under a different identity the
+check fails; under the same identity (the card's holder opening a second
+account) it is flagged for review. Requests without an account_id cannot be
+told apart, so every earlier registration counts as another account.
+
+Documents are matched in two steps:
+
+1. Candidates: a 64-bit perceptual hash (pHash) of the portrait area of the
+   normalized card. A hash of the whole card would mostly describe the card
+   template, which every card of the same type shares; the portrait is what
+   differs between holders.
+2. Verification: ORB features of the whole card are matched against each
+   candidate and the matches checked for one consistent perspective
+   (RANSAC). A re-photographed card keeps hundreds of matching features,
+   another holder's card of the same type only a few, from the shared print.
+
+Only a verified match with a different identity fails the check. A
+candidate that is close but cannot be verified either way is flagged for
+review; a hash match alone never denies a voter.
+
+The candidate index uses multi-index hashing: the hash is split into four
+16-bit chunks, each stored in its own indexed column. By the pigeonhole
+principle two hashes within distance d share at least one chunk within
+distance d // 4, so a lookup only enumerates the few chunk values within
+that radius and reads their index buckets, which stays sublinear as the
+index grows.
+"""
+import hashlib
+import hmac
+import itertools
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from .image_input import ImageSource, load_image
+from .shared import (
+    DUPLICATE_INDEX_PATH,
+    DUPLICATE_MATCH_INLIERS,
+    DUPLICATE_MAX_CANDIDATES,
+    DUPLICATE_MAX_DISTANCE,
+    DUPLICATE_REVIEW_INLIERS,
+    DUPLICATE_SECRET,
+    DUPLICATE_SECRET_PATH
+)
+
+HASH_BITS = 64
+CHUNK_BITS = 16
+CHUNKS = HASH_BITS // CHUNK_BITS
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+
+# Portrait area of an ID-1 card in landscape orientation (left, top, right,
+# bottom as shares of the card), per the ICAO 9303 TD1 layout
+PORTRAIT_REGION = (0.03, 0.18, 0.36, 0.95)
+
+# ORB features per document, detected on a copy FEATURE_SIDE pixels long
+FEATURE_SIDE = 800
+FEATURE_COUNT = 400
+# Lowe ratio test and RANSAC reprojection threshold (pixels at FEATURE_SIDE)
+MATCH_RATIO = 0.8
+RANSAC_THRESHOLD = 4.0
+# A feature is stored as x, y (float32) and a 32-byte descriptor
+_FEATURE_BYTES = 8 + 32
+
+# Documents checked but not decided yet, kept until their verification is
+# accepted (then registered) or rejected, at most PENDING_MAX for PENDING_TTL seconds
+PENDING_MAX = 4096
+PENDING_TTL = 3600.0
+_pending: "OrderedDict[str, Tuple[float, int, str, Optional[str], Optional[bytes]]]" = OrderedDict()
+_pending_lock = threading.Lock()
+
+_identity_key: Optional[bytes] = None
+_identity_key_lock = threading.Lock()
+
+_orb = threading.local()
+
+
+def portrait_crop(bgr: np.ndarray) -> np.ndarray:
+    """
+    Crop the portrait area of a normalized card.
+
+    Args:
+        bgr: Card image in landscape orientation
+
+    Returns:
+        View of the PORTRAIT_REGION of the card
+    """
+    height, width = bgr.shape[:2]
+    left, top, right, bottom = PORTRAIT_REGION
+    return bgr[int(height * top):int(height * bottom), int(width * left):int(width * right)]
+
+
+def perceptual_hash(image: ImageSource) -> int:
+    """
+    Compute the 64-bit DCT perceptual hash of the portrait area of a card.
+
+    Args:
+        image: Path to the normalized card image or a LoadedImage
+
+    Returns:
+        Hash as an unsigned 64-bit integer
+    """
+    # The hash only keeps 32x32 pixels, so a small copy suffices
+    bgr = load_image(image).reduced_bgr(FEATURE_SIDE)
+    if bgr is None:
+        raise ValueError("Image could not be decoded")
+
+    gray = cv2.cvtColor(portrait_crop(bgr), cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low_freq = cv2.dct(small)[:8, :8].ravel()
+    # The DC term carries overall brightness only
+    bits = low_freq > np.median(low_freq[1:])
+
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+def document_features(image: ImageSource) -> Optional[bytes]:
+    """
+    Detect the ORB features of a card used to verify candidate matches.
+
+    Args:
+        image: Path to the normalized card image or a LoadedImage
+
+    Returns:
+        Packed keypoint positions and descriptors, or None if the image has
+        too few features to be compared
+    """
+    bgr = load_image(image).reduced_bgr(FEATURE_SIDE)
+    if bgr is None:
+        raise ValueError("Image could not be decoded")
+    if not hasattr(_orb, "detector"):
+        _orb.detector = cv2.ORB_create(nfeatures=FEATURE_COUNT)
+    keypoints, descriptors = _orb.detector.detectAndCompute(cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY), None)
+    if descriptors is None or len(keypoints) < DUPLICATE_REVIEW_INLIERS:
+        return None
+    points = np.array([keypoint.pt for keypoint in keypoints], dtype=np.float32)
+    return points.tobytes() + descriptors.astype(np.uint8).tobytes()
+
+
+def _unpack_features(blob: bytes) -> Tuple[np.ndarray, np.ndarray]:
+    count = len(blob) // _FEATURE_BYTES
+    points = np.frombuffer(blob, dtype=np.float32, count=count * 2).reshape(count, 2)
+    descriptors = np.frombuffer(blob, dtype=np.uint8, offset=count * 8).reshape(count, 32)
+    return points, descriptors
+
+
+def matching_features(features: bytes, other: bytes) -> int:
+    """
+    Count the features of two cards that match under one perspective transform.
+
+    Args:
+        features: Packed features of document_features()
+        other: Packed features of the other card
+
+    Returns:
+        Number of RANSAC inliers among the ratio-test matches
+    """
+    points, descriptors = _unpack_features(features)
+    other_points, other_descriptors = _unpack_features(other)
+    pairs = cv2.BFMatcher(cv2.NORM_HAMMING).knnMatch(descriptors, other_descriptors, k=2)
+    matches = [pair[0] for pair in pairs if len(pair) == 2 and pair[0].distance < MATCH_RATIO * pair[1].distance]
+    if len(matches) < 4:
+        return 0
+    source = points[[match.queryIdx for match in matches]]
+    target = other_points[[match.trainIdx for match in matches]]
+    _, mask = cv2.findHomography(source, target, cv2.RANSAC, RANSAC_THRESHOLD)
+    return int(mask.sum()) if mask is not None else 0
+
+
+def _get_identity_key() -> bytes:
+    """Key of the identity digests: KYC_DUPLICATE_SECRET, or a key file created on first use."""
+    global _identity_key
+    with _identity_key_lock:
+        if _identity_key is None:
+            if DUPLICATE_SECRET:
+                _identity_key = DUPLICATE_SECRET.encode("utf-8")
+            else:
+                os.makedirs(os.path.dirname(DUPLICATE_SECRET_PATH) or ".", exist_ok=True)
+                try:
+                    # Exclusive creation: concurrent workers end up with the same key
+                    fd = os.open(DUPLICATE_SECRET_PATH, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+                    with os.fdopen(fd, "w") as f:
+                        f.write(secrets.token_hex(32))
+                except FileExistsError:
+                    pass
+                with open(DUPLICATE_SECRET_PATH, encoding="utf-8") as f:
+                    _identity_key = f.read().strip().encode("utf-8")
+        return _identity_key
+
+
+def identity_digest(form_data: Dict[str, str]) -> str:
+    """
+    Keyed digest of the claimed identity, so the index never stores raw PII.
+
+    ID numbers are short enough to be guessed from a plain hash, so the
+    digest is an HMAC under a secret that is not stored in the index.
+    The ID number is normalized to upper-case alphanumerics, so formatting
+    differences do not look like a different identity.
+
+    Args:
+        form_data: Dictionary containing user submitted identity information
+
+    Returns:
+        HMAC-SHA-256 hex digest
+    """
+    id_number = "".join(ch for ch in form_data.get("id_number", "") if ch.isalnum()).upper()
+    return hmac.new(_get_identity_key(), id_number.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def account_digest(form_data: Dict[str, str]) -> Optional[str]:
+    """
+    Keyed digest of the voter account a verification is for.
+
+    Args:
+        form_data: Dictionary containing user submitted identity information,
+            with the optional account_id
+
+    Returns:
+        HMAC-SHA-256 hex digest, or None if no account id was given
+    """
+    account_id = (form_data.get("account_id") or "").strip()
+    if not account_id:
+        return None
+    # Prefixed, so an account id never digests like an ID number
+    message = f"account:{account_id}".encode("utf-8")
+    return hmac.new(_get_identity_key(), message, hashlib.sha256).hexdigest()
+
+
+def _to_signed(value: int) -> int:
+    """Map an unsigned 64-bit value to SQLite's signed INTEGER range."""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _chunks(value: int) -> List[int]:
+    return [(value >> (CHUNK_BITS * i)) & CHUNK_MASK for i in range(CHUNKS)]
+
+
+def _chunk_neighbours(chunk: int, radius: int) -> List[int]:
+    """All 16-bit values within the given Hamming radius of a chunk."""
+    values = [chunk]
+    for distance in range(1, radius + 1):
+        for positions in itertools.combinations(range(CHUNK_BITS), distance):
+            flipped = chunk
+            for position in positions:
+                flipped ^= 1 << position
+            values.append(flipped)
+    return values
+
+
+class PerceptualHashIndex:
+    """
+    Persistent SQLite index of registered documents with multi-index lookup.
+    """
+
+    def __init__(self, path: str = DUPLICATE_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30,
+                                     isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Keep the chunk indexes memory-mapped so lookups avoid read syscalls
+        self._conn.execute("PRAGMA mmap_size=1073741824")
+        self._conn.execute("PRAGMA cache_size=-65536")
+        # Entries of the earlier document_hashes table were hashed from the
+        # whole card, registered before any decision and keyed with a plain
+        # SHA-256, so they are not carried over
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS registered_documents ("
+            " id INTEGER PRIMARY KEY,"
+            " hash INTEGER NOT NULL,"
+            " c0 INTEGER NOT NULL, c1 INTEGER NOT NULL,"
+            " c2 INTEGER NOT NULL, c3 INTEGER NOT NULL,"
+            " identity TEXT NOT NULL,"
+            " features BLOB,"
+            " created_at REAL NOT NULL,"
+            " account TEXT)"
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(registered_documents)")]
+        if "account" not in columns:
+            self._conn.execute("ALTER TABLE registered_documents ADD COLUMN account TEXT")
+        # Covering indexes: candidate hashes are read without touching the table
+        for i in range(CHUNKS):
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS registered_documents_c{i} ON registered_documents (c{i}, hash)"
+            )
+
+    def _search(self, value: int, max_distance: int) -> List[Dict[str, Any]]:
+        radius = max_distance // CHUNKS
+        clauses = []
+        params: List[int] = []
+        for i, chunk in enumerate(_chunks(value)):
+            neighbours = _chunk_neighbours(chunk, radius)
+            clauses.append(f"c{i} IN ({','.join('?' * len(neighbours))})")
+            params.extend(neighbours)
+
+        candidates = self._conn.execute(
+            "SELECT id, hash FROM registered_documents WHERE " + " OR ".join(clauses), params
+        ).fetchall()
+
+        if not candidates:
+            return []
+
+        # Vectorized Hamming distance over all candidates
+        rows = np.array(candidates, dtype=np.int64)
+        xor = rows[:, 1].view(np.uint64) ^ np.uint64(value)
+        bit_counts = np.unpackbits(xor.view(np.uint8)).reshape(len(rows), HASH_BITS).sum(axis=1)
+        within = bit_counts <= max_distance
+        if not within.any():
+            return []
+        distances = dict(zip(rows[within, 0].tolist(), bit_counts[within].tolist()))
+
+        rows = self._conn.execute(
+            "SELECT id, identity, account, created_at FROM registered_documents WHERE id IN ("
+            + ",".join("?" * len(distances)) + ")",
+            list(distances)
+        ).fetchall()
+        matches = [
+            {
+                "id": row_id,
+                "distance": distances[row_id],
+                "identity": identity,
+                "account": account,
+                "created_at": created_at
+            }
+            for row_id, identity, account, created_at in rows
+        ]
+        matches.sort(key=lambda match: match["distance"])
+        return matches
+
+    def search(self, value: int, max_distance: int = DUPLICATE_MAX_DISTANCE) -> List[Dict[str, Any]]:
+        """
+        Find stored hashes within a Hamming distance of value.
+
+        Args:
+            value: Unsigned 64-bit perceptual hash
+            max_distance: Maximum Hamming distance
+
+        Returns:
+            Matches sorted by distance, each with id, distance, identity,
+            account and created_at
+        """
+        with self._lock:
+            return self._search(value, max_distance)
+
+    def features(self, ids: Iterable[int]) -> Dict[int, Optional[bytes]]:
+        """
+        Read the stored features of documents.
+
+        Args:
+            ids: Document ids returned by search()
+
+        Returns:
+            Packed features by document id (None if none were stored)
+        """
+        with self._lock:
+            return self._features(ids)
+
+    def _features(self, ids: Iterable[int]) -> Dict[int, Optional[bytes]]:
+        ids = list(ids)
+        if not ids:
+            return {}
+        rows = self._conn.execute(
+            "SELECT id, features FROM registered_documents WHERE id IN ("
+            + ",".join("?" * len(ids)) + ")", ids
+        ).fetchall()
+        return {row_id: features for row_id, features in rows}
+
+    def _insert(self, value: int, identity: str, account: Optional[str],
+                features: Optional[bytes]) -> bool:
+        already_registered = self._conn.execute(
+            "SELECT 1 FROM registered_documents WHERE hash = ? AND identity = ? AND account IS ? LIMIT 1",
+            (_to_signed(value), identity, account)
+        ).fetchone() is not None
+        if not already_registered:
+            self._conn.execute(
+                "INSERT INTO registered_documents (hash, c0, c1, c2, c3, identity, account, features, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (_to_signed(value), *_chunks(value), identity, account, features, time.time())
+            )
+        return not already_registered
+
+    def add(self, value: int, identity: str, features: Optional[bytes],
+            account: Optional[str] = None) -> bool:
+        """
+        Register a document, unless the same hash is already registered for
+        the identity and account.
+
+        Args:
+            value: Unsigned 64-bit perceptual hash
+            identity: Identity digest the document was accepted for
+            features: Packed features of document_features()
+            account: Account digest the document was accepted for, if known
+
+        Returns:
+            True if the document was added
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                added = self._insert(value, identity, account, features)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return added
+
+    def register(self, value: int, identity: str, features: Optional[bytes],
+                 account: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Check a document again and register it, in one transaction.
+
+        The check at submission time cannot see documents accepted since, so
+        two submissions of the same card in flight would both pass. Searching
+        and inserting under one write lock lets only the first one register.
+
+        Args:
+            value: Unsigned 64-bit perceptual hash
+            identity: Identity digest the document was accepted for
+            features: Packed features of document_features()
+            account: Account digest the document was accepted for, if known
+
+        Returns:
+            Assessment of _assess(), with registered set if the document was added
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                assessment = _assess(self._search(value, DUPLICATE_MAX_DISTANCE), self._features,
+                                     features, identity, account)
+                assessment["registered"] = (assessment["status"] == "success"
+                                            and self._insert(value, identity, account, features))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return assessment
+
+
+_index: Optional[PerceptualHashIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_hash_index() -> PerceptualHashIndex:
+    """
+    Get the process-wide document index at KYC_DUPLICATE_INDEX_PATH.
+
+    Returns:
+        Shared PerceptualHashIndex instance
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = PerceptualHashIndex()
+        return _index
+
+
+def _assess(matches: List[Dict[str, Any]], read_features: Callable[[Iterable[int]], Dict[int, Optional[bytes]]],
+            features: Optional[bytes], identity: str, account: Optional[str]) -> Dict[str, Any]:
+    """
+    Judge a submission against the registered documents close to it.
+
+    Args:
+        matches: Registered documents returned by the index search
+        read_features: Function reading the stored features of documents by id
+        features: Packed features of the submission
+        identity: Identity digest of the submission
+        account: Account digest of the submission, or None if unknown
+
+    Returns:
+        Dictionary with status, message and the candidates compared, each
+        with its RANSAC inliers (None if it could not be compared)
+    """
+    own = [match for match in matches if account is not None and match["account"] == account]
+    candidates = [match for match in matches
+                  if account is None or match["account"] != account][:DUPLICATE_MAX_CANDIDATES]
+    stored = read_features(match["id"] for match in candidates)
+    for match in candidates:
+        other = stored.get(match["id"])
+        match["inliers"] = matching_features(features, other) if features and other else None
+
+    verified = [match for match in candidates if (match["inliers"] or 0) >= DUPLICATE_MATCH_INLIERS]
+    # Close hashes that the features cannot confirm or rule out
+    unresolved = [match for match in candidates
+                  if match["inliers"] is None or match["inliers"] >= DUPLICATE_REVIEW_INLIERS]
+
+    if any(match["identity"] != identity for match in verified):
+        status = "fail"
+        message = "This ID document was already used to register a different identity."
+    elif verified:
+        # The card's holder again, but for another account: a second vote
+        status = "flag for review"
+        message = "This ID document is already registered for another account."
+    elif unresolved:
+        status = "flag for review"
+        message = "A similar ID document was registered for another account."
+    else:
+        status = "success"
+        message = ("Document was previously submitted for the same account."
+                   if own else "No previous submission of this document found.")
+    return {"status": status, "message": message, "candidates": candidates}
+
+
+def _remember(value: int, identity: str, account: Optional[str], features: Optional[bytes]) -> str:
+    """Keep a checked document until its verification is decided; returns its registration id."""
+    token = secrets.token_hex(16)
+    now = time.time()
+    with _pending_lock:
+        while _pending and (len(_pending) >= PENDING_MAX or
+                            next(iter(_pending.values()))[0] < now - PENDING_TTL):
+            _pending.popitem(last=False)
+        _pending[token] = (now, value, identity, account, features)
+    return token
+
+
+def duplicate_check(form_data: Dict[str, str], image: ImageSource) -> Dict[str, Any]:
+    """
+    Check whether the ID document was already accepted for another account.
+
+    The check does not register the document; register_if_accepted() does
+    once the verification is accepted.
+
+    Args:
+        form_data: Dictionary containing user submitted identity information
+        image: Path to the normalized ID card image or a LoadedImage
+
+    Returns:
+        Dictionary with status, message, the perceptual hash, the matches
+        and the registration id used by register_if_accepted()
+    """
+    value = perceptual_hash(image)
+    features = document_features(image)
+    identity = identity_digest(form_data)
+    account = account_digest(form_data)
+    index = get_hash_index()
+
+    assessment = _assess(index.search(value), index.features, features, identity, account)
+    return {
+        "status": assessment["status"],
+        "message": assessment["message"],
+        "phash": f"{value:016x}",
+        "registration_id": _remember(value, identity, account, features),
+        "matches": [
+            {
+                "distance": match["distance"],
+                "matching_features": match["inliers"],
+                "same_identity": match["identity"] == identity,
+                "registered_at": match["created_at"]
+            }
+            for match in assessment["candidates"][:10]
+        ]
+    }
+
+
+def register_if_accepted(pipeline_result: Dict[str, Any],
+                         decision: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Register the document of a verification once it is decided, if it was accepted.
+
+    The document is checked again against the index when it is registered;
+    one accepted since the submission was checked keeps it out.
+
+    Args:
+        pipeline_result: Results of the pipeline, with the Duplicate stage result
+        decision: Final decision with a decision field, or None
+
+    Returns:
+        Dictionary with status, message and registered, or None if there
+        was nothing to register
+    """
+    duplicate = pipeline_result.get("Duplicate")
+    token = duplicate.get("registration_id") if isinstance(duplicate, dict) else None
+    if token is None:
+        return None
+    with _pending_lock:
+        pending = _pending.pop(token, None)
+    if pending is None:
+        return None
+    if str((decision or {}).get("decision", "")).strip().lower() != "accept":
+        return None
+    _, value, identity, account, features = pending
+    assessment = get_hash_index().register(value, identity, features, account)
+    return {
+        "status": assessment["status"],
+        "message": assessment["message"],
+        "registered": assessment["registered"]
+    }
@@ -3,56 +3,79 @@ Error Level Analysis (ELA) module.
 
 Implements ELA techniques to detect image manipulation.
 """
-import os
+import io
+import sys
+import uuid
+from typing import Tuple
+
 import matplotlib.pyplot as plt
 import numpy as np
-from PIL import Image, ImageChops, ImageEnhance
+from PIL import Image
 
+from .analysis_scale import analysis_image, native_strips
+from .image_input import ImageSource, load_image
 from .shared import get_output_path
 
-def ela_analysis(image_path, quality=90, output_path=None):
+# Error levels (maximum per-pixel difference) from which an image is flagged
+# for review or failed. They are measured at native resolution over every
+# pixel, whatever the upload size, so the same levels hold for every size:
+# clean synthetic cards score 11-16 from 640 to 4032 px wide.
+ELA_REVIEW_LEVEL = 50
+ELA_FAIL_LEVEL = 150
+
+def compute_ela(rgb: np.ndarray, quality: int = 90) -> Tuple[np.ndarray, np.ndarray, int]:
     """
-    Perform Error Level Analysis on an image to detect tampering.
+    Recompress an image in memory and compute its per-pixel error levels.
     
     Args:
-        image_path: Path to the input image
+        rgb: Decoded RGB pixels
         quality: JPEG compression quality for recompression
-        output_path: Optional path to save the ELA image
         
     Returns:
-        Dictionary with analysis results
+        Tuple of (recompressed RGB pixels, absolute difference, maximum error level)
     """
-    # Open the image and convert to RGB
-    original = Image.open(image_path).convert("RGB")
-
-    # Generate output path if not provided
-    if output_path is None:
-        output_path = get_output_path("ela_result.jpg", "analysis")
-    
-    # Save a temporary JPEG with controlled quality
-    temp_path = get_output_path("temp_ela_check.jpg", "temp")
-    original.save(temp_path, "JPEG", quality=quality)
-
-    # Reopen the recompressed image
-    recompressed = Image.open(temp_path)
+    # Recompress into a memory buffer instead of a shared temp file
+    buffer = io.BytesIO()
+    Image.fromarray(rgb).save(buffer, "JPEG", quality=quality)
+    buffer.seek(0)
+    recompressed = np.asarray(Image.open(buffer).convert("RGB"))
 
     # Compute the absolute difference (Error Level Analysis)
-    ela_image = ImageChops.difference(original, recompressed)
+    difference = np.abs(rgb.astype(np.int16) - recompressed.astype(np.int16)).astype(np.uint8)
+    return recompressed, difference, int(difference.max())
+
 
-    # Enhance differences to make them more visible
-    extrema = ela_image.getextrema()
-    max_diff = max([ex[1] for ex in extrema])  # Maximum error level
+def enhance_ela(difference: np.ndarray, max_diff: int) -> np.ndarray:
+    """
+    Stretch error levels to the full 0-255 range to make them visible.
+    
+    Args:
+        difference: Absolute difference returned by compute_ela
+        max_diff: Maximum error level
+        
+    Returns:
+        Enhanced ELA image as uint8 RGB pixels
+    """
     scale = 255.0 / max_diff if max_diff else 1
-    ela_image = ImageEnhance.Brightness(ela_image).enhance(scale)
+    return np.clip(difference * scale, 0, 255).astype(np.uint8)
 
-    # Save the ELA result
-    ela_image.save(output_path)
 
+def ela_report(max_diff: int, output_path=None):
+    """
+    Classify a maximum error level into the ELA stage result.
+    
+    Args:
+        max_diff: Maximum error level returned by compute_ela
+        output_path: Path of the saved ELA image, if any
+        
+    Returns:
+        Dictionary with analysis results
+    """
     # Determine the status and message based on error level
-    if max_diff < 50:
+    if max_diff < ELA_REVIEW_LEVEL:
         status = "success"
         message = "No significant manipulation detected."
-    elif 50 <= max_diff < 150:
+    elif max_diff < ELA_FAIL_LEVEL:
         status = "flag for review"
         message = "Possible minor modifications. Requires further verification."
     else:
@@ -68,6 +91,43 @@ def ela_analysis(image_path, quality=90, output_path=None):
     return report
 
 
+def ela_analysis(image_path: ImageSource, quality=90, output_path=None, save_visualization=False):
+    """
+    Perform Error Level Analysis on an image to detect tampering.
+    
+    The recompression and difference are computed in memory, so concurrent
+    requests never share files. Error levels depend on the original JPEG block
+    grid, so large uploads are analysed at native resolution rather than on a
+    downscaled copy. The error level is a maximum and an edit may be anywhere,
+    so every pixel is covered, streamed in strips to bound memory. The ELA
+    visualization is only written when requested, to a per-request file
+    unless output_path is given, and shows the capped analysis image.
+    
+    Args:
+        image_path: Path to the input image or a LoadedImage
+        quality: JPEG compression quality for recompression
+        output_path: Optional path to save the ELA image (implies saving)
+        save_visualization: Save the ELA image to a unique file in output/analysis
+        
+    Returns:
+        Dictionary with analysis results
+    """
+    # Strips are BGR; ELA works on RGB like the original PIL implementation
+    max_diff = max((compute_ela(strip[..., ::-1], quality)[2] for strip in native_strips(image_path)),
+                   default=None)
+    if max_diff is None:
+        raise ValueError("Image could not be decoded")
+
+    if output_path is None and save_visualization:
+        output_path = get_output_path(f"ela_result_{uuid.uuid4().hex}.jpg", "analysis")
+    if output_path is not None:
+        coarse, _ = analysis_image(image_path)
+        _, difference, coarse_max = compute_ela(coarse[..., ::-1], quality)
+        Image.fromarray(enhance_ela(difference, coarse_max)).save(output_path)
+
+    return ela_report(max_diff, output_path)
+
+
 def generate_composite_ela_image(image_path, quality=90, output_path=None):
     """
     Generate a composite image visualizing the ELA analysis results.
@@ -79,7 +139,7 @@ def generate_composite_ela_image(image_path, quality=90, output_path=None):
       - A summary tile with the final ELA analysis report
 
     Args:
-        image_path: Path to the input image
+        image_path: Path to the input image or a LoadedImage
         quality: JPEG compression quality for recompression
         output_path: Optional path to save the composite image
         
@@ -90,18 +150,13 @@ def generate_composite_ela_image(image_path, quality=90, output_path=None):
     if output_path is None:
         output_path = get_output_path("composite_ela_image.png", "analysis")
     
-    # Perform ELA analysis and save the result image
-    ela_result_path = get_output_path("ela_result.jpg", "analysis")
-    report = ela_analysis(image_path, quality=quality, output_path=ela_result_path)
-
-    # Load images with PIL and convert to NumPy arrays for plotting
-    original = Image.open(image_path).convert("RGB")
-    recompressed = Image.open(get_output_path("temp_ela_check.jpg", "temp")).convert("RGB")
-    ela_image = Image.open(ela_result_path).convert("RGB")
+    image = load_image(image_path)
 
-    original_np = np.array(original)
-    recompressed_np = np.array(recompressed)
-    ela_np = np.array(ela_image)
+    # Perform ELA in memory, keeping the intermediate images for plotting
+    original_np = image.rgb
+    recompressed_np, difference, max_diff = compute_ela(original_np, quality)
+    ela_np = enhance_ela(difference, max_diff)
+    report = ela_report(max_diff)
 
     # Create a 2x2 composite plot using matplotlib
     fig, axs = plt.subplots(2, 2, figsize=(12, 10))
@@ -142,7 +197,11 @@ def generate_composite_ela_image(image_path, quality=90, output_path=None):
 
 if __name__ == "__main__":
     # Example test case
-    test_image = r"C:\Users\nazguul\Desktop\PFE_Workplace\Resources\ID Cards\new_york_fake_id-scaled-e1601065688702-1600x1029.jpg"
+    # Image from the command line; synthetic sample cards are written by
+    # python -m benchmarks.synthetic
+    if len(sys.argv) < 2:
+        sys.exit("Usage: python -m kyc_engine.ela_check <image>")
+    test_image = sys.argv[1]
     
     # Run ELA analysis and generate composite visualization
     composite_path = generate_composite_ela_image(test_image, quality=90)
@@ -0,0 +1,261 @@
+"""
+In-memory image input shared by all pipeline stages.
+
+An upload is wrapped in a LoadedImage once per request. Its raw bytes, decoded
+pixels, grayscale view and metadata are computed lazily on first use and then
+reused by every stage, instead of each stage re-reading and re-decoding the
+file from disk.
+"""
+import hashlib
+import io
+import os
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+from PIL import Image, ImageOps
+
+from .metadata_reader import read_metadata
+
+# MIME types by file extension for the formats accepted by the API
+MIME_TYPES = {
+    "jpg": "image/jpeg",
+    "jpeg": "image/jpeg",
+    "png": "image/png",
+}
+
+
+class LoadedImage:
+    """
+    An uploaded image, decoded at most once and shared across stages.
+
+    All lazily computed attributes are guarded by a lock, so stages running
+    concurrently on the same request trigger a single decode.
+    """
+
+    def __init__(self, data: Optional[bytes] = None, filename: str = "",
+                 path: Optional[str] = None, bgr: Optional[np.ndarray] = None,
+                 original_size: Optional[Tuple[int, int]] = None):
+        """
+        Args:
+            data: Raw encoded image bytes, if already in memory
+            filename: Original filename, used to infer the MIME type
+            path: Path to read the raw bytes from on first use
+            bgr: Already decoded BGR pixels
+            original_size: (width, height) of the upload, when bgr is a
+                reduced copy of it
+        """
+        self.filename = filename or (os.path.basename(path) if path else "")
+        self.path = path
+        self._data = data
+        self._has_encoded = data is not None or path is not None
+        self._bgr = bgr
+        self._gray = None
+        self._metadata = None
+        self._sha256 = None
+        self._size = original_size
+        self._reduced: Dict[Any, Optional[np.ndarray]] = {}
+        self._derived: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_path(cls, path: str) -> "LoadedImage":
+        """Wrap an image file; the file is read on first access."""
+        return cls(path=path)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, filename: str = "") -> "LoadedImage":
+        """Wrap encoded image bytes, e.g. an upload read from the request."""
+        return cls(data=data, filename=filename)
+
+    @classmethod
+    def from_array(cls, bgr: np.ndarray,
+                   original_size: Optional[Tuple[int, int]] = None) -> "LoadedImage":
+        """Wrap already decoded BGR pixels (no encoded bytes available)."""
+        return cls(bgr=bgr, original_size=original_size)
+
+    def _lazy(self, attr: str, factory: Callable[[], Any]) -> Any:
+        """Compute an attribute once, under the instance lock."""
+        value = getattr(self, attr)
+        if value is None:
+            with self._lock:
+                value = getattr(self, attr)
+                if value is None:
+                    value = factory()
+                    setattr(self, attr, value)
+        return value
+
+    def _read_raw(self) -> bytes:
+        if self.path is None:
+            # Pixels only: encode losslessly so byte consumers still work
+            ok, encoded = cv2.imencode(".png", self._bgr)
+            if not ok:
+                raise ValueError("Could not encode image")
+            self.filename = self.filename or "image.png"
+            return encoded.tobytes()
+        with open(self.path, "rb") as file:
+            return file.read()
+
+    @property
+    def raw(self) -> bytes:
+        """Raw encoded image bytes."""
+        return self._lazy("_data", self._read_raw)
+
+    @property
+    def has_encoded(self) -> bool:
+        """Whether the image came as encoded bytes, as opposed to pixels only."""
+        return self._has_encoded
+
+    @property
+    def sha256(self) -> str:
+        """SHA-256 hex digest of the raw bytes, used as the content address."""
+        return self._lazy("_sha256", lambda: hashlib.sha256(self.raw).hexdigest())
+
+    @property
+    def mime_type(self) -> str:
+        """MIME type inferred from the file signature, falling back to the extension."""
+        head = self.raw[:8]
+        if head.startswith(b"\x89PNG"):
+            return "image/png"
+        if head.startswith(b"\xff\xd8"):
+            return "image/jpeg"
+        extension = self.filename.rsplit(".", 1)[-1].lower() if "." in self.filename else ""
+        return MIME_TYPES.get(extension, "image/jpeg")
+
+    def open_pil(self) -> Image.Image:
+        """Open a new PIL image over the raw bytes (header parsed, pixels not yet decoded)."""
+        return Image.open(io.BytesIO(self.raw))
+
+    def _decode(self) -> Optional[np.ndarray]:
+        return cv2.imdecode(np.frombuffer(self.raw, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+    @property
+    def bgr(self) -> Optional[np.ndarray]:
+        """Decoded pixels in OpenCV BGR order, or None if the data is not an image."""
+        return self._lazy("_bgr", self._decode)
+
+    @property
+    def rgb(self) -> Optional[np.ndarray]:
+        """Decoded pixels in RGB order (a view of the BGR array)."""
+        bgr = self.bgr
+        return None if bgr is None else bgr[..., ::-1]
+
+    def _read_size(self) -> Tuple[int, int]:
+        if self._bgr is None:
+            try:
+                # Header only; the pixels are not decoded
+                return self.open_pil().size
+            except Exception:
+                pass
+        bgr = self.bgr
+        return (0, 0) if bgr is None else (bgr.shape[1], bgr.shape[0])
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        """(width, height) of the original upload."""
+        return self._lazy("_size", self._read_size)
+
+    def _draft_decode(self, max_side: int) -> Optional[np.ndarray]:
+        """Decode a JPEG at a reduced DCT scale, at least max_side on its longest side."""
+        try:
+            pil_image = self.open_pil()
+            if pil_image.format != "JPEG":
+                return None
+            width, height = pil_image.size
+            ratio = max_side / max(width, height)
+            pil_image.draft("RGB", (int(width * ratio) + 1, int(height * ratio) + 1))
+            # Match cv2.imdecode, which applies the EXIF orientation
+            pil_image = ImageOps.exif_transpose(pil_image).convert("RGB")
+        except Exception:
+            return None
+        return cv2.cvtColor(np.asarray(pil_image), cv2.COLOR_RGB2BGR)
+
+    def reduced_bgr(self, max_side: int, draft: bool = True) -> Optional[np.ndarray]:
+        """
+        BGR pixels downscaled so the longest side is at most max_side.
+
+        Args:
+            max_side: Maximum length of the longest side (0 = no limit)
+            draft: Allow reduced-scale JPEG decoding when the full-resolution
+                pixels have not been decoded yet
+
+        Returns:
+            The full pixels if already small enough, a reduced copy
+            otherwise, or None if the data is not an image
+        """
+        if max_side <= 0 or max(self.size) <= max_side:
+            return self.bgr
+        with self._lock:
+            if max_side in self._reduced:
+                return self._reduced[max_side]
+            if draft and self._bgr is None:
+                # Draft results are cached apart, so callers asking for a
+                # full decode never get one
+                if ("draft", max_side) not in self._reduced:
+                    self._reduced[("draft", max_side)] = self._fit(self._draft_decode(max_side), max_side)
+                if self._reduced[("draft", max_side)] is not None:
+                    return self._reduced[("draft", max_side)]
+            self._reduced[max_side] = self._fit(self.bgr, max_side)
+            return self._reduced[max_side]
+
+    @staticmethod
+    def _fit(source: Optional[np.ndarray], max_side: int) -> Optional[np.ndarray]:
+        """Downscale pixels so the longest side is at most max_side."""
+        if source is not None:
+            scale = max_side / max(source.shape[:2])
+            if scale < 1.0:
+                source = cv2.resize(source, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        return source
+
+    def derived(self, key: str, factory: Callable[[], Any]) -> Any:
+        """
+        Compute a value derived from the image once, e.g. the copy sent to the model.
+
+        Args:
+            key: Name of the value
+            factory: Computes the value on first use
+
+        Returns:
+            The value, shared by every later caller
+        """
+        with self._lock:
+            if key not in self._derived:
+                self._derived[key] = factory()
+            return self._derived[key]
+
+    @property
+    def gray(self) -> Optional[np.ndarray]:
+        """Grayscale view of the decoded pixels."""
+        if self.bgr is None:
+            return None
+        return self._lazy("_gray", lambda: cv2.cvtColor(self.bgr, cv2.COLOR_BGR2GRAY))
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        """Container metadata (EXIF, XMP, IPTC, ICC, ...) read without decoding pixels."""
+        return self._lazy("_metadata", lambda: read_metadata(self.raw))
+
+    @property
+    def exif(self) -> Dict[str, Any]:
+        """EXIF metadata with decoded tag names (empty if none)."""
+        return self.metadata.get("exif", {})
+
+
+# Stage functions accept either a path (legacy signature) or a LoadedImage
+ImageSource = Union[str, LoadedImage]
+
+
+def load_image(source: ImageSource) -> LoadedImage:
+    """
+    Get a LoadedImage for a stage input.
+
+    Args:
+        source: Path to an image file or an existing LoadedImage
+
+    Returns:
+        The LoadedImage itself, or a new one wrapping the path
+    """
+    if isinstance(source, LoadedImage):
+        return source
+    return LoadedImage.from_path(source)
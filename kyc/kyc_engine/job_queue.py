@@ -0,0 +1,300 @@
+"""
+Durable local work queue for asynchronous verification jobs.
+
+Jobs are stored in a SQLite file, so queued work survives a restart of the
+web process and can be drained by any number of worker processes
+(api/job_worker.py) pointed at the same file. A worker claims a job with a
+lease, renewed while the job runs; if the worker dies, the lease expires and
+another worker picks the job up again, up to JOB_MAX_ATTEMPTS times.
+
+The attempt number returned by claim() is the lease token: a worker can
+only renew, complete or fail the job while no other worker has claimed it
+since.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from .shared import (
+    JOB_LEASE_SECONDS,
+    JOB_MAX_ATTEMPTS,
+    JOB_QUEUE_PATH,
+    JOB_RETENTION_SECONDS
+)
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobQueue:
+    """
+    SQLite-backed job queue shared by the API and the worker processes.
+    """
+
+    def __init__(self, path: str = JOB_QUEUE_PATH, lease_seconds: float = JOB_LEASE_SECONDS,
+                 max_attempts: int = JOB_MAX_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30,
+                                     isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " status TEXT NOT NULL,"
+            " form_data TEXT NOT NULL,"
+            " image BLOB,"
+            " filename TEXT NOT NULL,"
+            " result TEXT,"
+            " error TEXT,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " lease_until REAL,"
+            " created_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (status, created_at)"
+        )
+
+    def enqueue(self, form_data: Dict[str, str], image: bytes, filename: str) -> str:
+        """
+        Add a verification job to the queue.
+
+        Args:
+            form_data: Dictionary containing user submitted identity information
+            image: Raw bytes of the uploaded ID card image
+            filename: Secured filename of the upload
+
+        Returns:
+            Job id
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, form_data, image, filename, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, QUEUED, json.dumps(form_data), sqlite3.Binary(image), filename, now, now)
+            )
+        return job_id
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """
+        Take the oldest runnable job and lease it to the caller.
+
+        Running jobs whose lease has expired (their worker died) are runnable
+        again; jobs that already used up their attempts, or lost their image,
+        are marked failed.
+
+        Returns:
+            Dictionary with id, form_data, image, filename and attempts (the
+            lease token), or None if the queue is empty
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, image = NULL, updated_at = ?"
+                    " WHERE status = ? AND lease_until < ? AND attempts >= ?",
+                    (FAILED, "Worker lease expired too many times", now,
+                     RUNNING, now, self.max_attempts)
+                )
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, error = COALESCE(error, ?), updated_at = ?"
+                    " WHERE image IS NULL AND (status = ? OR (status = ? AND lease_until < ?))",
+                    (FAILED, "Job image is missing", now, QUEUED, RUNNING, now)
+                )
+                row = self._conn.execute(
+                    "SELECT id, form_data, image, filename, attempts FROM jobs"
+                    " WHERE status = ? OR (status = ? AND lease_until < ?)"
+                    " ORDER BY created_at LIMIT 1",
+                    (QUEUED, RUNNING, now)
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, attempts = attempts + 1,"
+                        " lease_until = ?, updated_at = ? WHERE id = ?",
+                        (RUNNING, now + self.lease_seconds, now, row[0])
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        if row is None:
+            return None
+        return {
+            "id": row[0],
+            "form_data": json.loads(row[1]),
+            "image": bytes(row[2]),
+            "filename": row[3],
+            "attempts": row[4] + 1
+        }
+
+    def renew(self, job_id: str, attempt: int) -> bool:
+        """
+        Extend the lease of a running job.
+
+        Args:
+            job_id: Job id
+            attempt: Attempt number returned by claim()
+
+        Returns:
+            True if the caller still holds the lease
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET lease_until = ?, updated_at = ?"
+                " WHERE id = ? AND status = ? AND attempts = ?",
+                (now + self.lease_seconds, now, job_id, RUNNING, attempt)
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, job_id: str, attempt: int, result: Dict[str, Any]) -> bool:
+        """
+        Store the result of a finished job and drop its image.
+
+        Args:
+            job_id: Job id
+            attempt: Attempt number returned by claim()
+            result: Verification response
+
+        Returns:
+            True if the result was stored; False if the lease was lost
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, image = NULL, lease_until = NULL,"
+                " updated_at = ? WHERE id = ? AND status = ? AND attempts = ?",
+                (DONE, json.dumps(result), time.time(), job_id, RUNNING, attempt)
+            )
+        return cursor.rowcount == 1
+
+    def fail(self, job_id: str, attempt: int, error: str, retry: bool = True) -> bool:
+        """
+        Record a job failure, requeueing it while attempts remain.
+
+        Args:
+            job_id: Job id
+            attempt: Attempt number returned by claim()
+            error: Error message
+            retry: False for errors that no retry can fix; the job fails at once
+
+        Returns:
+            True if the failure was recorded; False if the lease was lost
+        """
+        max_attempts = self.max_attempts if retry else 0
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET"
+                " status = CASE WHEN attempts < ? THEN ? ELSE ? END,"
+                " image = CASE WHEN attempts < ? THEN image ELSE NULL END,"
+                " error = ?, lease_until = NULL, updated_at = ?"
+                " WHERE id = ? AND status = ? AND attempts = ?",
+                (max_attempts, QUEUED, FAILED, max_attempts,
+                 error, time.time(), job_id, RUNNING, attempt)
+            )
+        return cursor.rowcount == 1
+
+    def release(self, job_id: str, attempt: int, error: str) -> bool:
+        """
+        Put a running job back in the queue without using up the attempt.
+
+        For jobs the worker could not start, such as when its process is
+        at its memory ceiling.
+
+        Args:
+            job_id: Job id
+            attempt: Attempt number returned by claim()
+            error: Error message
+
+        Returns:
+            True if the job was requeued; False if the lease was lost
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts - 1, error = ?,"
+                " lease_until = NULL, updated_at = ?"
+                " WHERE id = ? AND status = ? AND attempts = ?",
+                (QUEUED, error, time.time(), job_id, RUNNING, attempt)
+            )
+        return cursor.rowcount == 1
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up the state of a job.
+
+        Args:
+            job_id: Job id
+
+        Returns:
+            Dictionary with id, status, attempts, timestamps and, once
+            finished, the result or error; None if the job does not exist
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, status, result, error, attempts, created_at, updated_at"
+                " FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job = {
+            "id": row[0],
+            "status": row[1],
+            "attempts": row[4],
+            "created_at": row[5],
+            "updated_at": row[6]
+        }
+        if row[1] == DONE:
+            job["result"] = json.loads(row[2])
+        elif row[1] == FAILED:
+            job["error"] = row[3]
+        return job
+
+    def purge(self, older_than: float = JOB_RETENTION_SECONDS) -> int:
+        """
+        Delete finished jobs that have not changed for the retention period.
+
+        Args:
+            older_than: Age in seconds
+
+        Returns:
+            Number of deleted jobs
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (DONE, FAILED, time.time() - older_than)
+            )
+        return cursor.rowcount
+
+
+_job_queue: Optional[JobQueue] = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """
+    Get the process-wide job queue at KYC_JOB_QUEUE_PATH.
+
+    Returns:
+        Shared JobQueue instance
+    """
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue()
+        return _job_queue
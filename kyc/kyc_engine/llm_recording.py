@@ -0,0 +1,108 @@
+"""
+Record/replay store for model calls.
+
+With KYC_LLM_RECORD_MODE=record, api_call and async_api_call store every
+successful model answer under a hash of the request; with replay, they answer
+from the store instead of calling the model, optionally after the recorded
+latency. Pipeline runs then become fast, free and reproducible: for
+profiling, offline CI, or replaying a corpus of submissions after a pipeline
+change (a changed prompt or image preparation changes the key, so those
+calls miss and show up as such).
+
+Recordings are kept in a SQLite file with zlib-compressed answers. Answers
+contain the data extracted from the ID cards; treat the file like the uploads.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Optional, Tuple
+
+
+def recording_key(endpoint: str, payload: bytes) -> str:
+    """
+    Content-address a model call.
+
+    Args:
+        endpoint: API endpoint URL; the query string (API key) is ignored
+        payload: Request body as sent, i.e. the prompt and the prepared image
+
+    Returns:
+        SHA-256 hex digest identifying the call
+    """
+    digest = hashlib.sha256(endpoint.split("?", 1)[0].encode("utf-8"))
+    digest.update(b"\n")
+    digest.update(payload)
+    return digest.hexdigest()
+
+
+class RecordingStore:
+    """Recorded model answers in a SQLite file, shared by all processes using the same path."""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: SQLite file, created if missing
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_calls ("
+            " key TEXT PRIMARY KEY,"
+            " response BLOB NOT NULL,"
+            " latency REAL NOT NULL,"
+            " recorded_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        """
+        Look up a recorded answer.
+
+        Args:
+            key: Key returned by recording_key
+
+        Returns:
+            Tuple of (answer text, recorded latency in seconds), or None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, latency FROM llm_calls WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return zlib.decompress(row[0]).decode("utf-8"), row[1]
+
+    def put(self, key: str, response: str, latency: float) -> None:
+        """
+        Record an answer, replacing an earlier recording of the same call.
+
+        Args:
+            key: Key returned by recording_key
+            response: Answer text
+            latency: Wall time of the live call in seconds, retries included
+        """
+        blob = zlib.compress(response.encode("utf-8"), 9)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_calls (key, response, latency, recorded_at)"
+                " VALUES (?, ?, ?, ?)",
+                (key, blob, latency, time.time())
+            )
+            self._conn.commit()
+
+    def count(self) -> int:
+        """Number of recorded calls."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM llm_calls").fetchone()[0]
+
+    def clear(self) -> None:
+        """Remove all recordings."""
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_calls")
+            self._conn.commit()
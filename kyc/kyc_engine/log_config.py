@@ -0,0 +1,245 @@
+"""
+Structured logging for the KYC engine and API.
+
+Modules log through logging.getLogger(__name__) and pass structured fields
+as extra={...}. configure_logging() installs one stderr handler that writes
+each record as a JSON line (KYC_LOG_FORMAT=json, the default) or as text,
+tagged with the id of the request it belongs to.
+
+Request ids live in a context variable. The web apps set one per request
+(from the X-Request-ID header when present); bind_context() carries it into
+executor threads, which do not inherit context variables on their own.
+
+Verbose payloads such as full pipeline results go through log_payload(): they
+are only serialized at DEBUG level, for a sampled share of requests
+(KYC_LOG_PAYLOAD_SAMPLE), with identity fields redacted.
+"""
+import contextvars
+import functools
+import json
+import logging
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+from .shared import LOG_FORMAT, LOG_LEVEL, LOG_PAYLOAD_SAMPLE
+
+# Id of the request being processed, "-" outside of requests
+request_id_var: contextvars.ContextVar[str] = contextvars.ContextVar("kyc_request_id", default="-")
+
+# Keys whose values identify the person (form data and OCR extractions) or
+# their location; replaced in logged payloads
+REDACTED_KEYS = {
+    "full_name", "dob", "id_number", "nationality",
+    "form_value", "founded_value", "transliteration", "standardized_value", "normalized_value",
+    "GPSInfo"
+}
+REDACTED = "[redacted]"
+
+# Client-supplied request ids that are used as-is; anything else is replaced
+_REQUEST_ID_PATTERN = re.compile(r"[A-Za-z0-9._:-]{1,64}")
+
+# API keys passed as URL query parameters, e.g. in request exception messages
+_SECRET_PATTERN = re.compile(r"(key=)[^&\s'\")]+")
+
+# LogRecord attributes that are not structured fields
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime",
+                                                                                  "request_id"}
+
+_configured = False
+_configure_lock = threading.Lock()
+
+
+def _scrub(text: str) -> str:
+    return _SECRET_PATTERN.sub(r"\1" + REDACTED, text)
+
+
+def _fields(record: logging.LogRecord) -> dict:
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES}
+
+
+class RequestIdFilter(logging.Filter):
+    """Tag every record with the current request id."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the message, request id and extra fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage()
+        }
+        entry.update(_fields(record))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return _scrub(json.dumps(entry, default=str, ensure_ascii=False))
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines for local development, extra fields as key=value."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = _fields(record)
+        if fields:
+            line += " " + " ".join(f"{key}={json.dumps(value, default=str, ensure_ascii=False)}"
+                                   for key, value in fields.items())
+        return _scrub(line)
+
+
+def configure_logging(level: Optional[str] = None, fmt: Optional[str] = None) -> None:
+    """
+    Install the KYC log handler on the root logger (once per process).
+
+    Args:
+        level: Log level name; defaults to KYC_LOG_LEVEL
+        fmt: json or text; defaults to KYC_LOG_FORMAT
+    """
+    global _configured
+    with _configure_lock:
+        if _configured:
+            return
+        handler = logging.StreamHandler(sys.stderr)
+        handler.addFilter(RequestIdFilter())
+        handler.setFormatter(TextFormatter() if (fmt or LOG_FORMAT) == "text" else JsonFormatter())
+        root = logging.getLogger()
+        root.addHandler(handler)
+        root.setLevel(level or LOG_LEVEL)
+        _configured = True
+
+
+def new_request_id() -> str:
+    """Generate a short random request id."""
+    return uuid.uuid4().hex[:16]
+
+
+def accept_request_id(value: Optional[str]) -> str:
+    """
+    Use a client-supplied request id (X-Request-ID) if it is well-formed.
+
+    Args:
+        value: Header value, if any
+
+    Returns:
+        value, or a new request id if it is missing, too long or contains
+        characters other than letters, digits and ._:-
+    """
+    if value and _REQUEST_ID_PATTERN.fullmatch(value):
+        return value
+    return new_request_id()
+
+
+@contextmanager
+def request_context(request_id: Optional[str] = None) -> Iterator[str]:
+    """
+    Tag the logs of the enclosed block with a request id.
+
+    Args:
+        request_id: Id to use; a new one is generated if omitted
+
+    Yields:
+        The request id
+    """
+    request_id = request_id or new_request_id()
+    token = request_id_var.set(request_id)
+    try:
+        yield request_id
+    finally:
+        request_id_var.reset(token)
+
+
+def bind_context(func: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Bind a function to a copy of the current context, so it keeps the
+    request id (and metrics stage) when run in an executor thread.
+
+    Args:
+        func: Function to bind
+
+    Returns:
+        Function running func in the copied context
+    """
+    return functools.partial(contextvars.copy_context().run, func)
+
+
+def iterate_in_context(iterator: Iterable[Any]) -> Iterator[Any]:
+    """
+    Iterate in a copy of the current context, e.g. a streamed response body
+    that is consumed after the request handler returned.
+
+    Args:
+        iterator: Iterable to consume
+
+    Returns:
+        Iterator over the items of iterator
+    """
+    # Copied now, not on the first next() call, which comes after the handler
+    context = contextvars.copy_context()
+    iterator = iter(iterator)
+
+    def items() -> Iterator[Any]:
+        sentinel = object()
+        while True:
+            item = context.run(next, iterator, sentinel)
+            if item is sentinel:
+                return
+            yield item
+
+    return items()
+
+
+def redact(value: Any) -> Any:
+    """
+    Copy a payload with the values of REDACTED_KEYS replaced.
+
+    Nested objects under a redacted key are kept (e.g. the OCR detailed
+    result for "full_name") and redacted recursively; GPS data is dropped.
+
+    Args:
+        value: JSON-like payload
+
+    Returns:
+        Redacted copy
+    """
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if key in REDACTED_KEYS and (key == "GPSInfo" or not isinstance(item, (dict, list)))
+            else redact(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [redact(item) for item in value]
+    return value
+
+
+def log_payload(logger: logging.Logger, message: str, payload: Any) -> None:
+    """
+    Log a verbose payload at DEBUG level for a sample of the calls.
+
+    Nothing is copied or serialized unless DEBUG is enabled for the logger
+    and the call is sampled (KYC_LOG_PAYLOAD_SAMPLE).
+
+    Args:
+        logger: Logger to write to
+        message: Log message
+        payload: JSON-like payload; identity fields are redacted
+    """
+    if not logger.isEnabledFor(logging.DEBUG) or random.random() >= LOG_PAYLOAD_SAMPLE:
+        return
+    logger.debug(message, extra={"payload": redact(payload)})
@@ -1,81 +1,160 @@
 """
 Metadata analysis module for detecting image tampering through EXIF data.
 """
+import asyncio
+import logging
 import re
+import sys
 import json
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 
-print("DEBUG: Loading metadata_check.py module")
+from .image_input import ImageSource, load_image
+from .metadata_rules import analyze_metadata
+from .shared import (
+    GLOBAL_TAMPERING_PROMPT,
+    METADATA_LLM_CONFIDENCE,
+    api_call,
+    async_api_call,
+    is_api_failure,
+    GEMINI_ENDPOINT,
+    parse_json
+)
 
-from PIL import Image, ExifTags
-try:
-    from .shared import (
-        GLOBAL_TAMPERING_PROMPT,
-        api_call,
-        GEMINI_ENDPOINT,
-        parse_json
-    )
-    print("DEBUG: Successfully imported from .shared")
-except ImportError as e:
-    print(f"DEBUG: Import error: {e}")
+logger = logging.getLogger(__name__)
 
 
-def extract_metadata(image_path: str) -> Dict[str, Any]:
+def extract_metadata(image_path: ImageSource) -> Dict[str, Any]:
     """
-    Extract all available EXIF metadata from an image using Pillow.
+    Extract all available metadata from an image without decoding its pixels.
     
     Args:
-        image_path: Path to the image file
+        image_path: Path to the image file or a LoadedImage
         
     Returns:
-        Dictionary containing EXIF metadata with decoded tag names
+        Normalized metadata dictionary from metadata_reader: EXIF with
+        decoded tag names under "exif", plus XMP, IPTC, ICC, thumbnail and
+        container details when present
     """
     try:
-        img = Image.open(image_path)
-        exif_data = img._getexif()
-        if not exif_data:
-            return {}
-            
-        metadata = {}
-        for tag, value in exif_data.items():
-            decoded = ExifTags.TAGS.get(tag, tag)
-            metadata[decoded] = value
-        return metadata
-    except Exception as e:
-        print(f"Error extracting metadata: {e}")
-        return {}
-
-
-def detect_tampering(image_path: str) -> Optional[Dict[str, Any]]:
+        return dict(load_image(image_path).metadata)
+    except Exception:
+        logger.warning("Could not extract the image metadata", exc_info=True)
+        return {"exif": {}}
+
+
+def _tampering_prompt(metadata: Dict[str, Any]) -> str:
     """
-    Extract metadata and analyze it for signs of tampering.
+    Build the tampering analysis prompt for extracted metadata.
     
     Args:
-        image_path: Path to the image file
+        metadata: Metadata returned by extract_metadata
         
     Returns:
-        Analysis result with status and message fields
+        Prompt text with the complete metadata injected
     """
-    full_metadata = extract_metadata(image_path)
-
-    # Convert metadata to JSON, handling non-serializable types
-    metadata_json = json.dumps(
-        full_metadata,
-        indent=2,
-        default=lambda o: float(o) if hasattr(o, 'numerator') and hasattr(o, 'denominator') else str(o)
-    )
+    # The raw quantization tables only cost tokens; the estimated quality stays
+    if "quantization_tables" in metadata.get("jpeg", {}):
+        metadata = dict(metadata, jpeg={key: value for key, value in metadata["jpeg"].items()
+                                        if key != "quantization_tables"})
+    metadata_json = json.dumps(metadata, indent=2, default=str)
     
     # Build the prompt with the complete metadata injected
-    prompt = GLOBAL_TAMPERING_PROMPT.format(metadata=metadata_json)
+    return GLOBAL_TAMPERING_PROMPT.format(metadata=metadata_json)
+
+
+def build_tampering_prompt(image_path: ImageSource) -> str:
+    """
+    Extract the metadata of an image and build the tampering analysis prompt.
+    
+    Args:
+        image_path: Path to the image file or a LoadedImage
+        
+    Returns:
+        Prompt text with the complete metadata injected
+    """
+    return _tampering_prompt(extract_metadata(image_path))
+
+
+def analyze_locally(image_path: ImageSource) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Extract metadata and run the local EXIF rules on it.
+    
+    Args:
+        image_path: Path to the image file or a LoadedImage
+        
+    Returns:
+        Tuple of (metadata, local analysis result)
+    """
+    image = load_image(image_path)
+    metadata = extract_metadata(image)
+    return metadata, analyze_metadata(metadata, image)
+
+
+def _needs_model(local: Dict[str, Any]) -> bool:
+    """Check whether the local result is too uncertain to return on its own."""
+    if local["confidence"] >= METADATA_LLM_CONFIDENCE:
+        return False
+    logger.debug("Local metadata analysis uncertain, asking the model",
+                 extra={"confidence": round(local["confidence"], 2)})
+    return True
+
+
+def _model_or_local(result: str, local: Dict[str, Any]) -> Dict[str, Any]:
+    """Use the model result, or the local one if the model call failed."""
+    parsed = parse_json(result)
+    if not parsed or is_api_failure(parsed):
+        logger.warning("Metadata model call failed, using the local analysis")
+        return local
+    return parsed
+
+
+def detect_tampering(image_path: ImageSource) -> Optional[Dict[str, Any]]:
+    """
+    Extract metadata and analyze it for signs of tampering.
     
+    The local EXIF rules (metadata_rules) answer first; the Gemini API is
+    only called when their confidence is below KYC_METADATA_LLM_CONFIDENCE.
+    
+    Args:
+        image_path: Path to the image file or a LoadedImage
+        
+    Returns:
+        Analysis result with status and message fields
+    """
+    metadata, local = analyze_locally(image_path)
+    if not _needs_model(local):
+        return local
+
     # Call the Gemini API using only the text prompt
-    result = api_call(GEMINI_ENDPOINT, prompt)
-    return parse_json(result)
+    result = api_call(GEMINI_ENDPOINT, _tampering_prompt(metadata))
+    return _model_or_local(result, local)
+
+
+async def detect_tampering_async(image_path: ImageSource) -> Optional[Dict[str, Any]]:
+    """
+    Asyncio counterpart of detect_tampering().
+    
+    Args:
+        image_path: Path to the image file or a LoadedImage
+        
+    Returns:
+        Analysis result with status and message fields
+    """
+    # The thumbnail comparison decodes pixels, so keep it off the event loop
+    metadata, local = await asyncio.to_thread(analyze_locally, image_path)
+    if not _needs_model(local):
+        return local
+    result = await async_api_call(GEMINI_ENDPOINT, _tampering_prompt(metadata))
+    return _model_or_local(result, local)
 
 
 if __name__ == "__main__":
     # Example test case
-    image_path = r"C:\Users\nazguul\Desktop\PFE_Workplace\Resources\ID Cards\20220327_171259 (1).jpg"
+    # Image from the command line; synthetic sample cards are written by
+    # python -m benchmarks.synthetic
+    if len(sys.argv) < 2:
+        sys.exit("Usage: python -m kyc_engine.metadata_check <image>")
+    image_path = sys.argv[1]
     tampering_result = detect_tampering(image_path)
 
     print("Tampering Detection Result:")
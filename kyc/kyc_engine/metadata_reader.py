@@ -0,0 +1,649 @@
+"""
+Header-only image metadata reader.
+
+Walks the container structure of an upload (JPEG marker segments up to the
+first scan, PNG chunks) without decoding any pixel data, and returns the
+metadata found there as a normalized, JSON-safe dictionary:
+
+- format, width and height of the image
+- exif: IFD0 and Exif IFD tags with decoded names, GPS under "GPSInfo"
+- thumbnail: file offset, length and size of the EXIF (IFD1) thumbnail
+- xmp: XMP properties and the xmpMM:History edit trail
+- iptc: IPTC-IIM datasets from the Photoshop APP13 segment
+- photoshop: ids of the Photoshop image resources present
+- icc: header fields and description of the embedded ICC profile
+- jpeg: JFIF/Adobe segments, frame header, quantization tables and the
+  estimated encoder quality
+- png: IHDR fields, text chunks and the chunk layout
+"""
+import logging
+import re
+import struct
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from PIL import ExifTags
+
+logger = logging.getLogger(__name__)
+
+# TIFF field types -> size in bytes of one value
+_TIFF_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8, 13: 4}
+_TIFF_STRUCT = {1: "B", 3: "H", 4: "I", 6: "b", 8: "h", 9: "i", 11: "f", 12: "d", 13: "I"}
+
+# EXIF pointer tags
+_EXIF_IFD_POINTER = 0x8769
+_GPS_IFD_POINTER = 0x8825
+_INTEROP_IFD_POINTER = 0xA005
+_THUMBNAIL_OFFSET = 0x0201
+_THUMBNAIL_LENGTH = 0x0202
+
+# Limits that keep malformed or hostile files cheap to read
+_MAX_IFD_ENTRIES = 512
+_MAX_LIST_VALUES = 64
+_MAX_TEXT_LENGTH = 2048
+_MAX_INFLATED = 1 << 20
+
+# EXIF UNDEFINED tags that hold text
+_TEXT_UNDEFINED_TAGS = {"ExifVersion", "FlashPixVersion", "InteroperabilityVersion", "UserComment"}
+
+# JPEG start-of-frame markers (all but DHT, JPG and DAC)
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+_PROGRESSIVE_MARKERS = {0xC2, 0xC6, 0xCA, 0xCE}
+
+# APP segment signatures
+_EXIF_SIGNATURE = b"Exif\x00\x00"
+_XMP_SIGNATURE = b"http://ns.adobe.com/xap/1.0/\x00"
+_XMP_EXTENSION_SIGNATURE = b"http://ns.adobe.com/xmp/extension/\x00"
+_ICC_SIGNATURE = b"ICC_PROFILE\x00"
+_PHOTOSHOP_SIGNATURE = b"Photoshop 3.0\x00"
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# IPTC-IIM application record (2:xx) dataset names
+IPTC_DATASETS = {
+    5: "ObjectName",
+    25: "Keywords",
+    55: "DateCreated",
+    60: "TimeCreated",
+    62: "DigitalCreationDate",
+    63: "DigitalCreationTime",
+    65: "OriginatingProgram",
+    70: "ProgramVersion",
+    80: "By-line",
+    90: "City",
+    101: "Country",
+    110: "Credit",
+    115: "Source",
+    116: "CopyrightNotice",
+    120: "Caption-Abstract",
+}
+
+# Photoshop image resource id of the IPTC-IIM block
+_IRB_IPTC = 0x0404
+
+# libjpeg's standard luminance quantization table, in natural (row-major) order
+_STD_LUMINANCE = (
+    16, 11, 10, 16, 24, 40, 51, 61,
+    12, 12, 14, 19, 26, 58, 60, 55,
+    14, 13, 16, 24, 40, 57, 69, 56,
+    14, 17, 22, 29, 51, 87, 80, 62,
+    18, 22, 37, 56, 68, 109, 103, 77,
+    24, 35, 55, 64, 81, 104, 113, 92,
+    49, 64, 78, 87, 103, 121, 120, 101,
+    72, 92, 95, 98, 112, 100, 103, 99,
+)
+
+
+def _zigzag_order() -> List[int]:
+    """Natural-order indexes of the 64 coefficients in zigzag (DQT) order."""
+    # Odd anti-diagonals run top to bottom, even ones bottom to top
+    return [row * 8 + col for _, _, row, col in sorted(
+        (row + col, row if (row + col) % 2 else col, row, col)
+        for row in range(8) for col in range(8)
+    )]
+
+
+# DQT tables are stored in zigzag order
+_STD_LUMINANCE_ZIGZAG = [_STD_LUMINANCE[index] for index in _zigzag_order()]
+
+
+def _text(data: bytes) -> str:
+    """Decode a text field, trimmed to _MAX_TEXT_LENGTH."""
+    return bytes(data[:_MAX_TEXT_LENGTH]).decode("utf-8", "replace").strip("\x00 ").strip()
+
+
+class _TiffReader:
+    """Minimal TIFF/EXIF IFD parser over a byte buffer."""
+
+    def __init__(self, data: bytes, base: int):
+        """
+        Args:
+            data: Whole file contents
+            base: Offset of the TIFF header in data; IFD offsets are relative to it
+        """
+        self.data = data
+        self.base = base
+        self.order = "<" if data[base:base + 2] == b"II" else ">"
+        self._visited = set()
+
+    def _unpack(self, fmt: str, offset: int) -> Tuple[Any, ...]:
+        return struct.unpack_from(self.order + fmt, self.data, self.base + offset)
+
+    def first_ifd(self) -> int:
+        magic, offset = self._unpack("HI", 2)
+        return offset if magic == 42 else 0
+
+    def read_ifd(self, offset: int) -> Tuple[Dict[int, Any], int]:
+        """
+        Read the entries of one IFD.
+
+        Returns:
+            Tuple of (tag -> normalized value, offset of the next IFD or 0)
+        """
+        if not offset or offset in self._visited or self.base + offset + 2 > len(self.data):
+            return {}, 0
+        self._visited.add(offset)
+        count = self._unpack("H", offset)[0]
+        if count > _MAX_IFD_ENTRIES:
+            return {}, 0
+        entries = {}
+        for index in range(count):
+            entry = offset + 2 + index * 12
+            if self.base + entry + 12 > len(self.data):
+                return entries, 0
+            tag, field_type, value_count = self._unpack("HHI", entry)
+            value = self._value(field_type, value_count, entry + 8)
+            if value is not None:
+                entries[tag] = value
+        next_entry = offset + 2 + count * 12
+        if self.base + next_entry + 4 > len(self.data):
+            return entries, 0
+        return entries, self._unpack("I", next_entry)[0]
+
+    def _value(self, field_type: int, count: int, entry_value: int) -> Any:
+        size = _TIFF_TYPE_SIZES.get(field_type)
+        if size is None:
+            return None
+        total = size * count
+        offset = entry_value if total <= 4 else self._unpack("I", entry_value)[0]
+        start = self.base + offset
+        if start + total > len(self.data):
+            return None
+        raw = self.data[start:start + min(total, max(_MAX_TEXT_LENGTH, size * _MAX_LIST_VALUES))]
+
+        if field_type == 2:
+            return _text(raw)
+        if field_type == 7:
+            return bytes(raw) if total <= len(raw) else f"<{total} bytes>"
+        if field_type in (5, 10):
+            shown = min(count, _MAX_LIST_VALUES)
+            fmt = "I" if field_type == 5 else "i"
+            pairs = struct.unpack_from(f"{self.order}{2 * shown}{fmt}", raw)
+            values = [round(pairs[i] / pairs[i + 1], 6) if pairs[i + 1] else None
+                      for i in range(0, len(pairs), 2)]
+        else:
+            shown = min(count, _MAX_LIST_VALUES)
+            values = list(struct.unpack_from(f"{self.order}{shown}{_TIFF_STRUCT[field_type]}", raw))
+        if count == 1:
+            return values[0]
+        if count > _MAX_LIST_VALUES:
+            return f"<{count} values>"
+        return values
+
+
+def _undefined_value(name: str, value: bytes) -> Any:
+    """Normalize an UNDEFINED EXIF value to text or a size placeholder."""
+    if name == "UserComment":
+        # The first 8 bytes name the character code
+        return _text(value[8:])
+    if name in _TEXT_UNDEFINED_TAGS or (len(value) <= 32 and value.isascii() and value.strip(b"\x00")):
+        return _text(value)
+    return f"<{len(value)} bytes>"
+
+
+def _named(entries: Dict[int, Any], names: Dict[int, str]) -> Dict[str, Any]:
+    named = {}
+    for tag, value in entries.items():
+        name = names.get(tag, str(tag))
+        named[name] = _undefined_value(name, value) if isinstance(value, bytes) else value
+    return named
+
+
+def read_exif(data: bytes, base: int) -> Tuple[Dict[str, Any], Optional[Dict[str, int]]]:
+    """
+    Read the EXIF tags of a TIFF structure embedded in a file.
+
+    Args:
+        data: Whole file contents
+        base: Offset of the TIFF header in data
+
+    Returns:
+        Tuple of (tags with decoded names, thumbnail offset and length in
+        the file or None)
+    """
+    try:
+        reader = _TiffReader(data, base)
+        ifd0, next_ifd = reader.read_ifd(reader.first_ifd())
+        exif_ifd, _ = reader.read_ifd(ifd0.pop(_EXIF_IFD_POINTER, 0))
+        gps_ifd, _ = reader.read_ifd(ifd0.pop(_GPS_IFD_POINTER, 0))
+        exif_ifd.pop(_INTEROP_IFD_POINTER, None)
+        ifd1, _ = reader.read_ifd(next_ifd)
+    except struct.error:
+        return {}, None
+
+    exif = _named({**ifd0, **exif_ifd}, ExifTags.TAGS)
+    if gps_ifd:
+        exif["GPSInfo"] = _named(gps_ifd, ExifTags.GPSTAGS)
+
+    thumbnail = None
+    offset, length = ifd1.get(_THUMBNAIL_OFFSET), ifd1.get(_THUMBNAIL_LENGTH)
+    if isinstance(offset, int) and isinstance(length, int) and 0 < length \
+            and base + offset + length <= len(data):
+        thumbnail = {"offset": base + offset, "length": length}
+    return exif, thumbnail
+
+
+def _xmp_attributes(block: str) -> Dict[str, str]:
+    """Collect prefix:name="value" attributes and simple prefix:name elements."""
+    properties = {}
+    for prefix, name, value in re.findall(r'(\w+):(\w+)="([^"]*)"', block):
+        if prefix not in ("xmlns", "rdf", "x"):
+            properties[f"{prefix}:{name}"] = value
+    for prefix, name, value in re.findall(r"<(\w+):(\w+)>([^<]+)</\1:\2>", block):
+        if prefix not in ("rdf", "x") and value.strip():
+            properties.setdefault(f"{prefix}:{name}", value.strip())
+    return properties
+
+
+def read_xmp(packet: bytes) -> Dict[str, Any]:
+    """
+    Read the properties and edit history of an XMP packet.
+
+    Args:
+        packet: XMP packet (XML)
+
+    Returns:
+        Dictionary with properties, history and the packet length
+    """
+    text = bytes(packet).decode("utf-8", "replace")
+    history = []
+    match = re.search(r"<xmpMM:History>(.*?)</xmpMM:History>", text, re.DOTALL)
+    if match:
+        history_block = match.group(1)
+        text = text.replace(history_block, "")
+        for item in re.split(r"<rdf:li\b", history_block)[1:]:
+            event = {key.split(":", 1)[1]: value
+                     for key, value in _xmp_attributes("<rdf:li" + item).items()
+                     if key.startswith("stEvt:")}
+            if event:
+                history.append(event)
+
+    properties = _xmp_attributes(text)
+    return {
+        "properties": dict(list(properties.items())[:_MAX_LIST_VALUES]),
+        "history": history[:_MAX_LIST_VALUES],
+        "length": len(packet)
+    }
+
+
+def read_photoshop_resources(block: bytes) -> Tuple[List[int], Dict[str, Any]]:
+    """
+    Read a Photoshop image resource block (APP13) and the IPTC data in it.
+
+    Args:
+        block: Resource block following the "Photoshop 3.0" signature
+
+    Returns:
+        Tuple of (resource ids present, IPTC datasets with decoded names)
+    """
+    resources = []
+    iptc = {}
+    position = 0
+    while position + 12 <= len(block) and block[position:position + 4] == b"8BIM":
+        resource_id = struct.unpack_from(">H", block, position + 4)[0]
+        name_length = block[position + 6]
+        # Pascal name padded to an even length, including the length byte
+        position += 6 + ((name_length + 2) & ~1)
+        if position + 4 > len(block):
+            break
+        size = struct.unpack_from(">I", block, position)[0]
+        data = block[position + 4:position + 4 + size]
+        position += 4 + size + (size & 1)
+        resources.append(resource_id)
+        if resource_id == _IRB_IPTC:
+            iptc = read_iptc(data)
+    return resources[:_MAX_LIST_VALUES], iptc
+
+
+def read_iptc(data: bytes) -> Dict[str, Any]:
+    """
+    Read the application record datasets of an IPTC-IIM block.
+
+    Args:
+        data: IPTC-IIM records
+
+    Returns:
+        Dataset name -> text, or list of texts for repeated datasets
+    """
+    iptc: Dict[str, Any] = {}
+    position = 0
+    while position + 5 <= len(data) and data[position] == 0x1C:
+        record, dataset = data[position + 1], data[position + 2]
+        size = struct.unpack_from(">H", data, position + 3)[0]
+        if size & 0x8000:
+            # Extended datasets are not used for the fields read here
+            break
+        value = data[position + 5:position + 5 + size]
+        position += 5 + size
+        if record != 2 or dataset not in IPTC_DATASETS:
+            continue
+        name = IPTC_DATASETS[dataset]
+        text = _text(value)
+        if name in iptc:
+            existing = iptc[name] if isinstance(iptc[name], list) else [iptc[name]]
+            iptc[name] = (existing + [text])[:_MAX_LIST_VALUES]
+        else:
+            iptc[name] = text
+    return iptc
+
+
+def read_icc(profile: bytes) -> Dict[str, Any]:
+    """
+    Read the header fields and description of an ICC profile.
+
+    Args:
+        profile: Complete ICC profile
+
+    Returns:
+        Dictionary with size, cmm, version, device_class, color_space,
+        created, creator and description
+    """
+    if len(profile) < 132:
+        return {"size": len(profile)}
+    created = struct.unpack_from(">6H", profile, 24)
+
+    def signature(offset: int) -> str:
+        return _text(profile[offset:offset + 4])
+
+    icc = {
+        "size": len(profile),
+        "cmm": signature(4),
+        "version": f"{profile[8]}.{profile[9] >> 4}",
+        "device_class": signature(12),
+        "color_space": signature(16),
+        "created": "{:04d}-{:02d}-{:02d}T{:02d}:{:02d}:{:02d}".format(*created),
+        "creator": signature(80),
+        "description": None
+    }
+    tag_count = struct.unpack_from(">I", profile, 128)[0]
+    for index in range(min(tag_count, _MAX_IFD_ENTRIES)):
+        entry = 132 + index * 12
+        if entry + 12 > len(profile):
+            break
+        tag, offset, size = struct.unpack_from(">4sII", profile, entry)
+        if tag != b"desc" or offset + 12 > len(profile):
+            continue
+        kind = profile[offset:offset + 4]
+        if kind == b"desc":
+            length = struct.unpack_from(">I", profile, offset + 8)[0]
+            icc["description"] = _text(profile[offset + 12:offset + 12 + length])
+        elif kind == b"mluc":
+            # First localized record: length and offset of a UTF-16BE string
+            length, start = struct.unpack_from(">II", profile, offset + 20)
+            text = profile[offset + start:offset + start + length]
+            icc["description"] = bytes(text).decode("utf-16-be", "replace").strip("\x00 ")
+        break
+    return icc
+
+
+def estimate_jpeg_quality(table: List[int]) -> Optional[int]:
+    """
+    Estimate the libjpeg quality setting that produced a luminance table.
+
+    Args:
+        table: 64 quantization values in zigzag order
+
+    Returns:
+        Quality between 1 and 100, or None for non-standard table sizes
+    """
+    if len(table) != 64:
+        return None
+    scale = sum((value * 100 - 50) / base for value, base in zip(table, _STD_LUMINANCE_ZIGZAG)) / 64
+    quality = (200 - scale) / 2 if scale <= 100 else 5000 / scale
+    return int(round(min(max(quality, 1), 100)))
+
+
+def _read_dqt(segment: bytes, tables: Dict[str, List[int]]) -> None:
+    position = 0
+    while position < len(segment):
+        precision, table_id = segment[position] >> 4, segment[position] & 0x0F
+        size = 128 if precision else 64
+        values = segment[position + 1:position + 1 + size]
+        if len(values) < size:
+            break
+        tables[str(table_id)] = list(struct.unpack(f">{64}{'H' if precision else 'B'}", values))
+        position += 1 + size
+
+
+def _read_sof(marker: int, segment: bytes) -> Dict[str, Any]:
+    precision, height, width, components = struct.unpack_from(">BHHB", segment)
+    sampling = [
+        f"{segment[6 + 3 * index + 1] >> 4}x{segment[6 + 3 * index + 1] & 0x0F}"
+        for index in range(components) if 6 + 3 * index + 2 < len(segment)
+    ]
+    return {
+        "width": width,
+        "height": height,
+        "precision": precision,
+        "components": components,
+        "sampling": sampling,
+        "progressive": marker in _PROGRESSIVE_MARKERS
+    }
+
+
+def read_jpeg(data: bytes, start: int = 0, end: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Read the marker segments of a JPEG stream up to its first scan.
+
+    Args:
+        data: Whole file contents
+        start: Offset of the SOI marker
+        end: End of the stream (defaults to the end of data)
+
+    Returns:
+        Normalized metadata dictionary (see module docstring)
+    """
+    end = len(data) if end is None else end
+    view = memoryview(data)
+    metadata: Dict[str, Any] = {"format": "JPEG", "exif": {}}
+    jpeg: Dict[str, Any] = {"segments": [], "comments": []}
+    tables: Dict[str, List[int]] = {}
+    icc_chunks: Dict[int, bytes] = {}
+
+    position = start + 2
+    while position + 4 <= end:
+        if data[position] != 0xFF:
+            break
+        marker = data[position + 1]
+        if marker == 0xFF:
+            # Fill byte
+            position += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            position += 2
+            continue
+        if marker == 0xD9:
+            break
+        length = struct.unpack_from(">H", data, position + 2)[0]
+        body_start = position + 4
+        segment = view[body_start:min(position + 2 + length, end)]
+
+        if 0xE0 <= marker <= 0xEF:
+            head = bytes(segment[:35])
+            jpeg["segments"].append(f"APP{marker - 0xE0}:" + head.split(b"\x00", 1)[0][:20].decode("latin-1"))
+            if marker == 0xE0 and head.startswith(b"JFIF\x00") and len(segment) >= 12:
+                units, x_density, y_density = struct.unpack_from(">BHH", segment, 7)
+                jpeg["jfif"] = {"version": f"{segment[5]}.{segment[6]:02d}", "density_units": units,
+                                "x_density": x_density, "y_density": y_density}
+            elif marker == 0xE1 and head.startswith(_EXIF_SIGNATURE):
+                exif, thumbnail = read_exif(data, body_start + len(_EXIF_SIGNATURE))
+                metadata["exif"] = exif
+                if thumbnail is not None:
+                    thumbnail.update(read_jpeg_size(data, thumbnail["offset"],
+                                                    thumbnail["offset"] + thumbnail["length"]))
+                    metadata["thumbnail"] = thumbnail
+            elif marker == 0xE1 and head.startswith(_XMP_SIGNATURE):
+                metadata["xmp"] = read_xmp(segment[len(_XMP_SIGNATURE):])
+            elif marker == 0xE1 and head.startswith(_XMP_EXTENSION_SIGNATURE):
+                jpeg["extended_xmp"] = jpeg.get("extended_xmp", 0) + len(segment)
+            elif marker == 0xE2 and head.startswith(_ICC_SIGNATURE) and len(segment) > 14:
+                icc_chunks[segment[12]] = bytes(segment[14:])
+            elif marker == 0xED and head.startswith(_PHOTOSHOP_SIGNATURE):
+                resources, iptc = read_photoshop_resources(bytes(segment[len(_PHOTOSHOP_SIGNATURE):]))
+                metadata["photoshop"] = resources
+                if iptc:
+                    metadata["iptc"] = iptc
+            elif marker == 0xEE and head.startswith(b"Adobe") and len(segment) >= 12:
+                version, _, _, transform = struct.unpack_from(">HHHB", segment, 5)
+                jpeg["adobe"] = {"version": version, "transform": transform}
+        elif marker == 0xDB:
+            _read_dqt(segment, tables)
+        elif marker in _SOF_MARKERS and len(segment) >= 6:
+            frame = _read_sof(marker, segment)
+            metadata["width"], metadata["height"] = frame.pop("width"), frame.pop("height")
+            jpeg["frame"] = frame
+        elif marker == 0xFE and len(jpeg["comments"]) < 8:
+            jpeg["comments"].append(_text(segment))
+        elif marker == 0xDA:
+            # Start of scan: entropy-coded pixel data follows
+            break
+        position += 2 + length
+
+    if icc_chunks:
+        metadata["icc"] = read_icc(b"".join(icc_chunks[index] for index in sorted(icc_chunks)))
+    if tables:
+        jpeg["quantization_tables"] = tables
+        jpeg["estimated_quality"] = estimate_jpeg_quality(tables.get("0", []))
+    metadata["jpeg"] = jpeg
+    return metadata
+
+
+def read_jpeg_size(data: bytes, start: int, end: int) -> Dict[str, int]:
+    """
+    Read only the frame size of an embedded JPEG stream, e.g. a thumbnail.
+
+    Args:
+        data: Whole file contents
+        start: Offset of the SOI marker
+        end: End of the stream
+
+    Returns:
+        Dictionary with width and height, empty if no frame header was found
+    """
+    position = start + 2
+    while position + 9 <= end and data[position] == 0xFF:
+        marker = data[position + 1]
+        if marker == 0xFF:
+            position += 1
+            continue
+        length = struct.unpack_from(">H", data, position + 2)[0]
+        if marker in _SOF_MARKERS:
+            height, width = struct.unpack_from(">HH", data, position + 5)
+            return {"width": width, "height": height}
+        if marker == 0xDA:
+            break
+        position += 2 + length
+    return {}
+
+
+def _inflate(data: bytes) -> bytes:
+    """Decompress a zlib stream, bounded to _MAX_INFLATED bytes."""
+    try:
+        return zlib.decompressobj().decompress(data, _MAX_INFLATED)
+    except zlib.error:
+        return b""
+
+
+def read_png(data: bytes) -> Dict[str, Any]:
+    """
+    Read the chunks of a PNG file, skipping over the image data.
+
+    Args:
+        data: Whole file contents
+
+    Returns:
+        Normalized metadata dictionary (see module docstring)
+    """
+    metadata: Dict[str, Any] = {"format": "PNG", "exif": {}}
+    png: Dict[str, Any] = {"chunks": [], "text": {}}
+    position = len(_PNG_SIGNATURE)
+    while position + 8 <= len(data):
+        length, kind = struct.unpack_from(">I4s", data, position)
+        body_start = position + 8
+        position = body_start + length + 4
+        kind = kind.decode("latin-1")
+        if not png["chunks"] or png["chunks"][-1] != kind:
+            png["chunks"].append(kind)
+        if kind == "IDAT":
+            # Image data: only its length is needed to reach the next chunk
+            continue
+        body = data[body_start:body_start + length]
+
+        if kind == "IHDR" and length >= 13:
+            width, height, bit_depth, color_type, _, _, interlace = struct.unpack_from(">IIBBBBB", body)
+            metadata["width"], metadata["height"] = width, height
+            png.update({"bit_depth": bit_depth, "color_type": color_type, "interlaced": bool(interlace)})
+        elif kind in ("tEXt", "zTXt", "iTXt") and len(png["text"]) < _MAX_LIST_VALUES:
+            key, _, value = body.partition(b"\x00")
+            key = key.decode("latin-1")
+            if kind == "zTXt":
+                text = _text(_inflate(value[1:]))
+            elif kind == "iTXt":
+                compressed = value[:1] == b"\x01"
+                # Skip the compression flag and method, language tag and translated keyword
+                text_bytes = value[2:].split(b"\x00", 2)[-1]
+                text_bytes = _inflate(text_bytes) if compressed else text_bytes
+                if key == "XML:com.adobe.xmp":
+                    metadata["xmp"] = read_xmp(text_bytes)
+                    continue
+                text = _text(text_bytes)
+            else:
+                text = bytes(value[:_MAX_TEXT_LENGTH]).decode("latin-1").strip()
+            png["text"][key] = text
+        elif kind == "eXIf":
+            metadata["exif"], _ = read_exif(data, body_start)
+        elif kind == "iCCP":
+            name, _, profile = body.partition(b"\x00")
+            metadata["icc"] = read_icc(_inflate(profile[1:]))
+            metadata["icc"]["name"] = name.decode("latin-1")
+        elif kind == "pHYs" and length >= 9:
+            x_density, y_density, unit = struct.unpack_from(">IIB", body)
+            png["physical"] = {"x_density": x_density, "y_density": y_density, "unit": unit}
+        elif kind == "tIME" and length >= 7:
+            png["modified"] = "{:04d}-{:02d}-{:02d}T{:02d}:{:02d}:{:02d}".format(
+                *struct.unpack_from(">HBBBBB", body))
+        elif kind == "IEND":
+            break
+    metadata["png"] = png
+    return metadata
+
+
+def read_metadata(data: bytes) -> Dict[str, Any]:
+    """
+    Read the metadata of an image file without decoding its pixels.
+
+    Args:
+        data: Raw encoded image bytes
+
+    Returns:
+        Normalized, JSON-safe metadata dictionary (see module docstring);
+        only "format" and an empty "exif" for unsupported formats
+    """
+    try:
+        if data[:2] == b"\xff\xd8":
+            return read_jpeg(data)
+        if data[:8] == _PNG_SIGNATURE:
+            return read_png(data)
+    except (struct.error, IndexError, ValueError) as e:
+        logger.warning("Could not read the image metadata", extra={"error": str(e)})
+    return {"format": "unknown", "exif": {}}
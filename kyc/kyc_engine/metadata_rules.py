@@ -0,0 +1,356 @@
+"""
+Local rule-based EXIF analysis.
+
+Implements the checks of GLOBAL_TAMPERING_PROMPT without a model call on the
+metadata read by metadata_reader: editing software signatures (EXIF, XMP
+history, IPTC, PNG text), make/model and date consistency, missing field
+patterns and the embedded EXIF thumbnail compared with the image itself. Each
+check that fires adds a finding with its own confidence; metadata_check only
+asks the model when the overall confidence is below
+KYC_METADATA_LLM_CONFIDENCE.
+"""
+import io
+import re
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from .image_input import LoadedImage
+
+# Statuses, as returned by the model for GLOBAL_TAMPERING_PROMPT
+SUCCESS = "success"
+FLAG = "flag for review"
+FAIL = "fail"
+
+# Signatures of editing tools, matched in every software field (see _software_fields)
+EDITING_SOFTWARE = (
+    (r"photoshop", "Adobe Photoshop"),
+    (r"lightroom", "Adobe Lightroom"),
+    (r"adobe (express|firefly|illustrator)", "Adobe"),
+    (r"\bgimp\b", "GIMP"),
+    (r"snapseed", "Snapseed"),
+    (r"affinity photo", "Affinity Photo"),
+    (r"pixelmator", "Pixelmator"),
+    (r"paint\.net", "Paint.NET"),
+    (r"picsart", "PicsArt"),
+    (r"facetune", "Facetune"),
+    (r"\bcanva\b", "Canva"),
+    (r"\bfotor\b", "Fotor"),
+    (r"pixlr", "Pixlr"),
+    (r"photoscape", "PhotoScape"),
+    (r"meitu", "Meitu"),
+    (r"polarr", "Polarr"),
+    (r"corel", "Corel"),
+    (r"capture one", "Capture One"),
+    (r"darktable", "darktable"),
+    (r"\bphotopea\b", "Photopea"),
+)
+
+# Software strings written by cameras and phone operating systems
+CAMERA_SOFTWARE = re.compile(
+    r"^(ios|android|hdr\+|google|version|ver\.|firmware|fw)\b|^[\d.() ]+$|^[A-Z0-9][A-Z0-9._-]{5,}$",
+    re.IGNORECASE
+)
+
+# Manufacturer keywords, used to check that Make and Model name the same brand
+BRANDS = {
+    "apple": ("apple", "iphone", "ipad"),
+    "samsung": ("samsung", "galaxy", "sm-"),
+    "google": ("google", "pixel"),
+    "huawei": ("huawei", "honor"),
+    "xiaomi": ("xiaomi", "redmi", "poco"),
+    "oppo": ("oppo",),
+    "vivo": ("vivo",),
+    "oneplus": ("oneplus",),
+    "motorola": ("motorola", "moto "),
+    "nokia": ("nokia", "hmd"),
+    "sony": ("sony", "xperia", "ilce", "dsc-"),
+    "canon": ("canon", "eos", "powershot"),
+    "nikon": ("nikon", "coolpix"),
+    "fujifilm": ("fujifilm", "x-t", "x100"),
+    "olympus": ("olympus", "om digital"),
+    "panasonic": ("panasonic", "lumix", "dmc-"),
+}
+
+# EXIF date format and the tolerance between dates of one capture
+EXIF_DATE_FORMAT = "%Y:%m:%d %H:%M:%S"
+DATE_TOLERANCE = timedelta(seconds=60)
+
+# Capture fields a camera writes; their absence next to Make/Model suggests re-saving
+CAPTURE_FIELDS = ("DateTimeOriginal", "ExposureTime", "FNumber", "ISOSpeedRatings")
+
+# Thumbnail comparison thresholds
+THUMBNAIL_ASPECT_TOLERANCE = 0.05
+THUMBNAIL_MIN_CORRELATION = 0.8
+
+# EXIF orientation -> PIL transpose, as in ImageOps.exif_transpose
+_ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+
+def _finding(check: str, status: str, message: str, confidence: float) -> Dict[str, Any]:
+    return {"check": check, "status": status, "message": message, "confidence": confidence}
+
+
+def _text(value: Any) -> str:
+    if isinstance(value, bytes):
+        value = value.decode("utf-8", "ignore")
+    return str(value).strip("\x00 ").strip()
+
+
+def _software_fields(metadata: Dict[str, Any]) -> List[str]:
+    """Collect every field naming the software that wrote or edited the file."""
+    exif = metadata.get("exif", {})
+    xmp = metadata.get("xmp", {})
+    iptc = metadata.get("iptc", {})
+    fields = [exif.get("Software"), exif.get("ProcessingSoftware"),
+              xmp.get("properties", {}).get("xmp:CreatorTool"),
+              iptc.get("OriginatingProgram"), metadata.get("png", {}).get("text", {}).get("Software")]
+    # Every tool recorded in the XMP edit history
+    fields += [event.get("softwareAgent") for event in xmp.get("history", [])]
+    return list(dict.fromkeys(_text(field) for field in fields if field))
+
+
+def check_software(metadata: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Look for editing tools in the software fields.
+
+    Args:
+        metadata: Normalized metadata from metadata_reader
+
+    Returns:
+        Findings of the check
+    """
+    fields = _software_fields(metadata)
+    for field in fields:
+        for pattern, name in EDITING_SOFTWARE:
+            if re.search(pattern, field, re.IGNORECASE):
+                return [_finding("software", FAIL,
+                                 f"Image was saved with editing software ({name}: '{field}').", 0.9)]
+
+    make = _text(metadata.get("exif", {}).get("Make", "")).lower()
+    unknown = [field for field in fields
+               if not CAMERA_SOFTWARE.search(field) and not (make and make in field.lower())]
+    if unknown:
+        # Not a known editor, but not recognizably camera firmware either
+        return [_finding("software", SUCCESS, f"Unrecognized software '{unknown[0]}'.", 0.4)]
+    return []
+
+
+def _brand(text: str) -> Optional[str]:
+    text = text.lower()
+    for brand, keywords in BRANDS.items():
+        if any(keyword in text for keyword in keywords):
+            return brand
+    return None
+
+
+def check_make_model(exif: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Check that the camera make and model are both present and agree.
+
+    Args:
+        exif: EXIF tags with decoded names
+
+    Returns:
+        Findings of the check
+    """
+    make = _text(exif.get("Make", ""))
+    model = _text(exif.get("Model", ""))
+    if bool(make) != bool(model):
+        present = "Make" if make else "Model"
+        return [_finding("make_model", FLAG, f"Only the camera {present} is recorded.", 0.6)]
+
+    make_brand, model_brand = _brand(make), _brand(model)
+    if make_brand and model_brand and make_brand != model_brand:
+        return [_finding("make_model", FLAG,
+                         f"Camera make '{make}' does not match model '{model}'.", 0.75)]
+    return []
+
+
+def _parse_date(value: Any) -> Optional[datetime]:
+    try:
+        return datetime.strptime(_text(value)[:19], EXIF_DATE_FORMAT)
+    except ValueError:
+        return None
+
+
+def check_dates(exif: Dict[str, Any], now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """
+    Check the capture, digitization and modification dates against each other.
+
+    Args:
+        exif: EXIF tags with decoded names
+        now: Current time, for the future date check
+
+    Returns:
+        Findings of the check
+    """
+    now = now or datetime.now()
+    findings = []
+    dates = {}
+    for tag in ("DateTimeOriginal", "DateTimeDigitized", "DateTime"):
+        if tag not in exif:
+            continue
+        parsed = _parse_date(exif[tag])
+        if parsed is None:
+            findings.append(_finding("dates", FLAG, f"{tag} is malformed ('{_text(exif[tag])}').", 0.5))
+        else:
+            dates[tag] = parsed
+
+    original = dates.get("DateTimeOriginal")
+    if original is not None and original > now + timedelta(days=1):
+        findings.append(_finding("dates", FLAG, f"Capture date {original} lies in the future.", 0.7))
+    modified = dates.get("DateTime")
+    if original is not None and modified is not None and modified - original > DATE_TOLERANCE:
+        findings.append(_finding("dates", FLAG,
+                                 f"File was modified on {modified}, after its capture on {original}.", 0.65))
+    digitized = dates.get("DateTimeDigitized")
+    if original is not None and digitized is not None and abs(digitized - original) > DATE_TOLERANCE:
+        # Also the case for scans of printed photos
+        findings.append(_finding("dates", FLAG,
+                                 f"Digitization date {digitized} differs from capture date {original}.", 0.5))
+    return findings
+
+
+def check_missing_fields(metadata: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Look for patterns of missing fields.
+
+    Args:
+        metadata: Normalized metadata from metadata_reader
+
+    Returns:
+        Findings of the check
+    """
+    exif = metadata.get("exif", {})
+    if not exif and not metadata.get("xmp") and not metadata.get("iptc"):
+        return [_finding("missing_fields", FLAG,
+                         "No EXIF, XMP or IPTC metadata. This is common for screenshots and images "
+                         "sent through messaging apps, but the capture cannot be verified.", 0.9)]
+    if exif.get("Make") or exif.get("Model"):
+        missing = [field for field in CAPTURE_FIELDS if field not in exif]
+        if len(missing) == len(CAPTURE_FIELDS):
+            return [_finding("missing_fields", FLAG,
+                             "Camera is recorded but all capture fields are missing, "
+                             "which suggests the image was re-saved.", 0.5)]
+    return []
+
+
+def _thumbnail(metadata: Dict[str, Any], image: LoadedImage) -> Optional[Image.Image]:
+    """Decode the EXIF thumbnail (IFD1) located by metadata_reader."""
+    location = metadata.get("thumbnail")
+    if not location:
+        return None
+    data = image.raw[location["offset"]:location["offset"] + location["length"]]
+    try:
+        thumbnail = Image.open(io.BytesIO(data)).convert("L")
+        thumbnail.load()
+        return thumbnail
+    except Exception:
+        return None
+
+
+def _trim_borders(gray: np.ndarray) -> np.ndarray:
+    """Remove black letterbox bars some cameras add around thumbnails."""
+    rows = np.where(gray.mean(axis=1) > 8)[0]
+    cols = np.where(gray.mean(axis=0) > 8)[0]
+    if rows.size == 0 or cols.size == 0:
+        return gray
+    return gray[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+
+
+def check_thumbnail(metadata: Dict[str, Any], image: Optional[LoadedImage]) -> List[Dict[str, Any]]:
+    """
+    Compare the embedded EXIF thumbnail with the image.
+
+    Editors often keep the camera thumbnail while changing the image, so a
+    thumbnail that shows something else is strong evidence of editing.
+
+    Args:
+        metadata: Normalized metadata from metadata_reader
+        image: Loaded upload
+
+    Returns:
+        Findings of the check
+    """
+    if image is None:
+        return []
+    thumbnail = _thumbnail(metadata, image)
+    if thumbnail is None:
+        return []
+    orientation = metadata.get("exif", {}).get("Orientation", 1)
+    if orientation in _ORIENTATION_TRANSPOSE:
+        # Match the orientation applied when the image itself is decoded
+        thumbnail = thumbnail.transpose(_ORIENTATION_TRANSPOSE[orientation])
+    thumb = _trim_borders(np.asarray(thumbnail))
+
+    reduced = image.reduced_bgr(max(thumb.shape) * 4)
+    if reduced is None or min(thumb.shape) < 8:
+        return []
+    height, width = reduced.shape[:2]
+    thumb_aspect = thumb.shape[1] / thumb.shape[0]
+    if abs(thumb_aspect - width / height) / (width / height) > THUMBNAIL_ASPECT_TOLERANCE:
+        return [_finding("thumbnail", FLAG,
+                         "EXIF thumbnail has a different aspect ratio than the image, "
+                         "so the image was cropped or resized after capture.", 0.7)]
+
+    gray = cv2.cvtColor(reduced, cv2.COLOR_BGR2GRAY)
+    gray = cv2.resize(gray, (thumb.shape[1], thumb.shape[0]), interpolation=cv2.INTER_AREA)
+    a = gray.astype(np.float32) - gray.mean()
+    b = thumb.astype(np.float32) - thumb.mean()
+    correlation = float((a * b).sum() / max(np.sqrt((a * a).sum() * (b * b).sum()), 1e-6))
+    if correlation < THUMBNAIL_MIN_CORRELATION:
+        return [_finding("thumbnail", FAIL,
+                         f"EXIF thumbnail does not match the image (correlation {correlation:.2f}), "
+                         "so the image was changed after capture.", 0.85)]
+    return []
+
+
+def analyze_metadata(metadata: Dict[str, Any], image: Optional[LoadedImage] = None) -> Dict[str, Any]:
+    """
+    Analyze image metadata for signs of tampering.
+
+    Args:
+        metadata: Normalized metadata from metadata_reader
+        image: Loaded upload, for the thumbnail check
+
+    Returns:
+        Dictionary with status and message (as returned by the model),
+        confidence between 0 and 1 and the individual findings
+    """
+    exif = metadata.get("exif", {})
+    findings = (check_software(metadata) + check_make_model(exif)
+                + check_dates(exif) + check_missing_fields(metadata)
+                + check_thumbnail(metadata, image))
+
+    for status in (FAIL, FLAG):
+        matched = [finding for finding in findings if finding["status"] == status]
+        if matched:
+            return {
+                "status": status,
+                "message": " ".join(finding["message"] for finding in matched),
+                "confidence": max(finding["confidence"] for finding in matched),
+                "findings": findings
+            }
+
+    # Nothing suspicious: confidence depends on how much there was to check
+    complete = all(exif.get(field) for field in ("Make", "Model", "DateTimeOriginal"))
+    confidence = min([0.85 if complete else 0.5] + [finding["confidence"] for finding in findings])
+    return {
+        "status": SUCCESS,
+        "message": "Metadata is consistent with an unedited camera image."
+                   if complete else "No signs of tampering in the available metadata.",
+        "confidence": confidence,
+        "findings": findings
+    }
@@ -0,0 +1,350 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+A small dependency-free registry of counters, gauges and histograms. Updates
+take one short lock and a bucket lookup, so instrumenting hot paths costs
+well under a microsecond; the text is only built when /metrics is scraped.
+
+Metrics are per process. With several server processes, scrape each one
+(or run one process per container, as usual with Prometheus).
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Content type of the text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latency buckets in seconds, from cache hits to slow Gemini round trips
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Upload size buckets: 64 KB to 32 MB
+BYTES_BUCKETS = tuple(64 * 1024 * 2 ** i for i in range(10))
+# Image size buckets: 0.25 to 64 megapixels
+PIXELS_BUCKETS = tuple(250000 * 2 ** i for i in range(9))
+
+# Pipeline stage the current code runs for; labels the Gemini calls
+current_stage: ContextVar[str] = ContextVar("kyc_current_stage", default="other")
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Value:
+    """A single counter or gauge series."""
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        with self._lock:
+            self.value = value
+
+    @contextmanager
+    def track(self) -> Iterator[None]:
+        """Count the enclosed block as in progress."""
+        self.inc()
+        try:
+            yield
+        finally:
+            self.dec()
+
+    def samples(self, name: str, labels: str) -> List[str]:
+        return [f"{name}{labels} {_format_value(self.value)}"]
+
+
+class _HistogramValue:
+    """A single histogram series."""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        # Per-bucket counts (not cumulative); the last slot is +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """Observe the wall time of the enclosed block in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def samples(self, name: str, labels: str) -> List[str]:
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+        lines = []
+        cumulative = 0
+        # Bucket labels go after the series labels
+        prefix = labels[:-1] + "," if labels else "{"
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{prefix}le="{_format_value(bound)}"}} {cumulative}')
+        lines.append(f"{name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{name}_count{labels} {cumulative}")
+        return lines
+
+
+class _Metric:
+    """A named metric with a fixed set of label names and one series per label set."""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+        # Unlabelled metrics are updated directly through their single series
+        self._default = None if self.labelnames else self.labels()
+        REGISTRY.register(self)
+
+    def _new_series(self) -> Any:
+        return _Value()
+
+    def labels(self, *values: str) -> Any:
+        """Get the series for the given label values, in labelnames order."""
+        key = tuple(str(value) for value in values)
+        series = self._series.get(key)
+        if series is None:
+            with self._lock:
+                series = self._series.get(key)
+                if series is None:
+                    series = self._new_series()
+                    self._series[key] = series
+        return series
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            series = sorted(self._series.items())
+        for values, value in series:
+            lines.extend(value.samples(self.name, _format_labels(self.labelnames, values)))
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1) -> None:
+        self._default.inc(amount)
+
+
+class Gauge(_Metric):
+    """Value that goes up and down, e.g. requests in flight."""
+
+    kind = "gauge"
+
+    def inc(self, amount: float = 1) -> None:
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1) -> None:
+        self._default.dec(amount)
+
+    def set(self, value: float) -> None:
+        self._default.set(value)
+
+    def track(self):
+        """Count the enclosed block as in progress."""
+        return self._default.track()
+
+
+class Histogram(_Metric):
+    """Distribution of observed values over fixed buckets."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_series(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+    def time(self):
+        """Observe the wall time of the enclosed block in seconds."""
+        return self._default.time()
+
+
+class Registry:
+    """Set of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> None:
+        with self._lock:
+            self._metrics.append(metric)
+
+    def render(self) -> str:
+        """Render every metric in the text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics)
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def render_metrics() -> str:
+    """
+    Render the process metrics for a /metrics scrape.
+
+    Returns:
+        Metrics in the Prometheus text exposition format (CONTENT_TYPE)
+    """
+    return REGISTRY.render()
+
+
+# Pipeline
+STAGE_DURATION = Histogram("kyc_stage_duration_seconds",
+                           "Wall time of each pipeline stage.", ["stage"])
+STAGE_ERRORS = Counter("kyc_stage_errors_total",
+                       "Pipeline stages that raised instead of returning a result.", ["stage"])
+STAGES_IN_FLIGHT = Gauge("kyc_stages_in_flight", "Pipeline stages currently running.", ["stage"])
+PIPELINE_DURATION = Histogram("kyc_pipeline_duration_seconds", "Wall time of a whole pipeline run.")
+DECISIONS = Counter("kyc_decisions_total", "Final decisions by outcome and by who decided.",
+                    ["decision", "source"])
+
+# Gemini
+GEMINI_DURATION = Histogram("kyc_gemini_call_duration_seconds",
+                            "Wall time of a Gemini call including retries.", ["stage", "outcome"])
+GEMINI_RETRIES = Counter("kyc_gemini_retries_total",
+                         "Gemini attempts that failed and were retried.", ["stage", "reason"])
+GEMINI_FAILURES = Counter("kyc_gemini_failures_total",
+                          "Gemini calls that failed after their last attempt.", ["stage", "reason"])
+GEMINI_IN_FLIGHT = Gauge("kyc_gemini_calls_in_flight", "Gemini calls currently in progress.")
+MODEL_BACKEND_DURATION = Histogram("kyc_model_backend_duration_seconds",
+                                   "Wall time of a model backend call, by backend and outcome.",
+                                   ["backend", "outcome"])
+MODEL_HEDGES = Counter("kyc_model_hedges_total",
+                       "Backup model requests sent, because the running ones were slow (hedge) "
+                       "or failed (failover).", ["stage", "backend", "reason"])
+MODEL_ANSWERS = Counter("kyc_model_answers_total",
+                        "Routed model calls by the backend whose answer was used.", ["stage", "backend"])
+LLM_REPLAYS = Counter("kyc_llm_replays_total",
+                      "Model calls looked up in the record/replay store, by result.", ["stage", "result"])
+GEMINI_RATE_LIMIT_WAIT = Histogram("kyc_gemini_rate_limit_wait_seconds",
+                                   "Time Gemini attempts waited for the client-side rate limiter.")
+GEMINI_CIRCUIT_OPEN = Gauge("kyc_gemini_circuit_open",
+                            "1 while the Gemini circuit breaker of this process is open.")
+JSON_PARSE_FAILURES = Counter("kyc_json_parse_failures_total",
+                              "Model answers that contained no valid JSON.", ["stage"])
+
+# Uploads and admission control
+UPLOAD_BYTES = Histogram("kyc_upload_size_bytes", "Size of the uploaded images.",
+                         buckets=BYTES_BUCKETS)
+UPLOAD_PIXELS = Histogram("kyc_upload_pixels", "Pixel count of the uploaded images.",
+                          buckets=PIXELS_BUCKETS)
+UPLOAD_REJECTIONS = Counter("kyc_upload_rejections_total",
+                            "Uploads refused by the size limits or admission control.", ["reason"])
+VERIFICATIONS_IN_FLIGHT = Gauge("kyc_verifications_in_flight",
+                                "Verifications holding room in the admission budget.")
+VERIFICATIONS_WAITING = Gauge("kyc_verifications_waiting",
+                              "Verifications waiting for room in the admission budget.")
+ADMISSION_RESERVED_BYTES = Gauge("kyc_admission_reserved_bytes",
+                                 "Decoded-image memory reserved by verifications in flight.")
+
+
+class GeminiCall:
+    """Outcome tracking for one Gemini call, see gemini_call()."""
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.reason: Optional[str] = None
+        self.failed = False
+
+    def error(self, reason: str) -> None:
+        """Record why the current attempt failed."""
+        self.reason = reason
+
+    def retry(self) -> None:
+        """Count a retry of the attempt that just failed."""
+        GEMINI_RETRIES.labels(self.stage, self.reason or "unknown").inc()
+
+    def fail(self) -> None:
+        """Mark the call as failed after its last attempt."""
+        self.failed = True
+        GEMINI_FAILURES.labels(self.stage, self.reason or "unknown").inc()
+
+
+@contextmanager
+def gemini_call() -> Iterator[GeminiCall]:
+    """
+    Measure one Gemini call (all its attempts) for the current stage.
+
+    Yields:
+        GeminiCall used to report attempt errors, retries and the final failure
+    """
+    call = GeminiCall(current_stage.get())
+    GEMINI_IN_FLIGHT.inc()
+    start = time.perf_counter()
+    try:
+        yield call
+    finally:
+        GEMINI_IN_FLIGHT.dec()
+        outcome = "failure" if call.failed else "success"
+        GEMINI_DURATION.labels(call.stage, outcome).observe(time.perf_counter() - start)
+
+
+@contextmanager
+def stage_context(stage: str) -> Iterator[None]:
+    """
+    Run the enclosed block as the given pipeline stage: it is timed, counted
+    as in flight, and labels the Gemini calls made from it.
+
+    Args:
+        stage: Name of the stage
+    """
+    token = current_stage.set(stage)
+    in_flight = STAGES_IN_FLIGHT.labels(stage)
+    in_flight.inc()
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.labels(stage).inc()
+        raise
+    finally:
+        STAGE_DURATION.labels(stage).observe(time.perf_counter() - start)
+        in_flight.dec()
+        current_stage.reset(token)
@@ -0,0 +1,388 @@
+"""
+Model backends and request routing for the model calls with an image.
+
+A backend sends a prompt (and image) to one model service and returns the
+answer text, or the failure_response() JSON when the service cannot answer.
+call_model() routes a call over several backends in order of preference:
+
+- failover: when a backend fails, the next one is asked at once;
+- hedging: when a backend has not answered after the KYC_HEDGE_QUANTILE
+  (p95 by default) of its recent latencies, the next one is asked too.
+
+The first valid answer wins and the requests still running are cancelled.
+Hedges only fire for the slowest few percent of calls, so they cut the tail
+latency for a few percent more requests. Each backend tracks its own
+latencies, which also feed the kyc_model_backend_duration_seconds metric.
+
+Routed calls always run on asyncio, so a losing request can be cancelled: the
+synchronous call_model() hands them to a background event loop instead of
+leaving them to occupy worker threads.
+"""
+import asyncio
+import base64
+import json
+import logging
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Sequence
+
+import requests
+
+from .image_input import ImageSource
+from .log_config import bind_context
+from .metrics import MODEL_ANSWERS, MODEL_BACKEND_DURATION, MODEL_HEDGES, current_stage
+from .shared import (
+    GEMINI_ENDPOINT,
+    HEDGE_DEFAULT_DELAY,
+    HEDGE_MIN_DELAY,
+    HEDGE_MIN_SAMPLES,
+    HEDGE_QUANTILE,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_READ_TIMEOUT,
+    MODEL_HEDGING,
+    MODEL_LATENCY_WINDOW,
+    OLLAMA_MODEL,
+    OLLAMA_URL,
+    api_call,
+    async_api_call,
+    failure_response,
+    get_async_http_session,
+    get_http_session,
+    is_api_failure,
+    prepare_model_image,
+    record_answer,
+    replay_lookup,
+    run_blocking
+)
+
+logger = logging.getLogger(__name__)
+
+# Event loop running the routed calls of synchronous callers, created on first use
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+class LatencyTracker:
+    """Recent latencies of the successful calls of one backend."""
+
+    def __init__(self, window: int = MODEL_LATENCY_WINDOW):
+        self._samples: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, share: float) -> Optional[float]:
+        """Nearest-rank quantile (share in 0-1) of the recent latencies, None without samples."""
+        with self._lock:
+            ordered = sorted(self._samples)
+        if not ordered:
+            return None
+        return ordered[min(max(math.ceil(share * len(ordered)), 1), len(ordered)) - 1]
+
+    def hedge_delay(self) -> float:
+        """
+        Seconds to wait for this backend before sending a backup request.
+
+        Returns:
+            The HEDGE_QUANTILE latency (at least HEDGE_MIN_DELAY), or
+            HEDGE_DEFAULT_DELAY until HEDGE_MIN_SAMPLES calls were observed
+        """
+        with self._lock:
+            samples = len(self._samples)
+        if samples < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY
+        return max(HEDGE_MIN_DELAY, self.quantile(HEDGE_QUANTILE))
+
+
+class ModelBackend(ABC):
+    """A model service answering prompts with an optional image."""
+
+    name = "backend"
+
+    def __init__(self):
+        self.latency = LatencyTracker()
+
+    def call(self, prompt_text: str, img_path: Optional[ImageSource] = None) -> str:
+        """
+        Ask the model.
+
+        Args:
+            prompt_text: Text prompt to send
+            img_path: Optional path to image file or LoadedImage
+
+        Returns:
+            Answer text, or the failure_response() JSON
+        """
+        start = time.perf_counter()
+        answer = self._call(prompt_text, img_path)
+        self._observe(answer, time.perf_counter() - start)
+        return answer
+
+    async def acall(self, prompt_text: str, img_path: Optional[ImageSource] = None) -> str:
+        """Asyncio counterpart of call()."""
+        start = time.perf_counter()
+        answer = await self._acall(prompt_text, img_path)
+        self._observe(answer, time.perf_counter() - start)
+        return answer
+
+    def _observe(self, answer: str, seconds: float) -> None:
+        ok = valid_answer(answer)
+        if ok:
+            self.latency.observe(seconds)
+        MODEL_BACKEND_DURATION.labels(self.name, "success" if ok else "failure").observe(seconds)
+
+    @abstractmethod
+    def _call(self, prompt_text: str, img_path: Optional[ImageSource]) -> str:
+        """Send the request; returns the answer text or the failure_response() JSON."""
+
+    @abstractmethod
+    async def _acall(self, prompt_text: str, img_path: Optional[ImageSource]) -> str:
+        """Asyncio counterpart of _call()."""
+
+
+class GeminiBackend(ModelBackend):
+    """Gemini generateContent, through api_call() and its retry policy."""
+
+    name = "gemini"
+
+    def __init__(self, endpoint: str = GEMINI_ENDPOINT):
+        super().__init__()
+        self.endpoint = endpoint
+
+    def _call(self, prompt_text: str, img_path: Optional[ImageSource]) -> str:
+        return api_call(self.endpoint, prompt_text, img_path)
+
+    async def _acall(self, prompt_text: str, img_path: Optional[ImageSource]) -> str:
+        return await async_api_call(self.endpoint, prompt_text, img_path)
+
+
+class OllamaBackend(ModelBackend):
+    """A local Ollama-compatible /api/chat endpoint serving a vision model."""
+
+    name = "ollama"
+
+    def __init__(self, url: str = OLLAMA_URL, model: str = OLLAMA_MODEL):
+        super().__init__()
+        self.endpoint = f"{url}/api/chat"
+        self.model = model
+
+    def _payload(self, prompt_text: str, img_path: Optional[ImageSource]) -> bytes:
+        message: Dict[str, Any] = {"role": "user", "content": prompt_text}
+        if img_path:
+            message["images"] = [base64.b64encode(prepare_model_image(img_path)[0]).decode("ascii")]
+        return json.dumps({
+            "model": self.model,
+            "messages": [message],
+            "stream": False,
+            "format": "json",
+            "options": {"temperature": 0}
+        }).encode("utf-8")
+
+    def _call(self, prompt_text: str, img_path: Optional[ImageSource]) -> str:
+        payload = self._payload(prompt_text, img_path)
+        recording, replayed, delay = replay_lookup(self.endpoint, payload)
+        if replayed is not None:
+            if delay:
+                time.sleep(delay)
+            return replayed
+
+        started = time.perf_counter()
+        try:
+            response = get_http_session().post(self.endpoint, data=payload,
+                                               headers={"Content-Type": "application/json"},
+                                               timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+            response.raise_for_status()
+            answer = response.json()["message"]["content"]
+        except (requests.RequestException, ValueError, KeyError, TypeError) as e:
+            logger.warning("Ollama call failed", extra={"error": str(e)})
+            return failure_response(self.endpoint)
+        return record_answer(recording, answer, started)
+
+    async def _acall(self, prompt_text: str, img_path: Optional[ImageSource]) -> str:
+        # Preparing the image is blocking CPU work
+        payload = await run_blocking(self._payload, prompt_text, img_path)
+        recording, replayed, delay = replay_lookup(self.endpoint, payload)
+        if replayed is not None:
+            if delay:
+                await asyncio.sleep(delay)
+            return replayed
+
+        started = time.perf_counter()
+        try:
+            async with get_async_http_session().post(
+                    self.endpoint, data=payload, headers={"Content-Type": "application/json"}) as response:
+                response.raise_for_status()
+                answer = (await response.json(content_type=None))["message"]["content"]
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Ollama call failed", extra={"error": str(e)})
+            return failure_response(self.endpoint)
+        return record_answer(recording, answer, started)
+
+
+# One instance per backend name, so latencies are tracked across calls
+_BACKEND_TYPES = {"gemini": GeminiBackend, "ollama": OllamaBackend}
+_backends: Dict[str, ModelBackend] = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend(name: str) -> ModelBackend:
+    """
+    Get the shared backend instance of a name.
+
+    Args:
+        name: Backend name, gemini or ollama
+
+    Returns:
+        ModelBackend instance
+    """
+    with _backends_lock:
+        if name not in _backends:
+            if name not in _BACKEND_TYPES:
+                raise ValueError(f"Unknown model backend: {name}")
+            _backends[name] = _BACKEND_TYPES[name]()
+        return _backends[name]
+
+
+def valid_answer(answer: str) -> bool:
+    """
+    Check whether an answer can be used, i.e. holds a JSON object that is not
+    a failure_response().
+
+    Args:
+        answer: Answer text of a backend
+
+    Returns:
+        True if the answer is usable
+    """
+    start = answer.find("{")
+    end = answer.rfind("}") + 1
+    if start == -1 or end == 0:
+        return False
+    try:
+        result = json.loads(answer[start:end])
+    except json.JSONDecodeError:
+        return False
+    return isinstance(result, dict) and not is_api_failure(result)
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """Get the background event loop of synchronous routed calls, started on first use."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="kyc-model-loop", daemon=True).start()
+        return _loop
+
+
+def _next_delay(backend: ModelBackend, launched: float, remaining: int) -> Optional[float]:
+    """Seconds until the backup request is due, None if there is none."""
+    if not MODEL_HEDGING or remaining == 0:
+        return None
+    return max(0.0, launched + backend.latency.hedge_delay() - time.perf_counter())
+
+
+def call_model(prompt_text: str, img_path: Optional[ImageSource] = None,
+               backends: Optional[Sequence[ModelBackend]] = None) -> str:
+    """
+    Ask the backends in order of preference, with failover and hedging.
+
+    With several backends the call runs async_call_model() on the background
+    event loop and waits for it, so requests that lose are cancelled rather
+    than left running in threads.
+
+    Args:
+        prompt_text: Text prompt to send
+        img_path: Optional path to image file or LoadedImage
+        backends: Backends to use (default: the gemini backend)
+
+    Returns:
+        The first valid answer, or the answer of the last backend to fail
+    """
+    backends = list(backends or [get_backend("gemini")])
+    if len(backends) == 1:
+        return backends[0].call(prompt_text, img_path)
+
+    answer: Future = Future()
+
+    def finished(task: "asyncio.Task") -> None:
+        if task.cancelled():
+            answer.cancel()
+        elif task.exception() is not None:
+            answer.set_exception(task.exception())
+        else:
+            answer.set_result(task.result())
+
+    def start() -> None:
+        # Runs in the caller's context, which the task copies (request id, stage)
+        task = asyncio.ensure_future(async_call_model(prompt_text, img_path, backends))
+        task.add_done_callback(finished)
+
+    _get_loop().call_soon_threadsafe(bind_context(start))
+    return answer.result()
+
+
+async def async_call_model(prompt_text: str, img_path: Optional[ImageSource] = None,
+                           backends: Optional[Sequence[ModelBackend]] = None) -> str:
+    """
+    Asyncio counterpart of call_model(); requests that lose are cancelled.
+
+    Args:
+        prompt_text: Text prompt to send
+        img_path: Optional path to image file or LoadedImage
+        backends: Backends to use (default: the gemini backend)
+
+    Returns:
+        The first valid answer, or the answer of the last backend to fail
+    """
+    backends = list(backends or [get_backend("gemini")])
+    if len(backends) == 1:
+        return await backends[0].acall(prompt_text, img_path)
+
+    stage = current_stage.get()
+    pending: Dict[asyncio.Task, ModelBackend] = {}
+    queue: List[ModelBackend] = list(backends)
+    last_answer = failure_response(backends[-1].name)
+    latest, launched = None, 0.0
+
+    def launch(reason: Optional[str] = None) -> None:
+        nonlocal latest, launched
+        backend = queue.pop(0)
+        if reason:
+            MODEL_HEDGES.labels(stage, backend.name, reason).inc()
+        pending[asyncio.ensure_future(backend.acall(prompt_text, img_path))] = backend
+        latest, launched = backend, time.perf_counter()
+
+    launch()
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, timeout=_next_delay(latest, launched, len(queue)),
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                launch("hedge")
+                continue
+            for task in done:
+                backend = pending.pop(task)
+                try:
+                    answer = task.result()
+                except Exception:
+                    logger.warning("Model backend raised", extra={"backend": backend.name}, exc_info=True)
+                    answer = failure_response(backend.name)
+                if valid_answer(answer):
+                    MODEL_ANSWERS.labels(stage, backend.name).inc()
+                    return answer
+                last_answer = answer
+                if queue:
+                    launch("failover")
+        return last_answer
+    finally:
+        for task in pending:
+            task.cancel()
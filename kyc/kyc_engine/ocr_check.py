@@ -1,41 +1,55 @@
 """
 OCR verification module for extracting and verifying information from ID cards with multilingual support.
 """
-from typing import Dict, Optional, Any
+from typing import Dict, List, Optional, Any
 
-from ollama import chat, ChatResponse
+from .image_input import ImageSource
+from .model_backends import ModelBackend, async_call_model, call_model, get_backend
 from .shared import (
     GLOBAL_OCR_PROMPT,
-    api_call,
-    GEMINI_ENDPOINT,
+    OCR_BACKENDS,
     parse_json
 )
 
 
-def gemini(form_data: Dict[str, str], img_path: str) -> Optional[Dict[str, Any]]:
+def ocr_backends() -> List[ModelBackend]:
     """
-    Process ID card extraction and verification using the Gemini API with enhanced multilingual support.
+    Get the OCR model backends in order of preference (KYC_OCR_BACKENDS).
+    
+    Returns:
+        List of ModelBackend instances
+    """
+    return [get_backend(name) for name in OCR_BACKENDS]
+
+
+def build_ocr_prompt(form_data: Dict[str, str]) -> str:
+    """
+    Format the OCR prompt with the submitted form data.
     
     Args:
         form_data: Dictionary containing user submitted identity information
-        img_path: Path to the uploaded ID card image
         
     Returns:
-        Parsed JSON result with extraction and verification data including language detection,
-        transliteration, and confidence scores
+        Prompt text for the OCR model call
     """
-    # Format prompt with provided form data
-    prompt = GLOBAL_OCR_PROMPT.format(
+    return GLOBAL_OCR_PROMPT.format(
         form_full_name=form_data.get("full_name", ""),
         form_dob=form_data.get("dob", ""),
         form_nationality=form_data.get("nationality", ""),
         form_id_number=form_data.get("id_number", "")
     )
+
+
+def _postprocess_result(result: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Ensure a parsed OCR result has all the fields consumers rely on.
     
-    # Call API and parse results
-    result = parse_json(api_call(GEMINI_ENDPOINT, prompt, img_path))
-    
-    # Post-process result to ensure it has all required fields
+    Args:
+        result: Parsed OCR result or None
+        
+    Returns:
+        The same result with defaults filled in
+    """
     if result:
         # Ensure detected_language exists
         if "detected_language" not in result:
@@ -51,34 +65,58 @@ def gemini(form_data: Dict[str, str], img_path: str) -> Optional[Dict[str, Any]]
     return result
 
 
-def ollama(form_data: Dict[str, str], image_path: str) -> str:
+def gemini(form_data: Dict[str, str], img_path: ImageSource) -> Optional[Dict[str, Any]]:
     """
-    Process ID card extraction and verification using the Ollama API.
+    Process ID card extraction and verification using the Gemini API with enhanced multilingual support.
     
-    Note: The Ollama Python package currently only accepts text input.
-    If image data is needed, consider encoding and appending it to the prompt.
+    The call is routed over the KYC_OCR_BACKENDS, with failover and hedging
+    when more than one is configured (see model_backends.call_model).
     
     Args:
         form_data: Dictionary containing user submitted identity information
-        image_path: Path to the uploaded ID card image
+        img_path: Path to the uploaded ID card image or a LoadedImage
         
     Returns:
-        Raw response text from Ollama model
+        Parsed JSON result with extraction and verification data including language detection,
+        transliteration, and confidence scores
     """
-    prompt = GLOBAL_OCR_PROMPT.format(
-        form_full_name=form_data.get("full_name", ""),
-        form_dob=form_data.get("dob", ""),
-        form_nationality=form_data.get("nationality", ""),
-        form_id_number=form_data.get("id_number", "")
-    )
-    messages = [
-        {
-            "role": "user",
-            "content": prompt
-        }
-    ]
-    response: ChatResponse = chat(model='lminicpm-v:latest', messages=messages)
-    return response.message.content
+    prompt = build_ocr_prompt(form_data)
+    
+    # Call API and parse results
+    result = parse_json(call_model(prompt, img_path, ocr_backends()))
+    
+    # Post-process result to ensure it has all required fields
+    return _postprocess_result(result)
+
+
+async def gemini_async(form_data: Dict[str, str], img_path: ImageSource) -> Optional[Dict[str, Any]]:
+    """
+    Asyncio counterpart of gemini().
+    
+    Args:
+        form_data: Dictionary containing user submitted identity information
+        img_path: Path to the uploaded ID card image or a LoadedImage
+        
+    Returns:
+        Parsed JSON result, as returned by gemini()
+    """
+    prompt = build_ocr_prompt(form_data)
+    result = parse_json(await async_call_model(prompt, img_path, ocr_backends()))
+    return _postprocess_result(result)
+
+
+def ollama(form_data: Dict[str, str], image_path: ImageSource) -> str:
+    """
+    Process ID card extraction and verification using the local Ollama model only.
+    
+    Args:
+        form_data: Dictionary containing user submitted identity information
+        image_path: Path to the uploaded ID card image or a LoadedImage
+        
+    Returns:
+        Raw response text from the Ollama model, or an error JSON
+    """
+    return get_backend("ollama").call(build_ocr_prompt(form_data), image_path)
 
 
 if __name__ == "__main__":
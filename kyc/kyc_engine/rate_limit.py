@@ -0,0 +1,154 @@
+"""
+Client-side protection of the Gemini quota: a token bucket shared by all
+worker processes, and a circuit breaker.
+
+The token bucket lives in a SQLite file. Each call reserves the next free
+token, even one that is only due later, and then sleeps until it is due, so
+waiting calls are served in order at the quota rate. A call that would have
+to wait longer than the maximum wait takes no token and is refused.
+
+The circuit breaker opens after a run of failed attempts (429, 5xx,
+timeouts). While it is open, calls fail at once instead of tying up a
+worker, and the pipeline falls back to its local checks. After the reset
+time one trial call is let through: if it succeeds the breaker closes,
+otherwise it opens again. Each process has its own breaker.
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Optional
+
+
+class TokenBucket:
+    """Token bucket stored in SQLite, shared by the processes using the same file."""
+
+    def __init__(self, path: str, rate: float, burst: float, name: str = "gemini"):
+        """
+        Args:
+            path: SQLite file, created if missing
+            rate: Tokens added per second
+            burst: Bucket size, i.e. calls allowed at once after a quiet period
+            name: Bucket name, so one file can hold several buckets
+        """
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.name = name
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS token_buckets ("
+            " name TEXT PRIMARY KEY,"
+            " tokens REAL NOT NULL,"
+            " updated REAL NOT NULL)"
+        )
+
+    def reserve(self, max_wait: float) -> Optional[float]:
+        """
+        Reserve a token.
+
+        Args:
+            max_wait: Longest acceptable wait for the token, in seconds
+
+        Returns:
+            Seconds to wait before the call may be made, or None if the token
+            would come later than max_wait (nothing is reserved then)
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = self._conn.execute(
+                    "SELECT tokens, updated FROM token_buckets WHERE name = ?", (self.name,)
+                ).fetchone()
+                tokens = self.burst if row is None else min(self.burst, row[0] + (now - row[1]) * self.rate)
+                # Negative tokens are reservations of waiting calls
+                wait = max(0.0, (1 - tokens) / self.rate)
+                if wait > max_wait:
+                    self._conn.execute("ROLLBACK")
+                    return None
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO token_buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                    (self.name, tokens - 1, now)
+                )
+                self._conn.execute("COMMIT")
+                return wait
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+
+class CircuitBreaker:
+    """Per-process circuit breaker: closed, open or half-open."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float,
+                 on_change: Optional[Callable[[str], None]] = None):
+        """
+        Args:
+            failure_threshold: Consecutive failed attempts that open the breaker
+            reset_timeout: Seconds the breaker stays open before a trial call
+            on_change: Called with the new state on every state change, e.g.
+                to update a gauge; runs under the breaker's lock, so it must
+                not call the breaker
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.on_change = on_change
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def _set_state(self, state: str) -> None:
+        # Callers hold the lock
+        if state != self.state:
+            self.state = state
+            if self.on_change is not None:
+                self.on_change(state)
+
+    def allow(self) -> bool:
+        """
+        Check whether an attempt may be made now.
+
+        Returns:
+            False while the breaker is open, or while the trial call of the
+            half-open breaker is running
+        """
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self._set_state(self.HALF_OPEN)
+            if self.state == self.HALF_OPEN:
+                if self._trial_running:
+                    return False
+                self._trial_running = True
+            return True
+
+    def release(self) -> None:
+        """End an allowed attempt that was not made or not finished, e.g. cancelled."""
+        with self._lock:
+            self._trial_running = False
+
+    def success(self) -> None:
+        """Record a successful attempt; closes the breaker."""
+        with self._lock:
+            self._set_state(self.CLOSED)
+            self._failures = 0
+            self._trial_running = False
+
+    def failure(self) -> None:
+        """Record a failed attempt; opens the breaker after too many, or a failed trial."""
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._set_state(self.OPEN)
+                self._opened_at = time.monotonic()
+            self._trial_running = False
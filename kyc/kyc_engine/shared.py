@@ -1,23 +1,202 @@
+import asyncio
 import base64
+import contextvars
 import json
+import logging
 import os
+import random
+import threading
 import time
-from typing import Optional, Dict, Any
+import weakref
+from email.utils import parsedate_to_datetime
+from typing import Optional, Dict, Any, Callable, Tuple
 
+import cv2
 import requests
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+from .image_input import ImageSource, LoadedImage, load_image
+from .llm_recording import RecordingStore, recording_key
+from .metrics import (
+    GEMINI_CIRCUIT_OPEN,
+    GEMINI_RATE_LIMIT_WAIT,
+    JSON_PARSE_FAILURES,
+    LLM_REPLAYS,
+    GeminiCall,
+    current_stage,
+    gemini_call
+)
+from .rate_limit import CircuitBreaker, TokenBucket
+
+try:
+    import aiohttp
+except ImportError:  # The asyncio path is optional
+    aiohttp = None
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # API configuration
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 GEMINI_MODEL = os.getenv("GEMINI_MODEL")
-GEMINI_ENDPOINT = f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL}:generateContent?key={GEMINI_API_KEY}"
+# GEMINI_ENDPOINT overrides the full generateContent URL, e.g. to point at a
+# local stand-in (api/mock_gemini.py) for load tests
+GEMINI_ENDPOINT = os.getenv("GEMINI_ENDPOINT") or (
+    f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL}:generateContent?key={GEMINI_API_KEY}"
+)
+
+# HTTP client configuration
+HTTP_CONNECT_TIMEOUT = float(os.getenv("KYC_HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("KYC_HTTP_READ_TIMEOUT", "60"))
+HTTP_POOL_CONNECTIONS = int(os.getenv("KYC_HTTP_POOL_CONNECTIONS", "4"))
+HTTP_POOL_MAXSIZE = int(os.getenv("KYC_HTTP_POOL_MAXSIZE", "32"))
+HTTP_BACKOFF_BASE = float(os.getenv("KYC_HTTP_BACKOFF_BASE", "1"))
+HTTP_BACKOFF_MAX = float(os.getenv("KYC_HTTP_BACKOFF_MAX", "30"))
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+API_FAILURE_MESSAGE = "API call failed after multiple attempts"
+
+# Pooled HTTP session shared by all API calls, created on first use
+_http_session: Optional[requests.Session] = None
+_http_session_lock = threading.Lock()
+
+# aiohttp sessions for the asyncio path, one per event loop
+_async_sessions: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+# Image sent to the model: longest side in pixels (0 = send the upload as is)
+# and JPEG quality of the re-encoded copy
+MODEL_IMAGE_MAX_SIDE = int(os.getenv("KYC_MODEL_IMAGE_MAX_SIDE", "1600"))
+MODEL_IMAGE_QUALITY = int(os.getenv("KYC_MODEL_IMAGE_QUALITY", "85"))
+
+# OCR model backends (gemini, ollama), in order of preference. With more
+# than one, a backup request goes to the next backend when the running one
+# fails (failover) or, with hedging on, takes longer than the
+# KYC_HEDGE_QUANTILE of its recent latencies; the first valid answer is used
+OCR_BACKENDS = [name.strip().lower() for name in os.getenv("KYC_OCR_BACKENDS", "gemini").split(",") if name.strip()]
+MODEL_HEDGING = os.getenv("KYC_MODEL_HEDGING", "true").lower() in ("1", "true", "yes")
+HEDGE_QUANTILE = float(os.getenv("KYC_HEDGE_QUANTILE", "0.95"))
+HEDGE_MIN_SAMPLES = int(os.getenv("KYC_HEDGE_MIN_SAMPLES", "20"))
+HEDGE_DEFAULT_DELAY = float(os.getenv("KYC_HEDGE_DEFAULT_DELAY", "10"))
+HEDGE_MIN_DELAY = float(os.getenv("KYC_HEDGE_MIN_DELAY", "0.5"))
+MODEL_LATENCY_WINDOW = int(os.getenv("KYC_MODEL_LATENCY_WINDOW", "200"))
+
+# Local Ollama-compatible server used by the "ollama" backend
+OLLAMA_URL = os.getenv("KYC_OLLAMA_URL", "http://127.0.0.1:11434").rstrip("/")
+OLLAMA_MODEL = os.getenv("KYC_OLLAMA_MODEL", "minicpm-v:latest")
+
+# ID card detection (off, crop or require) and width of the normalized card image
+CARD_DETECTION = os.getenv("KYC_CARD_DETECTION", "crop").lower()
+CARD_WIDTH = int(os.getenv("KYC_CARD_WIDTH", "1280"))
+
+# Pipeline configuration
+PIPELINE_CONCURRENT = os.getenv("KYC_PIPELINE_CONCURRENT", "true").lower() in ("1", "true", "yes")
+PIPELINE_WORKERS = int(os.getenv("KYC_PIPELINE_WORKERS", "32"))
+
+# CPU stage process pool ("auto" = one worker per core, 0 = run in threads)
+_cpu_pool_workers = os.getenv("KYC_CPU_POOL_WORKERS", "auto").lower()
+CPU_POOL_WORKERS = (os.cpu_count() or 1) if _cpu_pool_workers == "auto" else int(_cpu_pool_workers)
+CPU_POOL_THREADS = int(os.getenv("KYC_CPU_POOL_THREADS", "1"))
+
+# Forensic analysis resolution (longest side in pixels, 0 = full resolution)
+ANALYSIS_MAX_SIDE = int(os.getenv("KYC_ANALYSIS_MAX_SIDE", "1600"))
+ANALYSIS_DETAIL_TILES = int(os.getenv("KYC_ANALYSIS_DETAIL_TILES", "6"))
+ANALYSIS_TILE_SIZE = int(os.getenv("KYC_ANALYSIS_TILE_SIZE", "512"))
+
+# Batch verification configuration
+BATCH_WORKERS = int(os.getenv("KYC_BATCH_WORKERS", "4"))
+BATCH_MAX_ITEMS = int(os.getenv("KYC_BATCH_MAX_ITEMS", "1000"))
+
+# Upload limits: request body and single image size in bytes, image parts
+# kept in memory below the spool size, and decoded pixels per image
+UPLOAD_MAX_REQUEST_BYTES = int(os.getenv("KYC_UPLOAD_MAX_REQUEST_BYTES", str(256 * 1024 * 1024)))
+UPLOAD_MAX_IMAGE_BYTES = int(os.getenv("KYC_UPLOAD_MAX_IMAGE_BYTES", str(20 * 1024 * 1024)))
+UPLOAD_SPOOL_BYTES = int(os.getenv("KYC_UPLOAD_SPOOL_BYTES", str(2 * 1024 * 1024)))
+UPLOAD_MAX_PIXELS = int(os.getenv("KYC_UPLOAD_MAX_PIXELS", "50000000"))
+
+# Admission control: ceiling for the decoded pixels of in-flight
+# verifications, and how long a request waits for room before a 503
+ADMISSION_MEMORY_MB = int(os.getenv("KYC_ADMISSION_MEMORY_MB", "2048"))
+ADMISSION_TIMEOUT = float(os.getenv("KYC_ADMISSION_TIMEOUT", "30"))
+
+# Logging: level, output format (json or text), and the share of verbose
+# payloads (e.g. full pipeline results, redacted) logged at DEBUG level
+LOG_LEVEL = os.getenv("KYC_LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("KYC_LOG_FORMAT", "json").lower()
+LOG_PAYLOAD_SAMPLE = float(os.getenv("KYC_LOG_PAYLOAD_SAMPLE", "0.01"))
 
 # Output directory configuration
 OUTPUT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "output")
 
+# Job queue configuration (submit/poll API and api/job_worker.py)
+JOB_QUEUE_PATH = os.getenv("KYC_JOB_QUEUE_PATH", os.path.join(OUTPUT_DIR, "queue", "jobs.sqlite3"))
+JOB_LEASE_SECONDS = float(os.getenv("KYC_JOB_LEASE_SECONDS", "300"))
+JOB_MAX_ATTEMPTS = int(os.getenv("KYC_JOB_MAX_ATTEMPTS", "3"))
+JOB_POLL_INTERVAL = float(os.getenv("KYC_JOB_POLL_INTERVAL", "1"))
+JOB_RETENTION_SECONDS = float(os.getenv("KYC_JOB_RETENTION_SECONDS", "86400"))
+
+# Final decision configuration (mode: local, llm or compare). Ambiguous
+# cases of the local rules listed in KYC_DECISION_LLM_FALLBACK go to the model
+DECISION_MODE = os.getenv("KYC_DECISION_MODE", "local").lower()
+DECISION_LLM_FALLBACK = {
+    case.strip() for case in os.getenv("KYC_DECISION_LLM_FALLBACK", "").split(",") if case.strip()
+}
+DECISION_COMPARE_LOG = os.getenv("KYC_DECISION_COMPARE_LOG", os.path.join(OUTPUT_DIR, "decisions", "compare.jsonl"))
+
+# Local EXIF analysis: the metadata model call is only made below this confidence
+METADATA_LLM_CONFIDENCE = float(os.getenv("KYC_METADATA_LLM_CONFIDENCE", "0.6"))
+
+# Stage result cache configuration (backend: memory, sqlite or none)
+CACHE_BACKEND = os.getenv("KYC_CACHE_BACKEND", "memory").lower()
+CACHE_TTL = float(os.getenv("KYC_CACHE_TTL", "3600"))
+CACHE_MAX_ENTRIES = int(os.getenv("KYC_CACHE_MAX_ENTRIES", "1024"))
+CACHE_PATH = os.getenv("KYC_CACHE_PATH", os.path.join(OUTPUT_DIR, "cache", "stage_cache.sqlite3"))
+
+# Client-side Gemini quota: requests per minute shared by all processes
+# using the same limiter file (0 = no limit), calls allowed at once, and the
+# longest wait for a slot before the call is refused
+GEMINI_RPM = float(os.getenv("KYC_GEMINI_RPM", "0"))
+GEMINI_BURST = float(os.getenv("KYC_GEMINI_BURST", str(max(1.0, GEMINI_RPM / 12))))
+GEMINI_RATE_MAX_WAIT = float(os.getenv("KYC_GEMINI_RATE_MAX_WAIT", "10"))
+GEMINI_RATE_LIMIT_PATH = os.getenv("KYC_GEMINI_RATE_LIMIT_PATH", os.path.join(OUTPUT_DIR, "ratelimit", "gemini.sqlite3"))
+
+# Gemini circuit breaker: consecutive failed attempts that open it (0 = off)
+# and seconds before a trial call
+BREAKER_FAILURES = int(os.getenv("KYC_BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.getenv("KYC_BREAKER_RESET", "30"))
+
+# Rate limiter and circuit breaker, created on first use
+_rate_limiter: Optional[TokenBucket] = None
+_circuit_breaker: Optional[CircuitBreaker] = None
+_guard_lock = threading.Lock()
+
+# Record/replay of model calls (mode: off, record, replay or replay_or_record).
+# Replay latency: none, recorded (sleep as long as the live call took) or a
+# fixed number of seconds
+LLM_RECORD_MODE = os.getenv("KYC_LLM_RECORD_MODE", "off").lower()
+LLM_RECORDINGS_PATH = os.getenv("KYC_LLM_RECORDINGS_PATH", os.path.join(OUTPUT_DIR, "recordings", "llm_calls.sqlite3"))
+LLM_REPLAY_LATENCY = os.getenv("KYC_LLM_REPLAY_LATENCY", "none").lower()
+
+# Recording store, opened on first use
+_recording_store: Optional[RecordingStore] = None
+_recording_store_lock = threading.Lock()
+
+# Duplicate document index configuration. Candidates are documents whose
+# portrait hash is within KYC_DUPLICATE_MAX_DISTANCE bits (64-bit hashes);
+# the nearest KYC_DUPLICATE_MAX_CANDIDATES are compared feature by feature,
+# and matching features at or above the inlier counts mean the same document
+# (fail) or a possible one (review). Identities are stored as HMACs keyed
+# with KYC_DUPLICATE_SECRET, or with a key generated next to the index
+DUPLICATE_CHECK = os.getenv("KYC_DUPLICATE_CHECK", "true").lower() in ("1", "true", "yes")
+DUPLICATE_INDEX_PATH = os.getenv("KYC_DUPLICATE_INDEX_PATH", os.path.join(OUTPUT_DIR, "index", "document_hashes.sqlite3"))
+DUPLICATE_MAX_DISTANCE = int(os.getenv("KYC_DUPLICATE_MAX_DISTANCE", "10"))
+DUPLICATE_MAX_CANDIDATES = int(os.getenv("KYC_DUPLICATE_MAX_CANDIDATES", "20"))
+DUPLICATE_MATCH_INLIERS = int(os.getenv("KYC_DUPLICATE_MATCH_INLIERS", "60"))
+DUPLICATE_REVIEW_INLIERS = int(os.getenv("KYC_DUPLICATE_REVIEW_INLIERS", "30"))
+DUPLICATE_SECRET = os.getenv("KYC_DUPLICATE_SECRET", "")
+DUPLICATE_SECRET_PATH = os.getenv("KYC_DUPLICATE_SECRET_PATH", os.path.join(OUTPUT_DIR, "index", "identity.key"))
+
 def ensure_output_dir(subdir: Optional[str] = None) -> str:
     """
     Ensure the output directory exists and return the path.
@@ -190,9 +369,14 @@ Priority ranking for verification layers (highest to lowest):
 1. OCR Verification (Critical - if it fails, the verification should generally fail)
 2. ELA Check (Error Level Analysis) (Very High priority - strong evidence of tampering)
 3. Image Forensics Check (High priority - pixel-level evidence of manipulation)
-4. Metadata Verification (Medium priority - supplementary evidence)
+4. Duplicate Check (High priority - the same ID document reused for another account)
+5. Metadata Verification (Medium priority - supplementary evidence)
 
 ### RULES:
+0. **Card detection runs before every other check:**
+   - If Card status is "fail", no ID card was found in the image and the decision must be "flag for review", so the image can be checked or retaken; do not "deny" for this alone
+   - If Card status is "flag for review", no card outline was found and the other checks ran on the whole image; do not "accept" without review
+
 1. **OCR is the MOST CRITICAL check:**
    - If OCR status is "fail", the overall decision should almost always be "deny"
    - If name or DOB doesn't match, this is usually grounds for denial
@@ -205,7 +389,11 @@ Priority ranking for verification layers (highest to lowest):
    - Metadata issues alone should not result in denial unless extremely suspicious
    - Missing metadata fields are common and not necessarily suspicious
 
-4. **Your output must follow this exact JSON format:**
+4. **Duplicate check detects ID cards reused across accounts:**
+   - If Duplicate status is "fail", the same document was already registered for a different identity and the decision should be "deny"
+   - If Duplicate status is "flag for review", the document is already registered for another account (by the same holder), or a near-identical document exists for another account; do not "accept" without review
+
+5. **Your output must follow this exact JSON format:**
 
 {{
   "decision": "<accept/deny/flag for review>",
@@ -229,7 +417,8 @@ def parse_json(input_str: str) -> Optional[Dict[str, Any]]:
     end = input_str.rfind('}') + 1
     
     if start == -1 or end == 0:
-        print("No JSON content found in string")
+        logger.warning("No JSON content found in the model answer")
+        JSON_PARSE_FAILURES.labels(current_stage.get()).inc()
         return None
         
     json_content = input_str[start:end]
@@ -238,65 +427,590 @@ def parse_json(input_str: str) -> Optional[Dict[str, Any]]:
         parsed_json = json.loads(json_content)
         return parsed_json
     except json.JSONDecodeError as e:
-        print(f"Error parsing JSON: {e}")
+        logger.warning("Could not parse the JSON in the model answer", extra={"error": str(e)})
+        JSON_PARSE_FAILURES.labels(current_stage.get()).inc()
         return None
 
 
-def encode_image(img_path: str) -> Optional[str]:
-    """Encode an image file to a Base64 string.
+def prepare_model_image(img_path: ImageSource) -> Tuple[bytes, str]:
+    """Prepare the image bytes sent to the model.
+    
+    Uploads larger than MODEL_IMAGE_MAX_SIDE are downscaled (reusing the
+    reduced copy of the forensic stages when the sizes match) and re-encoded
+    as JPEG at MODEL_IMAGE_QUALITY. Smaller uploads are re-encoded only when
+    that makes them smaller, e.g. photos saved as PNG. Images that only exist
+    as pixels, like the normalized card crop, are always encoded as JPEG.
+    The result is kept on the LoadedImage, so retries, hedged requests and
+    other backends reuse it.
     
     Args:
-        img_path: Path to the image file
+        img_path: Path to the image file or a LoadedImage
+        
+    Returns:
+        Tuple of (encoded image bytes, MIME type)
+    """
+    image = load_image(img_path)
+    return image.derived("model_image", lambda: _encode_model_image(image))
+
+
+def _encode_model_image(image: LoadedImage) -> Tuple[bytes, str]:
+    if not image.has_encoded:
+        # Derived pixels (e.g. the normalized card): encode them directly
+        # instead of going through a lossless copy first
+        pixels = image.reduced_bgr(MODEL_IMAGE_MAX_SIDE) if MODEL_IMAGE_MAX_SIDE > 0 else image.bgr
+        ok, encoded = cv2.imencode(".jpg", pixels, [cv2.IMWRITE_JPEG_QUALITY, MODEL_IMAGE_QUALITY])
+        if ok:
+            return encoded.tobytes(), "image/jpeg"
+
+    raw, mime_type = image.raw, image.mime_type
+    if MODEL_IMAGE_MAX_SIDE <= 0:
+        return raw, mime_type
+
+    oversized = max(image.size) > MODEL_IMAGE_MAX_SIDE
+    if not oversized and mime_type == "image/jpeg":
+        return raw, mime_type
+
+    # Same decode policy as the forensic analysis image, so the copy is shared
+    pixels = image.reduced_bgr(MODEL_IMAGE_MAX_SIDE, draft=ANALYSIS_DETAIL_TILES <= 0)
+    if pixels is None:
+        # Not decodable here; let the model report on the original bytes
+        return raw, mime_type
+    ok, encoded = cv2.imencode(".jpg", pixels, [cv2.IMWRITE_JPEG_QUALITY, MODEL_IMAGE_QUALITY])
+    if not ok or (not oversized and encoded.nbytes >= len(raw)):
+        return raw, mime_type
+    return encoded.tobytes(), "image/jpeg"
+
+
+def encode_image(img_path: ImageSource) -> Optional[str]:
+    """Encode the model image (see prepare_model_image) to a Base64 string.
+    
+    Args:
+        img_path: Path to the image file or a LoadedImage
         
     Returns:
         Base64 encoded string or None if encoding failed
     """
     try:
-        with open(img_path, "rb") as file:
-            return base64.b64encode(file.read()).decode("utf-8")
-    except Exception as e:
-        print(f"Error encoding image: {e}")
+        return base64.b64encode(prepare_model_image(img_path)[0]).decode("utf-8")
+    except Exception:
+        logger.warning("Could not encode the image", exc_info=True)
         return None
 
 
-def api_call(endpoint: str, prompt_text: str, img_path: str = None, 
-             retries: int = 3, delay: int = 2) -> str:
+def get_http_session() -> requests.Session:
+    """Get the process-wide pooled HTTP session used for model API calls.
+    
+    The session keeps TCP/TLS connections to the API host alive across calls,
+    so each verification only pays the handshake once per pooled connection.
+    
+    Returns:
+        Shared requests.Session instance
+    """
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS,
+                                  pool_maxsize=HTTP_POOL_MAXSIZE,
+                                  max_retries=0)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _http_session = session
+        return _http_session
+
+
+def get_async_http_session() -> "aiohttp.ClientSession":
+    """Get the pooled aiohttp session for the running event loop.
+    
+    Must be called from a coroutine. Sessions are bound to their event loop,
+    so each loop gets its own connection pool.
+    
+    Returns:
+        Shared aiohttp.ClientSession for the current loop
+    """
+    if aiohttp is None:
+        raise RuntimeError("aiohttp is required for the asyncio verification path")
+
+    loop = asyncio.get_running_loop()
+    session = _async_sessions.get(loop)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(limit=HTTP_POOL_MAXSIZE, keepalive_timeout=60)
+        timeout = aiohttp.ClientTimeout(connect=HTTP_CONNECT_TIMEOUT, sock_read=HTTP_READ_TIMEOUT)
+        session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        _async_sessions[loop] = session
+    return session
+
+
+async def close_async_http_session() -> None:
+    """Close the aiohttp session of the running event loop, if any."""
+    session = _async_sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None and not session.closed:
+        await session.close()
+
+
+def retry_after_seconds(response: Any) -> Optional[float]:
+    """Read the Retry-After header of a response, if present.
+    
+    Args:
+        response: requests or aiohttp response, or None
+        
+    Returns:
+        Seconds to wait as requested by the server, or None if not specified
+    """
+    if response is None:
+        return None
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, delay: float, retry_after: Optional[float] = None) -> float:
+    """Compute the wait before the next retry attempt.
+    
+    Uses exponential backoff with full jitter, honouring a server provided
+    Retry-After value when it is longer.
+    
+    Args:
+        attempt: Zero-based index of the attempt that just failed
+        delay: Base delay in seconds
+        retry_after: Optional Retry-After value in seconds
+        
+    Returns:
+        Delay in seconds, capped at HTTP_BACKOFF_MAX
+    """
+    wait = random.uniform(0, min(HTTP_BACKOFF_MAX, delay * (2 ** attempt)))
+    if retry_after is not None:
+        wait = max(wait, retry_after)
+    return min(wait, HTTP_BACKOFF_MAX)
+
+
+def build_payload(prompt_text: str, img_path: Optional[ImageSource] = None) -> bytes:
+    """Build the serialized generateContent request body.
+    
+    The Base64 image is spliced into the JSON as bytes, so the largest part
+    of the body is never decoded to a str, escaped or copied by json.dumps.
+    
+    Args:
+        prompt_text: Text prompt to send
+        img_path: Optional path to image file or LoadedImage
+        
+    Returns:
+        UTF-8 encoded JSON request body
+    """
+    parts = [json.dumps({"text": prompt_text}).encode("utf-8")]
+
+    if img_path:
+        try:
+            data, mime_type = prepare_model_image(img_path)
+            parts.append(b'{"inline_data":{"mime_type":"' + mime_type.encode("ascii")
+                         + b'","data":"' + base64.b64encode(data) + b'"}}')
+        except Exception:
+            logger.warning("Could not encode the image", exc_info=True)
+
+    return b'{"contents":[{"parts":[' + b",".join(parts) + b"]}]}"
+
+
+def extract_response_text(data: Dict[str, Any]) -> str:
+    """Extract the generated text from a generateContent response.
+    
+    Args:
+        data: Decoded JSON response body
+        
+    Returns:
+        Generated text or a placeholder if the response has none
+    """
+    return data.get("candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get(
+        "text", "No response received.")
+
+
+def get_rate_limiter() -> Optional[TokenBucket]:
+    """Get the Gemini rate limiter shared with the other processes.
+    
+    Returns:
+        TokenBucket at GEMINI_RATE_LIMIT_PATH, or None when GEMINI_RPM is 0
+    """
+    global _rate_limiter
+    if GEMINI_RPM <= 0:
+        return None
+    with _guard_lock:
+        if _rate_limiter is None:
+            _rate_limiter = TokenBucket(GEMINI_RATE_LIMIT_PATH, GEMINI_RPM / 60, GEMINI_BURST)
+        return _rate_limiter
+
+
+def get_circuit_breaker() -> Optional[CircuitBreaker]:
+    """Get the Gemini circuit breaker of this process.
+    
+    Returns:
+        CircuitBreaker, or None when BREAKER_FAILURES is 0
+    """
+    global _circuit_breaker
+    if BREAKER_FAILURES <= 0:
+        return None
+    with _guard_lock:
+        if _circuit_breaker is None:
+            _circuit_breaker = CircuitBreaker(BREAKER_FAILURES, BREAKER_RESET,
+                                              on_change=_circuit_state_changed)
+        return _circuit_breaker
+
+
+def _circuit_state_changed(state: str) -> None:
+    GEMINI_CIRCUIT_OPEN.set(1 if state == CircuitBreaker.OPEN else 0)
+
+
+def admit_attempt(call: GeminiCall) -> Optional[float]:
+    """Clear a Gemini attempt with the circuit breaker and the rate limiter.
+    
+    Blocks on the shared rate limiter's SQLite file; asyncio code uses
+    admit_attempt_async().
+    
+    Args:
+        call: Metrics of the call, given the reason when the attempt is refused
+        
+    Returns:
+        Seconds to wait for the rate limiter before sending, or None if the
+        attempt must not be made (breaker open, or no slot within
+        GEMINI_RATE_MAX_WAIT)
+    """
+    breaker = get_circuit_breaker()
+    if breaker is not None and not breaker.allow():
+        call.error("circuit_open")
+        return None
+    limiter = get_rate_limiter()
+    if limiter is None:
+        return 0.0
+    wait = limiter.reserve(GEMINI_RATE_MAX_WAIT)
+    if wait is None:
+        if breaker is not None:
+            breaker.release()
+        call.error("rate_limited")
+        return None
+    GEMINI_RATE_LIMIT_WAIT.observe(wait)
+    return wait
+
+
+async def admit_attempt_async(call: GeminiCall) -> Optional[float]:
+    """Asyncio counterpart of admit_attempt().
+    
+    The rate limiter reserves its slot in a SQLite transaction that may wait
+    for other processes, so with a limiter the admission runs in an executor
+    thread. If the caller is cancelled meanwhile, an admitted attempt is
+    handed back to the circuit breaker.
+    
+    Args:
+        call: Metrics of the call, given the reason when the attempt is refused
+        
+    Returns:
+        Seconds to wait before sending, or None if the attempt must not be made
+    """
+    if get_rate_limiter() is None:
+        return admit_attempt(call)
+    context = contextvars.copy_context()
+    admission = asyncio.get_running_loop().run_in_executor(None, context.run, admit_attempt, call)
+    try:
+        return await asyncio.shield(admission)
+    except asyncio.CancelledError:
+        def abandon(done: "asyncio.Future") -> None:
+            if not done.cancelled() and done.exception() is None and done.result() is not None:
+                attempt_finished(None)
+
+        admission.add_done_callback(abandon)
+        raise
+
+
+def attempt_finished(healthy: Optional[bool]) -> None:
+    """Report the outcome of an admitted Gemini attempt to the circuit breaker.
+    
+    Args:
+        healthy: True if Gemini answered (even with a client error), False
+            for 429, 5xx, timeouts and connection errors, None if the attempt
+            was abandoned (e.g. cancelled)
+    """
+    breaker = get_circuit_breaker()
+    if breaker is None:
+        return
+    if healthy is None:
+        breaker.release()
+    elif healthy:
+        breaker.success()
+    else:
+        breaker.failure()
+
+
+def circuit_open() -> bool:
+    """Check whether the Gemini circuit breaker is open, so retrying is pointless."""
+    breaker = get_circuit_breaker()
+    return breaker is not None and breaker.state == CircuitBreaker.OPEN
+
+
+def get_recording_store() -> RecordingStore:
+    """Get the process-wide store of recorded model calls.
+    
+    Returns:
+        Shared RecordingStore at LLM_RECORDINGS_PATH
+    """
+    global _recording_store
+    with _recording_store_lock:
+        if _recording_store is None:
+            _recording_store = RecordingStore(LLM_RECORDINGS_PATH)
+        return _recording_store
+
+
+def _replay_delay(recorded_latency: float) -> float:
+    if LLM_REPLAY_LATENCY == "none":
+        return 0.0
+    if LLM_REPLAY_LATENCY == "recorded":
+        return recorded_latency
+    return float(LLM_REPLAY_LATENCY)
+
+
+def replay_lookup(endpoint: str, payload: bytes) -> Tuple[Optional[str], Optional[str], float]:
+    """Look up a model call in the recording store, according to LLM_RECORD_MODE.
+    
+    Args:
+        endpoint: API endpoint URL
+        payload: Request body from build_payload()
+        
+    Returns:
+        Tuple of (recording key or None when recording is off, answer to
+        return instead of calling the model or None, seconds to wait first).
+        A call missing from the store in replay mode is answered with
+        failure_response(), so replays never reach the network
+    """
+    if LLM_RECORD_MODE not in ("record", "replay", "replay_or_record"):
+        return None, None, 0.0
+    key = recording_key(endpoint, payload)
+    if LLM_RECORD_MODE == "record":
+        return key, None, 0.0
+
+    recorded = get_recording_store().get(key)
+    if recorded is None:
+        LLM_REPLAYS.labels(current_stage.get(), "miss").inc()
+        if LLM_RECORD_MODE == "replay":
+            logger.warning("No recording of the model call", extra={"recording_key": key})
+            return key, failure_response(endpoint), 0.0
+        return key, None, 0.0
+    LLM_REPLAYS.labels(current_stage.get(), "hit").inc()
+    answer, latency = recorded
+    return key, answer, _replay_delay(latency)
+
+
+def record_answer(key: Optional[str], answer: str, started: float) -> str:
+    """Store a live model answer when recording is on.
+    
+    Args:
+        key: Recording key from replay_lookup(), None when recording is off
+        answer: Model answer text
+        started: time.perf_counter() at the start of the call
+        
+    Returns:
+        The answer, unchanged
+    """
+    if key is not None:
+        try:
+            get_recording_store().put(key, answer, time.perf_counter() - started)
+        except Exception:
+            logger.warning("Could not record the model call", exc_info=True)
+    return answer
+
+
+def failure_response(endpoint: str) -> str:
+    """Build the JSON error returned when an API call gives up.
+    
+    Args:
+        endpoint: API endpoint URL
+        
+    Returns:
+        JSON string with fail status and message
+    """
+    return json.dumps({
+        "status": "fail",
+        "message": f"{API_FAILURE_MESSAGE}, Endpoint {endpoint}",
+    })
+
+
+def is_api_failure(result: Optional[Dict[str, Any]]) -> bool:
+    """Check whether a parsed result is the error produced by failure_response.
+    
+    Args:
+        result: Parsed API result
+        
+    Returns:
+        True if the result reports a failed API call rather than a model answer
+    """
+    return bool(result) and str(result.get("message", "")).startswith(API_FAILURE_MESSAGE)
+
+
+def api_call(endpoint: str, prompt_text: str, img_path: Optional[ImageSource] = None,
+             retries: int = 3, delay: float = HTTP_BACKOFF_BASE) -> str:
     """Handle API calls with retry logic for both text-only and text-with-image requests.
     
+    Requests go through the pooled session from get_http_session() with
+    connect/read timeouts. Only connection errors, timeouts and retryable
+    status codes (429, 5xx) are retried, with exponential backoff and jitter.
+    Each attempt first passes the circuit breaker and the shared rate limiter
+    (see admit_attempt()); the call fails at once when either refuses it.
+    With KYC_LLM_RECORD_MODE set, answers are recorded or replayed, see
+    replay_lookup().
+    
     Args:
         endpoint: API endpoint URL
         prompt_text: Text prompt to send
-        img_path: Optional path to image file
+        img_path: Optional path to image file or LoadedImage
         retries: Number of retry attempts
-        delay: Delay between retries in seconds
+        delay: Base backoff delay between retries in seconds
         
     Returns:
         API response text or error message
     """
-    payload = {"contents": [{"parts": [{"text": prompt_text}]}]}
+    payload = build_payload(prompt_text, img_path)
+    recording, replayed, wait = replay_lookup(endpoint, payload)
+    if replayed is not None:
+        if wait:
+            time.sleep(wait)
+        return replayed
 
+    headers = {"Content-Type": "application/json"}
+    session = get_http_session()
+    started = time.perf_counter()
+
+    with gemini_call() as call:
+        for attempt in range(retries):
+            wait = admit_attempt(call)
+            if wait is None:
+                break
+            response = None
+            healthy = None
+            try:
+                if wait:
+                    time.sleep(wait)
+                response = session.post(endpoint, data=payload, headers=headers,
+                                        timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+                if response.status_code in RETRYABLE_STATUS_CODES:
+                    raise requests.HTTPError(f"{response.status_code} retryable error", response=response)
+                healthy = True
+                response.raise_for_status()
+                return record_answer(recording, extract_response_text(response.json()), started)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                healthy = False
+                logger.warning("Gemini attempt failed", extra={"attempt": attempt + 1, "error": str(e)})
+                call.error("timeout" if isinstance(e, requests.Timeout) else "connection")
+            except requests.HTTPError as e:
+                healthy = response is not None and response.status_code not in RETRYABLE_STATUS_CODES
+                logger.warning("Gemini attempt failed", extra={"attempt": attempt + 1, "error": str(e)})
+                call.error(f"http_{response.status_code}" if response is not None else "http")
+                if response is None or response.status_code not in RETRYABLE_STATUS_CODES:
+                    break
+            except Exception as e:
+                # Malformed responses will not get better by asking again
+                logger.warning("Gemini attempt failed", extra={"attempt": attempt + 1, "error": str(e)})
+                call.error("malformed_response")
+                break
+            finally:
+                attempt_finished(healthy)
+
+            if attempt < retries - 1 and not circuit_open():
+                call.retry()
+                time.sleep(backoff_delay(attempt, delay, retry_after_seconds(response)))
+
+        call.fail()
+        return failure_response(endpoint)
+
+
+async def run_blocking(func: Callable[..., Any], *args: Any) -> Any:
+    """Run a blocking function in the default executor, in the caller's context (request id, stage).
+    
+    Args:
+        func: Function to run
+        *args: Its arguments
+        
+    Returns:
+        The function's return value
+    """
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(None, context.run, func, *args)
+
+
+async def async_api_call(endpoint: str, prompt_text: str, img_path: Optional[ImageSource] = None,
+                         retries: int = 3, delay: float = HTTP_BACKOFF_BASE) -> str:
+    """Asyncio counterpart of api_call with the same retry policy, recording and return value.
+    
+    The request body, with its resized and re-encoded image, is built in an
+    executor thread so the event loop keeps serving other requests.
+    
+    Args:
+        endpoint: API endpoint URL
+        prompt_text: Text prompt to send
+        img_path: Optional path to image file or LoadedImage
+        retries: Number of retry attempts
+        delay: Base backoff delay between retries in seconds
+        
+    Returns:
+        API response text or error message
+    """
     if img_path:
-        image_data = encode_image(img_path)
-        if image_data:
-            payload["contents"][0]["parts"].append({
-                "inline_data": {"mime_type": "image/jpeg", "data": image_data}
-            })
+        payload = await run_blocking(build_payload, prompt_text, img_path)
+    else:
+        payload = build_payload(prompt_text)
+    recording, replayed, wait = replay_lookup(endpoint, payload)
+    if replayed is not None:
+        if wait:
+            await asyncio.sleep(wait)
+        return replayed
 
     headers = {"Content-Type": "application/json"}
-
-    for attempt in range(retries):
-        try:
-            response = requests.post(endpoint, json=payload, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-            return data.get("candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get(
-                "text", "No response received.")
-        except Exception as e:
-            print(f"\tAttempt {attempt + 1} failed: {str(e)}")
-            if attempt < retries - 1:
-                time.sleep(delay)
-            else:
-                return json.dumps({
-                    "status": "fail",
-                    "message": f"API call failed after multiple attempts, Endpoint {endpoint}",
-                })
+    session = get_async_http_session()
+    started = time.perf_counter()
+
+    with gemini_call() as call:
+        for attempt in range(retries):
+            wait = await admit_attempt_async(call)
+            if wait is None:
+                break
+            retry_after = None
+            healthy = None
+            try:
+                if wait:
+                    await asyncio.sleep(wait)
+                async with session.post(endpoint, data=payload, headers=headers) as response:
+                    healthy = response.status not in RETRYABLE_STATUS_CODES
+                    if response.status in RETRYABLE_STATUS_CODES:
+                        retry_after = retry_after_seconds(response)
+                        logger.warning("Gemini attempt failed", extra={"attempt": attempt + 1,
+                                                                      "status": response.status})
+                        call.error(f"http_{response.status}")
+                    elif response.status >= 400:
+                        logger.warning("Gemini attempt failed", extra={"attempt": attempt + 1,
+                                                                      "status": response.status})
+                        call.error(f"http_{response.status}")
+                        break
+                    else:
+                        answer = extract_response_text(await response.json(content_type=None))
+                        return record_answer(recording, answer, started)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                healthy = False
+                logger.warning("Gemini attempt failed", extra={"attempt": attempt + 1, "error": str(e)})
+                call.error("timeout" if isinstance(e, asyncio.TimeoutError) else "connection")
+            except Exception as e:
+                # Malformed responses will not get better by asking again
+                logger.warning("Gemini attempt failed", extra={"attempt": attempt + 1, "error": str(e)})
+                call.error("malformed_response")
+                break
+            finally:
+                attempt_finished(healthy)
+
+            if attempt < retries - 1 and not circuit_open():
+                call.retry()
+                await asyncio.sleep(backoff_delay(attempt, delay, retry_after))
+
+        call.fail()
+        return failure_response(endpoint)
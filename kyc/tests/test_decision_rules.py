@@ -0,0 +1,81 @@
+"""Priority order of the local decision rules."""
+import pytest
+
+from kyc_engine.decision_rules import ACCEPT, DENY, REVIEW, evaluate_rules
+
+
+def result(**statuses):
+    """Pipeline result with every check passing, except the given statuses."""
+    stages = {"OCR": "success", "Metadata": "success", "ELA": "success",
+              "Forensics": "success", "Duplicate": "success"}
+    stages.update(statuses)
+    return {stage: ({"status": status} if status != "error" else {"error": "boom"})
+            for stage, status in stages.items() if status is not None}
+
+
+def test_all_checks_pass_accepts():
+    decision, case = evaluate_rules(result())
+    assert decision["decision"] == ACCEPT
+    assert case is None
+
+
+def test_missing_card_is_reviewed_before_anything_else():
+    pipeline = {"Card": {"status": "fail", "message": "No card outline"}}
+    decision, case = evaluate_rules(pipeline)
+    assert decision["decision"] == REVIEW
+    assert "No ID card" in decision["reason"]
+    assert case is None
+
+
+def test_upload_analyzed_without_a_card_is_reviewed():
+    decision, case = evaluate_rules(result(Card="flag for review"))
+    assert decision["decision"] == REVIEW
+    assert "Card" in decision["reason"]
+    assert case is None
+
+    # A mismatch found on the full image still denies
+    decision, _ = evaluate_rules(result(Card="flag for review", OCR="fail"))
+    assert decision["decision"] == DENY
+
+
+def test_ocr_fail_outranks_tampering_and_duplicate():
+    decision, _ = evaluate_rules(result(OCR="fail", ELA="fail", Forensics="fail", Duplicate="fail"))
+    assert decision["decision"] == DENY
+    assert decision["reason"].startswith("OCR verification failed")
+
+
+def test_double_tamper_fail_outranks_duplicate():
+    decision, _ = evaluate_rules(result(ELA="fail", Forensics="fail", Duplicate="fail"))
+    assert decision["decision"] == DENY
+    assert "tampered" in decision["reason"]
+
+
+def test_duplicate_fail_denies_even_without_ocr():
+    decision, case = evaluate_rules(result(OCR="error", Duplicate="fail"))
+    assert decision["decision"] == DENY
+    assert "already used" in decision["reason"]
+    assert case is None
+
+
+@pytest.mark.parametrize("statuses, expected_case", [
+    ({"OCR": "error", "ELA": "fail"}, "ocr_unavailable"),
+    ({"ELA": "fail", "Duplicate": "flag for review"}, "single_tamper_fail"),
+    ({"Forensics": "error", "OCR": "flag for review"}, "tamper_unavailable"),
+    ({"OCR": "flag for review"}, "ocr_flagged"),
+    ({"OCR": "flag for review", "Duplicate": "flag for review"}, None),
+])
+def test_review_cases_in_priority_order(statuses, expected_case):
+    decision, case = evaluate_rules(result(**statuses))
+    assert decision["decision"] == REVIEW
+    assert case == expected_case
+
+
+def test_metadata_fail_alone_is_not_decisive():
+    decision, case = evaluate_rules(result(Metadata="fail"))
+    assert decision["decision"] == ACCEPT
+    assert case == "metadata_fail"
+
+
+def test_missing_duplicate_stage_does_not_count_against_the_id():
+    decision, _ = evaluate_rules(result(Duplicate=None))
+    assert decision["decision"] == ACCEPT
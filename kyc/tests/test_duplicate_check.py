@@ -0,0 +1,172 @@
+"""Duplicate index lookups and the feature verification of candidates."""
+import sqlite3
+
+import cv2
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import make_card
+from kyc_engine import duplicate_check as dc
+from kyc_engine.decision_making import _register_document
+from kyc_engine.image_input import LoadedImage
+from kyc_engine.shared import DUPLICATE_MAX_DISTANCE, DUPLICATE_REVIEW_INLIERS
+
+ACCEPTED = {"decision": "accept"}
+DENIED = {"decision": "deny"}
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    """Empty index and a fixed identity key for each test."""
+    index = dc.PerceptualHashIndex(str(tmp_path / "documents.sqlite3"))
+    monkeypatch.setattr(dc, "_index", index)
+    monkeypatch.setattr(dc, "_identity_key", b"test-key")
+    monkeypatch.setattr(dc, "_pending", type(dc._pending)())
+    return index
+
+
+def card(seed, width=1280):
+    return cv2.imdecode(np.frombuffer(make_card(width, "clean", seed), np.uint8), cv2.IMREAD_COLOR)
+
+
+def upload(bgr):
+    return LoadedImage.from_bytes(cv2.imencode(".jpg", bgr, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes(),
+                                  "card.jpg")
+
+
+def recapture(bgr, seed=0):
+    """Photograph the card again: slight perspective, other exposure, noise, smaller JPEG."""
+    rng = np.random.default_rng(seed)
+    h, w = bgr.shape[:2]
+    corners = np.float32([[0, 0], [w - 1, 0], [w - 1, h - 1], [0, h - 1]])
+    moved = (corners + rng.uniform(-0.01, 0.01, corners.shape) * [w, h]).astype(np.float32)
+    photo = cv2.warpPerspective(bgr, cv2.getPerspectiveTransform(corners, moved), (w, h),
+                                borderMode=cv2.BORDER_REPLICATE).astype(np.float32)
+    photo = photo * 1.1 - 10 + rng.normal(0, 4, photo.shape)
+    photo = cv2.resize(np.clip(photo, 0, 255).astype(np.uint8), (int(w * 0.8), int(h * 0.8)))
+    return photo
+
+
+def submit(form_data, bgr, decision=ACCEPTED):
+    result = dc.duplicate_check(form_data, upload(bgr))
+    outcome = dc.register_if_accepted({"Duplicate": result}, decision)
+    return result, outcome is not None and outcome["registered"]
+
+
+def test_search_finds_hashes_within_the_distance(index):
+    value = 0x0123456789ABCDEF
+    near = value ^ 0b1011                            # 3 bits apart
+    spread = value ^ (1 | 1 << 17 | 1 << 34 | 1 << 51 | 1 << 60)   # 5 bits, one per chunk and more
+    far = value ^ ((1 << DUPLICATE_MAX_DISTANCE + 1) - 1)
+    for other, identity in ((near, "a"), (spread, "b"), (far, "c")):
+        assert index.add(other, identity, None)
+
+    matches = index.search(value)
+    assert [match["identity"] for match in matches] == ["a", "b"]
+    assert [match["distance"] for match in matches] == [3, 5]
+
+
+def test_add_skips_the_same_document_for_the_same_identity_and_account(index):
+    assert index.add(42, "a", None)
+    assert not index.add(42, "a", None)
+    assert index.add(42, "b", None)
+    assert index.add(42, "a", None, "account-1")
+    assert not index.add(42, "a", None, "account-1")
+
+
+def test_index_without_accounts_is_migrated(tmp_path):
+    path = str(tmp_path / "documents.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE registered_documents (id INTEGER PRIMARY KEY, hash INTEGER NOT NULL,"
+        " c0 INTEGER NOT NULL, c1 INTEGER NOT NULL, c2 INTEGER NOT NULL, c3 INTEGER NOT NULL,"
+        " identity TEXT NOT NULL, features BLOB, created_at REAL NOT NULL)"
+    )
+    conn.execute("INSERT INTO registered_documents VALUES (1, 42, 42, 0, 0, 0, 'a', NULL, 0)")
+    conn.commit()
+    conn.close()
+
+    index = dc.PerceptualHashIndex(path)
+    assert [match["account"] for match in index.search(42)] == [None]
+
+
+def test_other_holder_of_the_same_card_type_is_not_a_duplicate(index):
+    # Synthetic cards share the template and the drawn portrait, so their
+    # portrait hashes are close: a false match the features must rule out
+    submit({"id_number": "A-1"}, card(seed=1))
+    result, _ = submit({"id_number": "B-2"}, card(seed=2))
+
+    assert result["status"] == "success"
+    assert result["matches"], "expected a close portrait hash as candidate"
+    assert result["matches"][0]["distance"] <= DUPLICATE_MAX_DISTANCE
+    assert result["matches"][0]["matching_features"] < DUPLICATE_REVIEW_INLIERS
+
+
+def test_same_card_for_another_identity_fails(index):
+    original = card(seed=1)
+    submit({"id_number": "A-1"}, original)
+    result = dc.duplicate_check({"id_number": "B-2"}, upload(recapture(original)))
+
+    assert result["status"] == "fail"
+    assert result["matches"][0]["matching_features"] >= DUPLICATE_REVIEW_INLIERS
+
+
+def test_same_card_for_the_same_account_passes(index):
+    original = card(seed=1)
+    submit({"id_number": "A-1", "account_id": "voter-1"}, original)
+    result, _ = submit({"id_number": " a-1 ", "account_id": "voter-1"}, recapture(original))
+    assert result["status"] == "success"
+
+
+def test_same_card_and_identity_for_another_account_is_flagged(index):
+    original = card(seed=1)
+    submit({"id_number": "A-1", "account_id": "voter-1"}, original)
+    result = dc.duplicate_check({"id_number": "A-1", "account_id": "voter-2"}, upload(recapture(original)))
+
+    assert result["status"] == "flag for review"
+    assert result["matches"][0]["same_identity"]
+
+
+def test_same_card_and_identity_without_account_is_flagged(index):
+    original = card(seed=1)
+    submit({"id_number": "A-1"}, original)
+    result = dc.duplicate_check({"id_number": "A-1"}, upload(recapture(original)))
+    assert result["status"] == "flag for review"
+
+
+def test_only_accepted_documents_are_registered(index):
+    original = card(seed=1)
+    _, registered = submit({"id_number": "A-1"}, original, DENIED)
+    assert not registered
+
+    # The denied submission left nothing to match against
+    result, registered = submit({"id_number": "B-2"}, recapture(original))
+    assert result["status"] == "success"
+    assert result["matches"] == []
+    assert registered
+
+
+def test_concurrent_submissions_of_the_same_card_register_once(index):
+    # Both are checked before either is accepted, so both pass the stage
+    original = card(seed=1)
+    first = {"Duplicate": dc.duplicate_check({"id_number": "A-1"}, upload(original))}
+    second = {"Duplicate": dc.duplicate_check({"id_number": "B-2"}, upload(recapture(original)))}
+    assert first["Duplicate"]["status"] == second["Duplicate"]["status"] == "success"
+
+    assert dc.register_if_accepted(first, ACCEPTED)["registered"]
+    outcome = dc.register_if_accepted(second, ACCEPTED)
+    assert outcome["status"] == "fail"
+    assert not outcome["registered"]
+    assert len(index.search(dc.perceptual_hash(upload(original)))) == 1
+
+
+def test_accept_is_overturned_when_the_card_was_registered_meanwhile(index):
+    original = card(seed=1)
+    first = {"Duplicate": dc.duplicate_check({"id_number": "A-1", "account_id": "voter-1"}, upload(original))}
+    second = {"Duplicate": dc.duplicate_check({"id_number": "A-1", "account_id": "voter-2"},
+                                              upload(recapture(original)))}
+
+    assert _register_document(first, ACCEPTED) is None
+    override = _register_document(second, ACCEPTED)
+    assert override["decision"] == "flag for review"
+    assert second["Duplicate"]["status"] == "flag for review"
@@ -0,0 +1,124 @@
+"""Claiming, leases and retries of the SQLite job queue."""
+import time
+
+import pytest
+
+from kyc_engine.job_queue import DONE, FAILED, QUEUED, RUNNING, JobQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / "jobs.sqlite3"), lease_seconds=0.2, max_attempts=2)
+
+
+def test_claim_takes_the_oldest_job_once(queue):
+    first = queue.enqueue({"full_name": "A"}, b"one", "a.jpg")
+    second = queue.enqueue({"full_name": "B"}, b"two", "b.jpg")
+
+    job = queue.claim()
+    assert job["id"] == first
+    assert job["form_data"] == {"full_name": "A"}
+    assert job["image"] == b"one"
+    assert job["attempts"] == 1
+    assert queue.get(first)["status"] == RUNNING
+
+    assert queue.claim()["id"] == second
+    assert queue.claim() is None
+
+
+def test_complete_stores_the_result(queue):
+    job_id = queue.enqueue({}, b"img", "a.jpg")
+    job = queue.claim()
+    assert queue.complete(job_id, job["attempts"], {"decision": "accept"})
+    job = queue.get(job_id)
+    assert job["status"] == DONE
+    assert job["result"] == {"decision": "accept"}
+
+
+def test_expired_lease_is_claimed_again(queue):
+    job_id = queue.enqueue({}, b"img", "a.jpg")
+    assert queue.claim()["id"] == job_id
+    # The lease is still held
+    assert queue.claim() is None
+
+    time.sleep(0.3)
+    job = queue.claim()
+    assert job["id"] == job_id
+    assert job["attempts"] == 2
+    assert job["image"] == b"img"
+
+
+def test_lease_expiring_after_the_last_attempt_fails_the_job(queue):
+    job_id = queue.enqueue({}, b"img", "a.jpg")
+    queue.claim()
+    time.sleep(0.3)
+    queue.claim()
+    time.sleep(0.3)
+
+    assert queue.claim() is None
+    job = queue.get(job_id)
+    assert job["status"] == FAILED
+    assert "lease expired" in job["error"]
+
+
+def test_fail_requeues_until_attempts_are_used_up(queue):
+    job_id = queue.enqueue({}, b"img", "a.jpg")
+    job = queue.claim()
+    assert queue.fail(job_id, job["attempts"], "Gemini unavailable")
+    assert queue.get(job_id)["status"] == QUEUED
+
+    job = queue.claim()
+    assert job["id"] == job_id
+    assert job["image"] == b"img"
+    assert queue.fail(job_id, job["attempts"], "Gemini unavailable")
+
+    job = queue.get(job_id)
+    assert job["status"] == FAILED
+    assert job["error"] == "Gemini unavailable"
+    assert queue.claim() is None
+
+
+def test_permanent_failure_is_not_retried(queue):
+    job_id = queue.enqueue({}, b"img", "a.jpg")
+    job = queue.claim()
+    assert queue.fail(job_id, job["attempts"], "Image too large", retry=False)
+    assert queue.get(job_id)["status"] == FAILED
+    assert queue.claim() is None
+
+
+def test_released_job_keeps_its_attempts(queue):
+    job_id = queue.enqueue({}, b"img", "a.jpg")
+    job = queue.claim()
+    assert queue.release(job_id, job["attempts"], "Server is busy")
+    assert queue.get(job_id)["status"] == QUEUED
+    assert queue.claim()["attempts"] == 1
+
+
+def test_renewed_lease_is_not_claimed_again(queue):
+    job_id = queue.enqueue({}, b"img", "a.jpg")
+    job = queue.claim()
+    for _ in range(3):
+        time.sleep(0.1)
+        assert queue.renew(job_id, job["attempts"])
+    assert queue.claim() is None
+
+
+def test_stale_worker_cannot_touch_a_reclaimed_job(queue):
+    job_id = queue.enqueue({}, b"img", "a.jpg")
+    stale = queue.claim()
+    time.sleep(0.3)
+    current = queue.claim()
+    assert current["attempts"] == stale["attempts"] + 1
+
+    assert not queue.renew(job_id, stale["attempts"])
+    assert not queue.fail(job_id, stale["attempts"], "late failure")
+    assert not queue.complete(job_id, stale["attempts"], {"decision": "deny"})
+    assert queue.get(job_id)["status"] == RUNNING
+
+    assert queue.complete(job_id, current["attempts"], {"decision": "accept"})
+    # A late failure after completion leaves the result alone
+    assert not queue.fail(job_id, stale["attempts"], "late failure")
+    job = queue.get(job_id)
+    assert job["status"] == DONE
+    assert job["result"] == {"decision": "accept"}
+    assert queue.claim() is None
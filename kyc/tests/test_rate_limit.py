@@ -0,0 +1,168 @@
+"""Token bucket reservations, circuit breaker states and Gemini admission."""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from kyc_engine import shared
+from kyc_engine.metrics import GeminiCall
+from kyc_engine.rate_limit import CircuitBreaker, TokenBucket
+
+
+@pytest.fixture
+def bucket_path(tmp_path):
+    return str(tmp_path / "buckets.sqlite3")
+
+
+def test_reserve_serves_the_burst_then_spaces_calls(bucket_path):
+    bucket = TokenBucket(bucket_path, rate=10.0, burst=2)
+    assert bucket.reserve(max_wait=0) == 0.0
+    assert bucket.reserve(max_wait=0) == 0.0
+    # Third and fourth calls get the next tokens, 0.1 s apart
+    assert bucket.reserve(max_wait=1.0) == pytest.approx(0.1, abs=0.02)
+    assert bucket.reserve(max_wait=1.0) == pytest.approx(0.2, abs=0.02)
+
+
+def test_refused_reservation_takes_no_token(bucket_path):
+    bucket = TokenBucket(bucket_path, rate=10.0, burst=1)
+    assert bucket.reserve(max_wait=0) == 0.0
+    assert bucket.reserve(max_wait=0.05) is None
+    assert bucket.reserve(max_wait=0.05) is None
+    # Nothing was reserved by the refusals, so the next token is still 0.1 s away
+    assert bucket.reserve(max_wait=1.0) == pytest.approx(0.1, abs=0.02)
+
+
+def test_buckets_on_the_same_file_share_tokens(bucket_path):
+    first = TokenBucket(bucket_path, rate=1.0, burst=1)
+    second = TokenBucket(bucket_path, rate=1.0, burst=1)
+    assert first.reserve(max_wait=0) == 0.0
+    assert second.reserve(max_wait=0) is None
+    assert TokenBucket(bucket_path, rate=1.0, burst=1, name="other").reserve(max_wait=0) == 0.0
+
+
+@pytest.fixture
+def breaker():
+    changes = []
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.1, on_change=changes.append)
+    breaker.changes = changes
+    return breaker
+
+
+def open_breaker(breaker):
+    for _ in range(breaker.failure_threshold):
+        assert breaker.allow()
+        breaker.failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_breaker_opens_after_consecutive_failures(breaker):
+    breaker.allow()
+    breaker.failure()
+    breaker.allow()
+    breaker.success()
+    breaker.allow()
+    breaker.failure()
+    # A success in between resets the count
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.allow()
+    breaker.failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+
+def test_half_open_lets_one_trial_through(breaker):
+    open_breaker(breaker)
+    time.sleep(0.15)
+
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Only one trial at a time
+    assert not breaker.allow()
+
+    breaker.success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow() and breaker.allow()
+    assert breaker.changes == [CircuitBreaker.OPEN, CircuitBreaker.HALF_OPEN, CircuitBreaker.CLOSED]
+
+
+def test_failed_trial_opens_again(breaker):
+    open_breaker(breaker)
+    time.sleep(0.15)
+    assert breaker.allow()
+    breaker.failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    assert breaker.changes == [CircuitBreaker.OPEN, CircuitBreaker.HALF_OPEN, CircuitBreaker.OPEN]
+
+
+def test_released_trial_lets_the_next_one_through(breaker):
+    open_breaker(breaker)
+    time.sleep(0.15)
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+
+
+@pytest.fixture
+def guards(bucket_path, monkeypatch):
+    """Gemini rate limiter and circuit breaker of the tests, with one token."""
+    limiter = TokenBucket(bucket_path, rate=0.01, burst=1)
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    monkeypatch.setattr(shared, "GEMINI_RPM", 1)
+    monkeypatch.setattr(shared, "BREAKER_FAILURES", 1)
+    monkeypatch.setattr(shared, "_rate_limiter", limiter)
+    monkeypatch.setattr(shared, "_circuit_breaker", breaker)
+    return limiter, breaker
+
+
+def test_async_admission_reserves_off_the_event_loop(guards, monkeypatch):
+    limiter, _ = guards
+    threads = []
+    reserve = limiter.reserve
+
+    def spy(max_wait):
+        threads.append(threading.current_thread())
+        return reserve(max_wait)
+
+    monkeypatch.setattr(limiter, "reserve", spy)
+
+    async def admit():
+        return await shared.admit_attempt_async(GeminiCall("test")), threading.current_thread()
+
+    wait, loop_thread = asyncio.run(admit())
+    assert wait == 0.0
+    assert threads and threads[0] is not loop_thread
+
+
+def test_cancelled_async_admission_hands_the_trial_back(guards, monkeypatch):
+    limiter, breaker = guards
+    breaker.allow()
+    breaker.failure()
+    time.sleep(0.06)
+    reserved = threading.Event()
+
+    def slow_reserve(max_wait):
+        time.sleep(0.1)
+        reserved.set()
+        return 0.0
+
+    monkeypatch.setattr(limiter, "reserve", slow_reserve)
+
+    async def cancel_admission():
+        task = asyncio.ensure_future(shared.admit_attempt_async(GeminiCall("test")))
+        await asyncio.sleep(0.02)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # Let the executor thread finish and the callback run
+        while not reserved.is_set():
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.01)
+
+    asyncio.run(cancel_admission())
+    # The half-open trial was released, so the next caller gets it
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
@@ -117,6 +117,84 @@ async function verifyKYC(userData, idImagePath) {
   }
 }
 
+// Verify many users in one request; onResult is called for each item as the
+// KYC API streams it back (NDJSON, in completion order)
+async function verifyKYCBatch(entries, onResult) {
+  const manifest = entries.map((entry, index) => ({
+    id: entry.id !== undefined ? entry.id : index,
+    image: `${index}${path.extname(entry.idImagePath)}`,
+    full_name: entry.userData.fullName || "",
+    dob: entry.userData.dateOfBirth || "",
+    nationality: entry.userData.nationality || "",
+    id_number: entry.userData.idNumber || "",
+  }));
+
+  const form = new FormData();
+  form.append("manifest", JSON.stringify(manifest));
+  entries.forEach((entry, index) => {
+    form.append("images", fs.createReadStream(entry.idImagePath), manifest[index].image);
+  });
+
+  const KYC_API_URL = process.env.KYC_API_URL || "http://127.0.0.1:80";
+  const response = await axios.post(`${KYC_API_URL}/api/v1/verify/batch`, form, {
+    headers: form.getHeaders(),
+    responseType: "stream",
+    timeout: 0,
+    maxContentLength: Infinity,
+    maxBodyLength: Infinity,
+  });
+
+  return new Promise((resolve, reject) => {
+    let buffer = "";
+    let summary = null;
+    const handleLine = (line) => {
+      if (!line.trim()) return;
+      const item = JSON.parse(line);
+      if (item.status === "complete") {
+        summary = item;
+      } else {
+        onResult(item);
+      }
+    };
+    response.data.on("data", (chunk) => {
+      buffer += chunk.toString("utf8");
+      const lines = buffer.split("\n");
+      buffer = lines.pop();
+      lines.forEach(handleLine);
+    });
+    response.data.on("end", () => {
+      handleLine(buffer);
+      resolve(summary);
+    });
+    response.data.on("error", reject);
+  });
+}
+
+// Queue a verification on the KYC API and return its job id without waiting
+async function submitKYCJob(userData, idImagePath) {
+  const form = new FormData();
+  form.append("full_name", userData.fullName || "");
+  form.append("dob", userData.dateOfBirth || "");
+  form.append("nationality", userData.nationality || "");
+  form.append("id_number", userData.idNumber || "");
+  form.append("id_image", fs.createReadStream(idImagePath));
+
+  const KYC_API_URL = process.env.KYC_API_URL || "http://127.0.0.1:80";
+  const response = await axios.post(`${KYC_API_URL}/api/v1/jobs`, form, {
+    headers: form.getHeaders(),
+    maxContentLength: Infinity,
+    maxBodyLength: Infinity,
+  });
+  return response.data.job_id;
+}
+
+// Fetch the state of a queued verification ("queued", "running", "done" or "failed")
+async function getKYCJob(jobId) {
+  const KYC_API_URL = process.env.KYC_API_URL || "http://127.0.0.1:80";
+  const response = await axios.get(`${KYC_API_URL}/api/v1/jobs/${encodeURIComponent(jobId)}`);
+  return response.data;
+}
+
 // Function to extract decision and reason from response
 function extractKYCResult(responseText) {
   // Default result
@@ -195,6 +273,6 @@ function extractKYCResult(responseText) {
   return result;
 }
 
-module.exports = { verifyKYC, extractKYCResult };
+module.exports = { verifyKYC, verifyKYCBatch, submitKYCJob, getKYCJob, extractKYCResult };
 
 